@@ -1,14 +1,28 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
 from fastapi import APIRouter, HTTPException, Response
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import Optional
 from app.services.ai.chat_handler import handle_user_message
 
 router = APIRouter()
 
+# Recent streamed turns kept for the time-to-first-token / total latency metrics
+STREAM_TIMING_SAMPLES = 1000
+_stream_timings = {"ttft_ms": deque(maxlen=STREAM_TIMING_SAMPLES), "total_ms": deque(maxlen=STREAM_TIMING_SAMPLES)}
+
+
+# Session ids name stored files and keys, so only these characters are accepted
+SESSION_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
 
 class ChatRequest(BaseModel):
     message: str
-    session_id: Optional[str] = None
+    session_id: Optional[str] = Field(None, pattern=SESSION_ID_PATTERN)
     product_type: Optional[str] = None
 
 
@@ -25,21 +39,17 @@ async def chat_endpoint(
 ):
     """
     Endpoint to interact with the AI shopping assistant.
-    Uses a single shared conversation history for all messages.
+    Continues the conversation of `session_id`; without one a new session is
+    started and its id returned for the next message.
     """
     try:
-        # Use a fixed session_id so all messages share one conversation
-        session_id = "default"
-
-        # Store product_type preference if provided
-        if request.product_type is not None:
-            from app.services.ai.conversation_store import update_memory
-            update_memory(session_id, {"product_type": request.product_type})
+        session_id = request.session_id or _new_session_id()
 
         # 4️⃣ Handle chat
-        response_text, products = handle_user_message(
+        response_text, products = await handle_user_message(
             session_id=session_id,
-            user_input=request.message
+            user_input=request.message,
+            product_type=request.product_type
         )
 
         return ChatResponse(
@@ -50,3 +60,93 @@ async def chat_endpoint(
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _log_abandoned_turn(turn: asyncio.Task):
+    """Done-callback for a turn whose client went away: nobody else reads its outcome."""
+    if not turn.cancelled() and turn.exception() is not None:
+        print(f"⚠️ Chat turn failed after the client disconnected: {turn.exception()}", flush=True)
+
+
+async def _stream_turn(session_id: str, message: str, product_type: str | None, started: float):
+    """Runs the chat turn as a task and relays its tokens as SSE events."""
+    tokens: asyncio.Queue = asyncio.Queue()
+    turn = asyncio.create_task(
+        handle_user_message(session_id, message, on_token=tokens.put, product_type=product_type)
+    )
+    turn.add_done_callback(lambda _: tokens.put_nowait(None))
+
+    first_token_at = None
+    relayed = False
+    try:
+        while (text := await tokens.get()) is not None:
+            first_token_at = first_token_at or time.perf_counter()
+            yield _sse("token", {"text": text})
+        relayed = True
+    finally:
+        if not relayed:
+            # Client disconnected: the turn runs to completion on purpose, so the
+            # session still gets its reply; its outcome is read (and logged) here
+            turn.add_done_callback(_log_abandoned_turn)
+
+    try:
+        reply, products = turn.result()
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+        return
+
+    # Cached and fixed replies are not generated token by token: send them whole
+    if first_token_at is None:
+        first_token_at = time.perf_counter()
+        yield _sse("token", {"text": reply})
+
+    yield _sse("products", {"products": products})
+
+    ttft_ms = round((first_token_at - started) * 1000, 1)
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    _stream_timings["ttft_ms"].append(ttft_ms)
+    _stream_timings["total_ms"].append(total_ms)
+    yield _sse("done", {"session_id": session_id, "ttft_ms": ttft_ms, "total_ms": total_ms})
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Streaming variant of /chat (Server-Sent Events). Events, in order:
+    - token: {"text"} reply text as the LLM generates it, without the SELECTED_IDS tag
+    - products: {"products"} the selected product cards
+    - done: {"session_id", "ttft_ms", "total_ms"} time to first token and to completion
+    - error: {"detail"} instead of products/done if the turn fails
+    Sessions work as in /chat; a minted session id arrives in `done`.
+    """
+    started = time.perf_counter()
+    session_id = request.session_id or _new_session_id()
+
+    return StreamingResponse(
+        _stream_turn(session_id, request.message, request.product_type, started),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _percentiles(samples) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": None, "p95": None}
+    return {"p50": ordered[len(ordered) // 2], "p95": ordered[int(0.95 * (len(ordered) - 1))]}
+
+
+def get_stream_stats() -> dict:
+    return {
+        "turns": len(_stream_timings["total_ms"]),
+        "ttft_ms": _percentiles(_stream_timings["ttft_ms"]),
+        "total_ms": _percentiles(_stream_timings["total_ms"]),
+    }
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from app.core.concurrency import get_pool_stats as blocking_pool_stats
+from app.api.chat import get_stream_stats as chat_stream_stats
+from app.services.recommender_system.query_embedding_cache import get_cache_stats as query_embedding_stats
+from app.services.recommender_system.search_service import get_result_cache_stats as search_result_stats
+from app.services.ai.intent_classifier import get_classifier_stats as intent_classifier_stats
+from app.services.ai.chat_handler import get_speculation_stats as speculation_stats
+from app.services.ai.response_cache import get_cache_stats as response_cache_stats
+from app.services.ai.prompt_builder import get_prompt_stats as recommendation_prompt_stats
+from app.services.ai.conversation_store import get_session_stats as session_store_stats
+from app.services.ai.llm_client import get_llm_stats as llm_call_stats
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def metrics():
+    """
+    In-process cache and performance counters for this worker.
+    """
+    return {
+        "query_embedding_cache": query_embedding_stats(),
+        "search_result_cache": search_result_stats(),
+        "intent_classifier": intent_classifier_stats(),
+        "speculative_retrieval": speculation_stats(),
+        "response_cache": response_cache_stats(),
+        "recommendation_prompt": recommendation_prompt_stats(),
+        "session_store": session_store_stats(),
+        "llm_calls": llm_call_stats(),
+        "blocking_pool": blocking_pool_stats(),
+        "chat_stream": chat_stream_stats(),
+    }
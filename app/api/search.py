@@ -1,13 +1,77 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from app.services.recommender_system.search_service import search_products
+from fastapi import APIRouter, Query
+from pydantic import BaseModel, Field
+from typing import Optional
+from app.services.recommender_system.search_service import (
+    search_products_faceted,
+    search_products_batch,
+    similar_products,
+)
+from app.core.concurrency import run_blocking
+from app.core.exceptions import APIException
 
 router = APIRouter()
 
+MAX_BATCH_QUERIES = 100
+
 class SearchRequest(BaseModel):
+    query: str = ""
+    fields: Optional[list[str]] = None  # Field projection, e.g. ["product_id", "title", "thumbnail"]
+    # Facet filters
+    product_type: Optional[str] = "single"  # "single", "combo" or "any"
+    categories: Optional[list[str]] = None   # any of
+    min_price: Optional[float] = Field(None, ge=0)
+    max_price: Optional[float] = Field(None, ge=0)
+    in_stock: Optional[bool] = None
+    # Paging
+    page: int = Field(0, ge=0)
+    page_size: int = Field(5, ge=1, le=50)
+
+class BatchSearchQuery(BaseModel):
     query: str
+    k: int = Field(5, ge=1, le=50)
+    product_type: str = "single"
+    category: Optional[str] = None
+    budget: Optional[float] = None
+    fields: Optional[list[str]] = None
+
+class BatchSearchRequest(BaseModel):
+    queries: list[BatchSearchQuery] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
 
 @router.post("/search")
 async def search(search_req: SearchRequest):
-    results = search_products(search_req.query)
-    return {"results": results}
+    """
+    Search with optional facet filters and paging.
+    Returns the page of results, the filtered total and facet counts.
+    """
+    return await run_blocking(search_products_faceted, **search_req.model_dump())
+
+@router.post("/search/batch")
+async def search_batch(batch_req: BatchSearchRequest):
+    """
+    Many searches in one call: one embedding request and one matrix search.
+    Results are returned per query, in request order.
+    """
+    results = await run_blocking(search_products_batch, [q.model_dump() for q in batch_req.queries])
+    return {
+        "results": [
+            {"query": q.query, "results": r}
+            for q, r in zip(batch_req.queries, results)
+        ]
+    }
+
+@router.get("/products/{product_id}/similar")
+async def similar(
+    product_id: str,
+    k: int = Query(5, ge=1, le=50),
+    product_type: str = "any",
+    in_stock: Optional[bool] = None,
+    fields: Optional[list[str]] = Query(None),
+):
+    """
+    Nearest neighbours of a product from the graph precomputed at index
+    build time, filtered by product type and stock.
+    """
+    results = await run_blocking(similar_products, product_id, k=k, product_type=product_type, in_stock=in_stock, fields=fields)
+    if results is None:
+        raise APIException("PRODUCT_NOT_FOUND")
+    return {"product_id": product_id, "results": results}
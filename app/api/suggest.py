@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Query
+from app.core.concurrency import run_blocking
+from app.services.recommender_system.search_service import suggest
+
+router = APIRouter()
+
+
+@router.get("/suggest")
+async def suggest_endpoint(
+    q: str = Query("", max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+):
+    """
+    Typeahead over product titles and category terms, tolerant to one typo
+    per word ("iddli", "milet"). Served from memory, no embedding call.
+    """
+    return {"query": q, "suggestions": await run_blocking(suggest, q, limit)}
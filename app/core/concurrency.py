@@ -0,0 +1,88 @@
+"""
+Bounded thread pool for blocking work (FAISS search, embedding calls, file
+I/O) awaited from async endpoints, so the event loop keeps serving other
+requests while it runs.
+
+- run_blocking: await func(*args, **kwargs) on the pool
+- submit_blocking: start it now, await the returned future later
+- PeriodicTask: background maintenance (sweepers, flushers) on a daemon thread
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+BLOCKING_POOL_WORKERS = int(os.getenv("BLOCKING_POOL_WORKERS", "16"))
+
+_pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_WORKERS, thread_name_prefix="blocking")
+_lock = threading.Lock()
+_submitted = 0
+_running = 0
+
+
+def _tracked(func: Callable, *args, **kwargs) -> Any:
+    global _running
+    with _lock:
+        _running += 1
+    try:
+        return func(*args, **kwargs)
+    finally:
+        with _lock:
+            _running -= 1
+
+
+def submit_blocking(func: Callable, *args, **kwargs) -> asyncio.Future:
+    """Schedule func on the pool from a running event loop; returns an awaitable future."""
+    global _submitted
+    with _lock:
+        _submitted += 1
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(_pool, functools.partial(_tracked, func, *args, **kwargs))
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    return await submit_blocking(func, *args, **kwargs)
+
+
+def get_pool_stats() -> dict:
+    with _lock:
+        return {
+            "workers": BLOCKING_POOL_WORKERS,
+            "running": _running,
+            "queued": _pool._work_queue.qsize(),
+            "submitted": _submitted,
+        }
+
+
+class PeriodicTask:
+    """Calls `fn` every `interval` seconds on a daemon thread until stop()."""
+
+    def __init__(self, name: str, interval: float, fn: Callable[[], Any]):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.fn()
+            except Exception as e:
+                print(f"⚠️ {self.name} failed: {e}", flush=True)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
@@ -7,7 +7,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api import millex
 from app.api import search
 from app.api.chat import router as chat_router
+from app.api import metrics
+from app.api import suggest
 
+from app.core.concurrency import run_blocking
 from app.core.errors import ERRORS
 from app.core.exceptions import APIException
 
@@ -52,6 +55,33 @@ async def api_exception_handler(request: Request, exc: APIException):
 
 app.include_router(search.router, prefix="/api/v1")
 app.include_router(chat_router, prefix="/api/v1")
+app.include_router(metrics.router, prefix="/api/v1")
+app.include_router(suggest.router, prefix="/api/v1")
+
+
+@app.on_event("startup")
+async def load_search_resources():
+    # Load the vector store off the event loop before the first request needs it
+    from app.services.recommender_system.search_service import load_resources
+    from app.services.ai.response_cache import start_sweeper
+    from app.services.ai.conversation_store import start_writer, start_sweeper as start_session_sweeper
+    await run_blocking(load_resources)
+    start_sweeper()
+    start_writer()
+    start_session_sweeper()
+
+
+@app.on_event("shutdown")
+async def persist_caches():
+    from app.services.recommender_system.query_embedding_cache import save_cache
+    from app.services.ai.llm_client import close_client
+    from app.services.ai.response_cache import stop_sweeper
+    from app.services.ai.conversation_store import stop_writer, stop_sweeper as stop_session_sweeper
+    await run_blocking(stop_sweeper)
+    await run_blocking(stop_session_sweeper)
+    await run_blocking(stop_writer)
+    await run_blocking(save_cache)
+    await close_client()
 
 
 
@@ -1,91 +1,206 @@
+import asyncio
+import os
 import re
-from app.services.ai.query_understanding import extract_query_intent
+import threading
+import weakref
+from collections import Counter
+from app.core.concurrency import run_blocking, submit_blocking
+from app.services.ai.query_understanding import extract_query_intent, local_query_intent
 from app.services.recommender_system.search_service import search_products
+from app.services.recommender_system.query_embedding_cache import normalize_query
 from app.services.ai.reasoning_engine import generate_recommendation, generate_catalog_summary
-from app.services.ai.conversation_store import load_memory, update_memory, append_message
+from app.services.ai.conversation_store import load_memory, update_memory, append_message, hold, release
 from app.services.ai.response_cache import (
     get_cached_response,
     save_cached_response
 )
 from app.services.ai.small_talk import generate_small_talk_response
 
+# Speculative retrieval: while the intent LLM call is in flight, search the raw
+# message (and the last query as a combo, after a combo offer) on the blocking pool.
+# Off by default: a result is only reused when the LLM's rewrite normalizes to the
+# raw message, so enable it only where /metrics shows a reuse_rate that pays for
+# the discarded searches (and their embedding calls).
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+SEARCH_K = 3
 
+_stats_lock = threading.Lock()
+_speculation_stats = Counter()
 
-def handle_user_message(session_id: str, user_input: str) -> tuple[str, list]:
+# One lock per session with a turn running or waiting; dropped once unused
+_session_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+def _session_lock(session_id: str) -> asyncio.Lock:
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+    return lock
+
+
+def _speculation_key(query: str, product_type: str, memory: dict) -> tuple:
+    """Everything search_products' result depends on, besides the catalog."""
+    return (
+        normalize_query(query),
+        product_type,
+        memory.get("category"),
+        memory.get("budget"),
+        memory.get("product_type"),
+    )
+
+
+def _start_speculation(user_input: str, memory: dict, history: list) -> dict[tuple, asyncio.Future]:
+    """Submit the likely searches for this turn. Returns key -> Future of results."""
+    candidates = [(user_input, "single")]
+
+    last_assistant = next((m.get("content") or "" for m in reversed(history) if m.get("role") == "assistant"), "")
+    if memory.get("last_query") and "combo" in last_assistant.lower():
+        candidates.append((memory["last_query"], "combo"))
+
+    snapshot = dict(memory)
+    speculation = {}
+    for query, product_type in candidates:
+        key = _speculation_key(query, product_type, snapshot)
+        future = submit_blocking(search_products, query=query, k=SEARCH_K, memory=snapshot, product_type=product_type)
+        # Discarded speculations are never awaited; retrieve their errors so they aren't logged as unhandled
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        speculation[key] = future
+    with _stats_lock:
+        _speculation_stats["started"] += len(speculation)
+    return speculation
+
+
+async def _search(speculation: dict[tuple, asyncio.Future], query: str, memory: dict, product_type: str) -> list[dict]:
+    """search_products, reusing a speculative result started with the same query and filters."""
+    future = speculation.pop(_speculation_key(query, product_type, memory), None)
+    if future is not None:
+        try:
+            products = await future
+            with _stats_lock:
+                _speculation_stats["reused"] += 1
+            print(f"DEBUG: Reused speculative search for '{query}' ({product_type})", flush=True)
+            return products
+        except Exception as e:
+            print(f"⚠️ Speculative search failed, searching again: {e}", flush=True)
+
+    return await run_blocking(search_products, query=query, k=SEARCH_K, memory=memory, product_type=product_type)
+
+
+def get_speculation_stats() -> dict:
+    with _stats_lock:
+        started, reused = _speculation_stats["started"], _speculation_stats["reused"]
+    return {
+        "enabled": SPECULATIVE_RETRIEVAL,
+        "started": started,
+        "reused": reused,
+        "discarded": started - reused,
+        "reuse_rate": round(reused / started, 4) if started else 0.0,
+    }
+
+
+async def handle_user_message(
+    session_id: str,
+    user_input: str,
+    on_token=None,
+    product_type: str | None = None
+) -> tuple[str, list]:
+    """
+    Runs one chat turn and returns (reply, selected products). With
+    `on_token`, LLM-generated replies are also streamed to it as they arrive;
+    `product_type` stores the user's single/combo preference first.
+    Turns of one session run in order; different sessions run concurrently.
+    The session is persisted once, after the turn.
+    """
+    async with _session_lock(session_id):
+        hold(session_id)
+        try:
+            if product_type is not None:
+                await run_blocking(update_memory, session_id, {"product_type": product_type})
+            return await _handle_turn(session_id, user_input, on_token)
+        finally:
+            release(session_id)
+
+
+async def _handle_turn(session_id: str, user_input: str, on_token=None) -> tuple[str, list]:
     # 0️⃣ SAVE USER MESSAGE
-    append_message(session_id, "user", user_input)
+    await run_blocking(append_message, session_id, "user", user_input)
 
     # 1️⃣ MEMORY
-    memory = load_memory(session_id)
+    memory = await run_blocking(load_memory, session_id)
     history = memory.get("history", [])
 
-    # 2️⃣ INTENT
-    parsed = extract_query_intent(user_input, history=history)
+    # 2️⃣ CACHE (before any LLM call; only context-independent replies are stored)
+    cached = await run_blocking(get_cached_response, session_id, user_input)
+    if cached:
+        print(f"DEBUG: Response cache hit (intent '{cached.get('intent')}')", flush=True)
+        await run_blocking(update_memory, session_id, {
+            "last_query": cached.get("rewritten_query"),
+            "last_products": cached.get("products") or None,
+        })
+        await run_blocking(append_message, session_id, "assistant", cached["response"])
+        return cached["response"], cached.get("products", [])
+
+    # 3️⃣ INTENT (local classifier first; speculative search overlaps the LLM call)
+    speculation = {}
+    parsed = local_query_intent(user_input, history=history)
+    if parsed is None:
+        if SPECULATIVE_RETRIEVAL:
+            speculation = _start_speculation(user_input, memory, history)
+        parsed = await extract_query_intent(user_input, history=history, local_first=False)
     intent = parsed.get("intent")
     print(f"DEBUG: Intent='{intent}', rewritten_query='{parsed.get('rewritten_query')}'", flush=True)
     print(f"DEBUG: Memory last_query='{memory.get('last_query')}'", flush=True)
 
-    # 3️⃣ CACHE (Skip for follow-up questions that need memory products)
+    # Follow-up questions answer from memory products (not cached, not searched)
     is_followup = (intent in ["comparison", "info"]) and not parsed.get("rewritten_query")
     
-    # Save last_query BEFORE cache check so combo_upsell always has it
+    # Save last_query early so combo_upsell always has it
     rewritten_query = parsed.get("rewritten_query")
     if rewritten_query:
-        update_memory(session_id, {"last_query": rewritten_query})
-        print(f"DEBUG: Saved last_query='{rewritten_query}' early (before cache)", flush=True)
-    
-    if not is_followup and intent != "combo_upsell":
-        cached = get_cached_response(session_id, user_input)
-        if cached:
-            append_message(session_id, "assistant", cached)
-            return cached, []
+        await run_blocking(update_memory, session_id, {"last_query": rewritten_query})
+        print(f"DEBUG: Saved last_query='{rewritten_query}' early", flush=True)
 
     # SMALL TALK
     if intent == "small_talk":
-        reply = generate_small_talk_response(user_input)
-        save_cached_response(session_id, user_input, reply)
-        append_message(session_id, "assistant", reply)
+        reply = await generate_small_talk_response(user_input, on_token=on_token)
+        await run_blocking(save_cached_response, session_id, user_input, reply, intent=intent)
+        await run_blocking(append_message, session_id, "assistant", reply)
         return reply, []
 
     # WEBSITE INFO
     if intent == "website_info":
-        reply = generate_catalog_summary(user_input)
-        save_cached_response(session_id, user_input, reply)
-        append_message(session_id, "assistant", reply)
+        reply = await generate_catalog_summary(on_token=on_token)
+        await run_blocking(save_cached_response, session_id, user_input, reply, intent=intent)
+        await run_blocking(append_message, session_id, "assistant", reply)
         return reply, []
 
     # COMBO UPSELL
     if intent == "combo_upsell":
         last_query = memory.get("last_query")
         if last_query:
-            combo_products = search_products(
-                query=last_query,
-                k=3,
-                memory=memory,
-                product_type="combo"
-            )
+            combo_products = await _search(speculation, last_query, memory, "combo")
             if combo_products:
-                update_memory(session_id, {"last_products": combo_products, "product_type": "combo"})
-                reply, selected_ids = generate_recommendation(
+                await run_blocking(update_memory, session_id, {"last_products": combo_products, "product_type": "combo"})
+                reply, selected_ids = await generate_recommendation(
                     user_message=user_input,
                     intent_data=parsed,
                     products=combo_products,
-                    history=history
+                    history=history,
+                    on_token=on_token
                 )
                 final_products = []
                 if selected_ids:
                     selected_set = set(selected_ids)
                     final_products = [p for p in combo_products if p.get('product_id') in selected_set]
-                save_cached_response(session_id, user_input, reply)
-                append_message(session_id, "assistant", reply)
+                await run_blocking(append_message, session_id, "assistant", reply)
                 return reply, final_products
             else:
                 reply = "Sorry, I couldn't find any combo packs for that product. Is there anything else I can help with?"
-                append_message(session_id, "assistant", reply)
+                await run_blocking(append_message, session_id, "assistant", reply)
                 return reply, []
         else:
             reply = "I'm not sure what product you'd like combos for. Could you tell me what you're looking for?"
-            append_message(session_id, "assistant", reply)
+            await run_blocking(append_message, session_id, "assistant", reply)
             return reply, []
 
     # FOLLOW-UP QUESTIONS (NO SEARCH)
@@ -96,14 +211,15 @@ def handle_user_message(session_id: str, user_input: str) -> tuple[str, list]:
         # If no products in memory, but we have history, maybe LLM can answer from general knowledge or history
         if not products and not history:
              reply = "I need to show you some options first before I can answer that."
-             append_message(session_id, "assistant", reply)
+             await run_blocking(append_message, session_id, "assistant", reply)
              return reply, []
 
-        reply, selected_ids = generate_recommendation(
+        reply, selected_ids = await generate_recommendation(
             user_message=user_input,
             intent_data=parsed,
             products=products,
-            history=history
+            history=history,
+            on_token=on_token
         )
         
         final_products = []
@@ -111,13 +227,12 @@ def handle_user_message(session_id: str, user_input: str) -> tuple[str, list]:
             selected_set = set(selected_ids)
             final_products = [p for p in products if p.get('product_id') in selected_set]
 
-        save_cached_response(session_id, user_input, reply)
-        append_message(session_id, "assistant", reply)
+        await run_blocking(append_message, session_id, "assistant", reply)
         return reply, final_products
 
     # 4️⃣ CATEGORY OVERRIDE
     if parsed.get("explicit_category"):
-        update_memory(session_id, {"category": parsed["explicit_category"]})
+        await run_blocking(update_memory, session_id, {"category": parsed["explicit_category"]})
 
     # 5️⃣ CONSTRAINTS (SAFE)
     constraints = parsed.get("constraints") or {}
@@ -131,20 +246,20 @@ def handle_user_message(session_id: str, user_input: str) -> tuple[str, list]:
         if match:
             normalized_budget = int(match.group())
 
-    update_memory(session_id, {
+    await run_blocking(update_memory, session_id, {
         "budget": normalized_budget,
         "preferences": constraints.get("preferences", []),
         "intent": intent
     })
     
     # Reload memory to get latest state if needed, though we just updated it
-    memory = load_memory(session_id)
+    memory = await run_blocking(load_memory, session_id)
 
     # 6️⃣ SEARCH (ONLY HERE)
     rewritten_query = parsed.get("rewritten_query")
     if not rewritten_query:
         reply = "Could you please clarify what you’re looking for?"
-        append_message(session_id, "assistant", reply)
+        await run_blocking(append_message, session_id, "assistant", reply)
         return reply, []
 
     # Get Filter
@@ -152,12 +267,7 @@ def handle_user_message(session_id: str, user_input: str) -> tuple[str, list]:
     print(f"DEBUG: Intent Filter: {product_type_filter}", flush=True) 
 
 
-    products = search_products(
-        query=rewritten_query,
-        k=3,
-        memory=memory,
-        product_type=product_type_filter
-    )
+    products = await _search(speculation, rewritten_query, memory, product_type_filter)
 
     # 🔹 FALLBACK LOGIC: If "single" search yields poor results, try "any" (Combos)
     if product_type_filter == "single" and rewritten_query and products:
@@ -176,7 +286,8 @@ def handle_user_message(session_id: str, user_input: str) -> tuple[str, list]:
             # For "idli", single search finds 1 item. Fallback => finds 5 items.
             if valid_matches < 2:
                 print(f"DEBUG: Low relevance ({valid_matches} matches) for 'single'. Falling back to 'any'.", flush=True)
-                expanded_products = search_products(
+                expanded_products = await run_blocking(
+                    search_products,
                     query=rewritten_query,
                     k=3,
                     memory=memory,
@@ -196,7 +307,7 @@ def handle_user_message(session_id: str, user_input: str) -> tuple[str, list]:
                     product_type_filter = "any" # Update tracking
 
 
-    update_memory(session_id, {
+    await run_blocking(update_memory, session_id, {
         "last_products": products,
         "last_query": rewritten_query,
         "product_type": product_type_filter
@@ -204,11 +315,12 @@ def handle_user_message(session_id: str, user_input: str) -> tuple[str, list]:
     print(f"DEBUG: Saved last_query='{rewritten_query}' to memory", flush=True)
 
     # 7️⃣ REASONING
-    reply, selected_ids = generate_recommendation(
+    reply, selected_ids = await generate_recommendation(
         user_message=user_input,
         intent_data=parsed,
         products=products,
-        history=history
+        history=history,
+        on_token=on_token
     )
 
     # Filter products for frontend display based on reasoning selection
@@ -221,6 +333,9 @@ def handle_user_message(session_id: str, user_input: str) -> tuple[str, list]:
     # If LLM triggered fallback (no tag found), selected_ids would be all products, so final_products = products.
     # If LLM output empty tag, final_products = [].
 
-    save_cached_response(session_id, user_input, reply)
-    append_message(session_id, "assistant", reply)
+    await run_blocking(
+        save_cached_response, session_id, user_input, reply,
+        products=final_products, intent=intent, rewritten_query=rewritten_query
+    )
+    await run_blocking(append_message, session_id, "assistant", reply)
     return reply, final_products
@@ -1,118 +1,331 @@
-from pathlib import Path
+"""
+Conversation session memory with write-behind persistence.
+
+Sessions live in memory; load_memory / update_memory / append_message only
+mark a session dirty. A background writer persists dirty sessions in batches
+once they have been idle for SESSION_IDLE_FLUSH seconds, or at the latest
+SESSION_FLUSH_INTERVAL seconds after their first unwritten change, and
+stop_writer() flushes everything at shutdown. A session held by a chat turn
+(hold / release) is written when the turn ends, so a turn costs one write
+however many fields it updates; only a session busy for longer than the
+interval is also written in between.
+
+Memory is bounded: at most SESSION_CACHE_MAX_ENTRIES sessions are kept (least
+recently used clean sessions are dropped first; they reload from the backend),
+and a sweeper removes sessions idle past SESSION_TIMEOUT_SECONDS, in memory
+and in storage, since they would only be reset on their next message.
+
+Storage is pluggable (SESSION_BACKEND): file (default), sqlite or redis.
+"""
+
 import json
+import os
+import threading
 import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from app.core.concurrency import PeriodicTask
+from app.services.ai.session_backends import FileSessionBackend, RedisSessionBackend, SQLiteSessionBackend
 
-SESSION_TIMEOUT_SECONDS = 15 * 60 
+SESSION_TIMEOUT_SECONDS = 15 * 60
 BASE_DIR = Path(__file__).resolve().parent
 MEMORY_DIR = BASE_DIR / "conversation_memory"
-MEMORY_DIR.mkdir(exist_ok=True)
+SESSION_DB_PATH = MEMORY_DIR / "sessions.db"
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "file").lower()
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+# Expired sessions are never read again, so Redis can drop them itself
+SESSION_REDIS_TTL = int(os.getenv("SESSION_REDIS_TTL", str(SESSION_TIMEOUT_SECONDS)))
+# Write-behind: seconds without changes before a session is written, and the
+# longest a change may stay unwritten
+SESSION_IDLE_FLUSH = float(os.getenv("SESSION_IDLE_FLUSH", "1"))
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "5"))
+SESSION_WRITER_TICK = 0.25
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+HISTORY_LIMIT = 20
+
+_lock = threading.Lock()
+# In-memory sessions, least recently used first
+_sessions: OrderedDict[str, dict] = OrderedDict()
+# session_id -> JSON size as of its last load or write (bytes held)
+_sizes: dict[str, int] = {}
+# session_id -> (first unwritten change, last change)
+_dirty: dict[str, tuple[float, float]] = {}
+# Sessions inside a chat turn (not written on idle until released)
+_held = Counter()
+_stats = Counter()
+_backend = None
+_writer: PeriodicTask | None = None
+_sweeper: PeriodicTask | None = None
+
+
+def _new_memory(now: float) -> dict:
+    return {
+        "budget": None,
+        "category": None,
+        "product_type": None,
+        "preferences": [],
+        "intent": None,
+        "last_products": [],
+        "last_query": None,
+        "history": [],
+        "last_updated": now
+    }
+
+
+def get_backend():
+    """The configured backend, created on first use."""
+    global _backend
+    if _backend is None:
+        if SESSION_BACKEND == "sqlite":
+            _backend = SQLiteSessionBackend(SESSION_DB_PATH)
+        elif SESSION_BACKEND == "redis":
+            _backend = RedisSessionBackend(SESSION_REDIS_URL, SESSION_REDIS_TTL)
+        else:
+            _backend = FileSessionBackend(MEMORY_DIR)
+    return _backend
+
 
-# In-memory cache
-_sessions = {}
+def set_backend(backend):
+    """Write out pending sessions, then switch storage (tests, load tests)."""
+    global _backend
+    flush(force=True)
+    with _lock:
+        _backend = backend
+        _sessions.clear()
+        _sizes.clear()
 
 
-def _get_session_path(session_id: str) -> Path:
-    return MEMORY_DIR / f"{session_id}.json"
+def _mark_dirty(session_id: str, now: float):
+    first = _dirty.get(session_id, (now, now))[0]
+    _dirty[session_id] = (first, now)
+
+
+def _evict_over_capacity():
+    """Drop least recently used sessions beyond the limit (caller holds _lock).
+    Dirty and held sessions, and the one just loaded, stay; the sweeper
+    trims again once they are written."""
+    excess = len(_sessions) - SESSION_CACHE_MAX_ENTRIES
+    if excess <= 0:
+        return
+    for session_id in list(_sessions)[:-1]:
+        if excess <= 0:
+            break
+        if session_id in _dirty or session_id in _held:
+            continue
+        del _sessions[session_id]
+        _sizes.pop(session_id, None)
+        _stats["evicted"] += 1
+        excess -= 1
 
 
 def load_memory(session_id: str) -> dict:
     now = time.time()
 
-    if session_id in _sessions:
-        memory = _sessions[session_id]
-    else:
-        path = _get_session_path(session_id)
-        if path.exists():
-            with open(path, "r", encoding="utf-8") as f:
-                memory = json.load(f)
-        else:
-            memory = {
-                "budget": None,
-                "category": None,
-                "product_type": None,
-                "preferences": [],
-                "intent": None,
-                "last_products": [],
-                "last_query": None,
-                "history": [],
-                "last_updated": now
-            }
-
-    # SESSION TIMEOUT CHECK
-    if now - memory.get("last_updated", 0) > SESSION_TIMEOUT_SECONDS:
-        memory = {
-            "budget": None,
-            "category": None,
-            "product_type": None,
-            "preferences": [],
-            "intent": None,
-            "last_products": [],
-            "last_query": None,
-            "history": [],
-            "last_updated": now
-        }
+    with _lock:
+        memory = _sessions.get(session_id)
+        if memory is not None:
+            _sessions.move_to_end(session_id)
+    if memory is None:
+        stored = get_backend().load(session_id)
+        with _lock:
+            # Another thread may have loaded it meanwhile; keep the first copy
+            if session_id not in _sessions:
+                _sessions[session_id] = stored or _new_memory(now)
+                _sizes[session_id] = len(json.dumps(_sessions[session_id], ensure_ascii=False))
+                _evict_over_capacity()
+            memory = _sessions[session_id]
 
-    memory["last_updated"] = now
-    _sessions[session_id] = memory
+    with _lock:
+        # SESSION TIMEOUT CHECK
+        if now - memory.get("last_updated", 0) > SESSION_TIMEOUT_SECONDS:
+            memory.clear()
+            memory.update(_new_memory(now))
+            _mark_dirty(session_id, now)
+        memory["last_updated"] = now
     return memory
 
 
 def update_memory(session_id: str, updates: dict):
     """
-    Update memory fields safely.
+    Update memory fields safely (persisted by the writer).
     """
     memory = load_memory(session_id)
 
-    for key, value in updates.items():
-        if value is None:
-            continue
-
-        # Special handling for different keys
-        if key == "last_products":
-            # Always REPLACE last_products with new search results
-            memory[key] = value
-        elif isinstance(memory.get(key), list) and key == "preferences":
-            # Only append to preferences list
-            for item in value:
-                if item not in memory[key]:
-                    memory[key].append(item)
-        else:
-            memory[key] = value
-
-    # Persist to disk
-    path = _get_session_path(session_id)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(memory, f, indent=2)
+    with _lock:
+        for key, value in updates.items():
+            if value is None:
+                continue
 
-    _sessions[session_id] = memory
+            # Special handling for different keys
+            if key == "last_products":
+                # Always REPLACE last_products with new search results
+                memory[key] = value
+            elif isinstance(memory.get(key), list) and key == "preferences":
+                # Only append to preferences list
+                for item in value:
+                    if item not in memory[key]:
+                        memory[key].append(item)
+            else:
+                memory[key] = value
+        _mark_dirty(session_id, time.time())
 
 
 def append_message(session_id: str, role: str, content: str):
     """
-    Append a message to the conversation history.
+    Append a message to the conversation history (last HISTORY_LIMIT kept).
     """
     memory = load_memory(session_id)
-    
-    if "history" not in memory:
-        memory["history"] = []
-    
-    # Simple timestamp for sorting if needed later, though list order is enough
-    timestamp = time.time()
-    
-    # Create message object
-    new_message = {
-        "role": role,
-        "content": content,
-        "timestamp": timestamp
-    }
-    
-    # Append and check limit
-    memory["history"].append(new_message)
-    
-    # Keep only last 20 messages
-    if len(memory["history"]) > 20:
-        memory["history"] = memory["history"][-20:]
-        
-    # We use update_memory but explicitly set history to avoid recursion or complex merge logic
-    # Actually update_memory merges keys, so we can just pass the new history list
-    update_memory(session_id, {"history": memory["history"]})
+
+    with _lock:
+        history = memory.setdefault("history", [])
+        history.append({
+            "role": role,
+            "content": content,
+            "timestamp": time.time()
+        })
+        if len(history) > HISTORY_LIMIT:
+            del history[:-HISTORY_LIMIT]
+        _mark_dirty(session_id, time.time())
+
+
+def hold(session_id: str):
+    """Defer writing `session_id` until the matching release (one chat turn)."""
+    with _lock:
+        _held[session_id] += 1
+
+
+def release(session_id: str):
+    """End a hold; pending changes are written on the writer's next tick."""
+    with _lock:
+        _held[session_id] -= 1
+        if _held[session_id] <= 0:
+            del _held[session_id]
+        if session_id in _dirty:
+            # The turn is over: due for writing now rather than an idle period later
+            _dirty[session_id] = (_dirty[session_id][0], 0.0)
+
+
+def flush(force: bool = False) -> int:
+    """
+    Write dirty sessions in one backend batch: those due (idle and not held,
+    or past the interval), or every dirty session with `force`. Returns the
+    number written.
+    """
+    now = time.time()
+    with _lock:
+        due = [
+            session_id for session_id, (first, last) in _dirty.items()
+            if force
+            or now - first >= SESSION_FLUSH_INTERVAL
+            or (session_id not in _held and now - last >= SESSION_IDLE_FLUSH)
+        ]
+        items = []
+        for session_id in due:
+            memory = _sessions.get(session_id)
+            if memory is not None:
+                items.append((session_id, json.dumps(memory, ensure_ascii=False)))
+            del _dirty[session_id]
+
+    if not items:
+        return 0
+    try:
+        get_backend().save_many(items)
+    except Exception:
+        with _lock:
+            for session_id, _ in items:
+                _dirty.setdefault(session_id, (now, now))
+            _stats["write_errors"] += 1
+        raise
+
+    with _lock:
+        _stats["batches"] += 1
+        _stats["writes"] += len(items)
+        _stats["bytes_written"] += sum(len(body) for _, body in items)
+        for session_id, body in items:
+            if session_id in _sessions:
+                _sizes[session_id] = len(body)
+    return len(items)
+
+
+def sweep() -> dict:
+    """
+    Remove sessions idle longer than SESSION_TIMEOUT_SECONDS from memory and
+    storage (including stored sessions no longer in memory), and trim the
+    cache back to SESSION_CACHE_MAX_ENTRIES.
+    """
+    cutoff = time.time() - SESSION_TIMEOUT_SECONDS
+    with _lock:
+        expired = [
+            session_id for session_id, memory in _sessions.items()
+            if memory.get("last_updated", 0) < cutoff and session_id not in _held
+        ]
+        for session_id in expired:
+            del _sessions[session_id]
+            _sizes.pop(session_id, None)
+            _dirty.pop(session_id, None)  # would be reset on its next message anyway
+        _evict_over_capacity()
+        live = set(_sessions)
+
+    backend = get_backend()
+    for session_id in expired:
+        backend.delete(session_id)
+    deleted = backend.delete_expired(cutoff, keep=live)
+
+    with _lock:
+        _stats["expired"] += len(expired)
+        _stats["deleted"] += len(expired) + deleted
+    return {"expired": len(expired), "deleted": len(expired) + deleted}
+
+
+def start_writer():
+    """Start the background write-behind thread (app startup)."""
+    global _writer
+    if _writer is None:
+        _writer = PeriodicTask("session-writer", SESSION_WRITER_TICK, flush)
+        _writer.start()
+
+
+def stop_writer():
+    """Stop the writer and persist every pending change (app shutdown)."""
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+    flush(force=True)
+
+
+def start_sweeper():
+    """Start the background expiry sweep (app startup)."""
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = PeriodicTask("session-sweeper", SESSION_SWEEP_INTERVAL, sweep)
+        _sweeper.start()
+
+
+def stop_sweeper():
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.stop()
+        _sweeper = None
+
+
+def get_session_stats() -> dict:
+    with _lock:
+        return {
+            "backend": get_backend().name,
+            "sessions": len(_sessions),
+            "max_sessions": SESSION_CACHE_MAX_ENTRIES,
+            "bytes_held": sum(_sizes.values()),
+            "dirty": len(_dirty),
+            "held": len(_held),
+            "evicted": _stats["evicted"],
+            "expired": _stats["expired"],
+            "deleted": _stats["deleted"],
+            "batches": _stats["batches"],
+            "writes": _stats["writes"],
+            "bytes_written": _stats["bytes_written"],
+            "write_errors": _stats["write_errors"],
+        }
@@ -0,0 +1,222 @@
+"""
+Local intent classifier: the fast path in front of the LLM intent call.
+
+Resolves the messages that don't need an LLM to understand them:
+- combo_upsell: an affirmative reply to the assistant's combo offer
+- recommendation: a plain product request ("ragi dosa mix under 200")
+  naming at least one specific catalog term, with budget and product type
+  extracted by regex
+- small_talk / website_info: character n-gram nearest neighbour over
+  labelled examples
+
+Anything that depends on conversation context (follow-ups, comparisons,
+"show me more") or scores below LOCAL_INTENT_THRESHOLD returns None and goes
+to the LLM. The result has the same shape as extract_query_intent's JSON.
+"""
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from app.services.recommender_system.category_config import NAV_CATEGORIES
+from app.services.recommender_system.keyword_filter import STOP_WORDS
+from app.services.recommender_system.lexical_index import tokenize
+
+LOCAL_INTENT_ENABLED = os.getenv("LOCAL_INTENT_ENABLED", "true").lower() == "true"
+LOCAL_INTENT_THRESHOLD = float(os.getenv("LOCAL_INTENT_THRESHOLD", "0.6"))
+
+LABELLED_EXAMPLES = {
+    "small_talk": [
+        "hi", "hello", "hey", "hey there", "hii", "good morning", "good evening", "how are you",
+        "how are you doing", "thanks", "thank you", "thank you so much", "thanks a lot", "ok", "okay",
+        "cool", "great", "nice", "awesome", "bye", "goodbye", "see you", "who are you", "what's up",
+    ],
+    "website_info": [
+        "what do you sell", "what products do you have", "tell me about your website",
+        "tell me about millex", "what is millex", "what is this store", "about your brand",
+        "what can i buy here", "show me your catalog", "what all do you have", "what kind of products do you sell",
+        "what categories do you have",
+    ],
+    # Context-dependent or out-of-scope messages: always left to the LLM
+    "other": [
+        "tell me more", "show me more", "any others", "compare them", "which one is better",
+        "how do i cook it", "what are the ingredients", "is it good for diabetics", "which is cheaper",
+        "where is my order", "can i return it", "help me choose", "what about the second one",
+    ],
+}
+
+AFFIRMATIVE = re.compile(
+    r"^(yes|yeah|yep|yup|sure|ok|okay|ya|yes please|sure thing|go ahead|show me|show them|why not|please do)[.! ]*$"
+)
+
+# Words that point back at earlier turns
+REFERENCE_WORDS = {"it", "its", "this", "that", "these", "those", "them", "they", "one", "ones", "same"}
+# Words that make a product message a follow-up or a question rather than a plain request
+FOLLOWUP_MARKERS = REFERENCE_WORDS | {
+    "more", "other", "others", "another", "else", "first", "second", "third", "last", "previous",
+    "compare", "comparison", "difference", "better", "cheaper", "which", "cook", "recipe", "ingredients",
+    "how", "why", "what",
+}
+
+# Words that make a message only meaningful next to the previous turn
+CONTEXT_WORDS = REFERENCE_WORDS | {"more", "other", "others", "another", "else", "first", "second", "third", "last", "previous"}
+
+# Request filler removed from the rewritten search query
+FILLER_WORDS = STOP_WORDS | {
+    "please", "some", "any", "get", "buy", "give", "suggest", "recommend", "search", "see",
+    "like", "would", "do", "you", "have", "can", "could", "is", "are", "there", "my", "of", "to", "in",
+}
+
+COMBO_WORDS = {"combo", "combos", "pack", "packs", "kit", "kits", "set", "sets", "gift", "gifts", "bundle", "bundles"}
+ANY_TYPE_WORDS = {"all", "both"}
+# Catalog terms too generic to stand for a product on their own ("show me combos" needs context)
+GENERIC_TERMS = COMBO_WORDS | {"mix", "mixes", "product", "products", "food", "foods", "item", "items"}
+
+BUDGET_PATTERNS = [
+    re.compile(r"(?:under|below|less than|within|upto|up to|max(?:imum)?|budget(?: of| is)?|around)\s*(?:rs\.?|inr|₹)?\s*(\d+)"),
+    re.compile(r"(?:rs\.?|inr|₹)\s*(\d+)"),
+    re.compile(r"(\d+)\s*(?:rs|rupees|inr|₹)"),
+]
+
+_NAV_TERMS = {t for keywords in NAV_CATEGORIES.values() for kw in keywords for t in tokenize(kw)}
+
+_stats_lock = threading.Lock()
+_stats = Counter()
+
+
+def _ngrams(text: str, n: int = 3) -> Counter:
+    padded = f" {re.sub(r'[^a-z0-9 ]+', '', text.lower()).strip()} "
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def _normalize(vector: Counter) -> dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {k: v / norm for k, v in vector.items()}
+
+
+_EXAMPLE_VECTORS = [
+    (label, _normalize(_ngrams(example)))
+    for label, examples in LABELLED_EXAMPLES.items()
+    for example in examples
+]
+
+
+def nearest_label(message: str) -> tuple[str, float]:
+    """Label of the most similar labelled example and its cosine similarity."""
+    query = _normalize(_ngrams(message))
+    best_label, best_score = "other", 0.0
+    for label, vector in _EXAMPLE_VECTORS:
+        score = sum(weight * vector.get(gram, 0.0) for gram, weight in query.items())
+        if score > best_score:
+            best_label, best_score = label, score
+    return best_label, best_score
+
+
+def extract_budget(message: str) -> tuple[str | None, str]:
+    """(budget digits or None, message with the budget phrase removed)."""
+    text = message.lower()
+    for pattern in BUDGET_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(1), text[:match.start()] + " " + text[match.end():]
+    return None, text
+
+
+def extract_product_type(words: set[str]) -> str:
+    if words & COMBO_WORDS:
+        return "combo"
+    if words & ANY_TYPE_WORDS:
+        return "any"
+    return "single"
+
+
+def _catalog_terms() -> set[str] | frozenset:
+    """Indexed product vocabulary (empty until the vector store is loaded)."""
+    from app.services.recommender_system import search_service
+
+    store = search_service.current_store()
+    if store is None:
+        return frozenset()
+    return store.lexical.postings.keys()
+
+
+def _last_assistant_message(history: list | None) -> str:
+    for msg in reversed(history or []):
+        if msg.get("role") == "assistant":
+            return msg.get("content") or ""
+    return ""
+
+
+def depends_on_context(message: str) -> bool:
+    """
+    True for messages whose meaning depends on the previous turn: a bare
+    "yes" / "ok" (which accepts a combo offer after one) and follow-ups
+    ("show me more", "is it gluten free").
+    """
+    text = message.strip().lower()
+    return bool(AFFIRMATIVE.match(text)) or bool(set(re.findall(r"[a-z0-9]+", text)) & CONTEXT_WORDS)
+
+
+def _result(intent: str, confidence: float, rewritten_query=None, product_type="single", budget=None) -> dict:
+    return {
+        "intent": intent,
+        "rewritten_query": rewritten_query,
+        "product_type_filter": product_type,
+        "constraints": {"budget": budget, "category": None, "preferences": []} if intent == "recommendation" else None,
+        "explicit_category": None,
+        "source": "local",
+        "confidence": round(confidence, 3),
+    }
+
+
+def classify(message: str, history: list | None = None) -> dict | None:
+    """
+    Local intent for `message`, or None when the LLM should decide.
+    """
+    text = message.strip().lower()
+    if not text:
+        return None
+
+    # The user accepting the combo offer from the previous turn
+    if AFFIRMATIVE.match(text) and "combo" in _last_assistant_message(history).lower():
+        return _result("combo_upsell", 1.0, product_type="combo")
+
+    words = set(re.findall(r"[a-z0-9]+", text))
+
+    # Plain product request: most content words are catalog terms, at least one specific
+    budget, remainder = extract_budget(text)
+    content = [t for t in tokenize(remainder) if t not in FILLER_WORDS and t not in ANY_TYPE_WORDS]
+    if content:
+        vocabulary = _catalog_terms()
+        known = [t for t in content if t in vocabulary or t in _NAV_TERMS]
+        if known:
+            specific = [t for t in known if t not in GENERIC_TERMS]
+            confidence = len(known) / len(content)
+            if specific and confidence >= LOCAL_INTENT_THRESHOLD and not words & FOLLOWUP_MARKERS:
+                return _result("recommendation", confidence, " ".join(content), extract_product_type(words), budget)
+            return None  # about products, but needs context or the LLM's rewrite
+
+    label, confidence = nearest_label(text)
+    if label in ("small_talk", "website_info") and confidence >= LOCAL_INTENT_THRESHOLD and not words & REFERENCE_WORDS:
+        return _result(label, confidence)
+    return None
+
+
+def record(local: bool):
+    with _stats_lock:
+        _stats["messages"] += 1
+        _stats["local" if local else "llm"] += 1
+
+
+def get_classifier_stats() -> dict:
+    with _stats_lock:
+        messages = _stats["messages"]
+        return {
+            "enabled": LOCAL_INTENT_ENABLED,
+            "messages": messages,
+            "local": _stats["local"],
+            "llm": _stats["llm"],
+            "skipped_llm_fraction": round(_stats["local"] / messages, 4) if messages else 0.0,
+        }
@@ -0,0 +1,240 @@
+"""
+Shared AsyncOpenAI client for the AI services.
+
+One client per worker process, so every chat completion reuses the same
+pooled keep-alive connections. Created on first use and closed at shutdown.
+
+complete() is the single entry point for chat completions; with `on_token`
+it streams and hands each text delta to the callback as it arrives.
+complete_blocking() is the synchronous counterpart for offline jobs (index
+rebuilds) that run outside the event loop.
+
+Identical concurrent calls are coalesced: complete() fingerprints the request
+(model, messages, temperature) and callers arriving while the same request is
+in flight share its completion instead of sending their own. A streaming
+caller that joins late first receives the text generated so far as one token,
+then the remaining deltas as they arrive. The upstream call runs as its own
+task, so one caller going away (a closed stream) doesn't fail the others; it
+is cancelled only when every caller has gone. Temperature-0 results can also
+be memoised for LLM_MEMO_TTL seconds (off by default).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from typing import Awaitable, Callable
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, OpenAI
+
+from app.core.cache import TTLCache
+
+load_dotenv()
+
+# Seconds for a whole request / for opening a connection
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+# Connection pool: concurrent requests / idle connections kept open
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "16"))
+# Share one in-flight completion among concurrent identical calls
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "1") == "1"
+# Seconds a temperature-0 completion is reused (0 = off) / entries kept
+LLM_MEMO_TTL = float(os.getenv("LLM_MEMO_TTL", "0"))
+LLM_MEMO_MAX_ENTRIES = int(os.getenv("LLM_MEMO_MAX_ENTRIES", "1024"))
+
+_client: AsyncOpenAI | None = None
+_sync_client: OpenAI | None = None
+
+# fingerprint -> _Flight for completions in progress (event loop only)
+_flights: dict[str, "_Flight"] = {}
+_memo = TTLCache(max_entries=LLM_MEMO_MAX_ENTRIES, ttl_seconds=LLM_MEMO_TTL)
+_stats_lock = threading.Lock()
+_stats = Counter()
+
+
+def get_client() -> AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                ),
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def _create(
+    model: str,
+    messages: list[dict],
+    temperature: float,
+    on_token: Callable[[str], Awaitable[None]] | None = None,
+) -> str:
+    """One upstream chat completion, streamed through `on_token` when given."""
+    if on_token is None:
+        response = await get_client().chat.completions.create(
+            model=model, messages=messages, temperature=temperature
+        )
+        return response.choices[0].message.content.strip()
+
+    stream = await get_client().chat.completions.create(
+        model=model, messages=messages, temperature=temperature, stream=True
+    )
+    parts = []
+    async for chunk in stream:
+        text = chunk.choices[0].delta.content if chunk.choices else None
+        if text:
+            parts.append(text)
+            await on_token(text)
+    return "".join(parts).strip()
+
+
+def fingerprint(model: str, messages: list[dict], temperature: float) -> str:
+    """Stable key for a completion request."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """
+    One upstream completion shared by every caller with the same fingerprint.
+    Streamed deltas are kept (for late joiners) and fanned out to a queue
+    per streaming caller; None on a queue marks the end.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.parts: list[str] = []
+        self.queues: list[asyncio.Queue] = []
+        self.callers = 0
+        self.stream = False
+        self.task: asyncio.Task | None = None
+
+    def start(self, model: str, messages: list[dict], temperature: float, stream: bool):
+        self.stream = stream
+        self.task = asyncio.create_task(self._run(model, messages, temperature, stream))
+
+    async def _emit(self, text: str):
+        self.parts.append(text)
+        for queue in self.queues:
+            queue.put_nowait(text)
+
+    async def _run(self, model: str, messages: list[dict], temperature: float, stream: bool) -> str:
+        try:
+            text = await _create(model, messages, temperature, self._emit if stream else None)
+            if temperature == 0 and LLM_MEMO_TTL > 0:
+                _memo.set(self.key, text)
+            return text
+        finally:
+            if _flights.get(self.key) is self:
+                del _flights[self.key]
+            for queue in self.queues:
+                queue.put_nowait(None)
+
+    async def join(self, on_token: Callable[[str], Awaitable[None]] | None) -> str:
+        self.callers += 1
+        queue = None
+        try:
+            if on_token is not None and self.stream and not self.task.done():
+                queue = asyncio.Queue()
+                if self.parts:
+                    queue.put_nowait("".join(self.parts))
+                self.queues.append(queue)
+                while (text := await queue.get()) is not None:
+                    await on_token(text)
+            text = await asyncio.shield(self.task)
+            if on_token is not None and queue is None:
+                await on_token(text)  # the upstream call wasn't streamed
+            return text
+        finally:
+            if queue is not None:
+                self.queues.remove(queue)
+            self.callers -= 1
+            if self.callers == 0 and not self.task.done():
+                self.task.cancel()  # nobody is waiting for it any more
+
+
+async def complete(
+    model: str,
+    messages: list[dict],
+    temperature: float,
+    on_token: Callable[[str], Awaitable[None]] | None = None,
+) -> str:
+    """Full (stripped) completion text; streamed through `on_token` when given."""
+    if not LLM_SINGLE_FLIGHT:
+        _count("upstream")
+        return await _create(model, messages, temperature, on_token)
+
+    key = fingerprint(model, messages, temperature)
+    if temperature == 0 and LLM_MEMO_TTL > 0:
+        text = _memo.get(key)
+        if text is not None:
+            _count("memo_hits")
+            if on_token is not None:
+                await on_token(text)
+            return text
+
+    flight = _flights.get(key)
+    if flight is None:
+        flight = _Flight(key)
+        _flights[key] = flight
+        flight.start(model, messages, temperature, stream=on_token is not None)
+        _count("upstream")
+    else:
+        _count("shared")
+    return await flight.join(on_token)
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats[name] += 1
+
+
+def get_llm_stats() -> dict:
+    with _stats_lock:
+        calls = _stats["calls"]
+        saved = _stats["shared"] + _stats["memo_hits"]
+        return {
+            "single_flight": LLM_SINGLE_FLIGHT,
+            "memo_ttl": LLM_MEMO_TTL,
+            "calls": calls,
+            "upstream": _stats["upstream"],
+            "shared": _stats["shared"],
+            "memo_hits": _stats["memo_hits"],
+            "in_flight": len(_flights),
+            "saved_fraction": round(saved / calls, 3) if calls else 0.0,
+        }
+
+
+def complete_blocking(model: str, messages: list[dict], temperature: float) -> str:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+            max_retries=OPENAI_MAX_RETRIES,
+        )
+    response = _sync_client.chat.completions.create(model=model, messages=messages, temperature=temperature)
+    return response.choices[0].message.content.strip()
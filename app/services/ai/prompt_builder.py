@@ -0,0 +1,173 @@
+"""
+Token-budgeted prompt context for the recommendation call.
+
+Products are described by their type and price plus their compact prompt
+digests (weight, key benefits) rather than full descriptions, and conversation history is
+added newest first with whatever budget the products leave. When the prompt
+would exceed PROMPT_TOKEN_BUDGET, product detail is reduced step by step and
+then the lowest-ranked products are dropped (one is always kept).
+
+Token counts come from an approximate local tokenizer (no model vocabulary
+needed): close enough for budgeting, not for billing.
+"""
+
+import os
+import re
+import threading
+from collections import Counter, deque
+
+from app.services.recommender_system.catalog_digest import product_price
+from app.services.recommender_system.product_digest import product_digest
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+PROMPT_HISTORY_MESSAGES = 5
+# Longer history messages (usually earlier recommendations) are cut to this
+HISTORY_MESSAGE_MAX_TOKENS = 120
+# Product detail levels, richest first: benefits kept per product
+DETAIL_LEVELS = (3, 1, 0)
+# Chat-format overhead per message (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Recent calls kept for the prompt size metrics
+PROMPT_STATS_SAMPLES = 1000
+
+# Letter runs, digit groups (BPE vocabularies merge up to 3 digits), repeated
+# symbols ("-----") and single symbols
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|([^\w\s])\1{3,}|\S")
+# Letters per token for long words (most short English words are one token),
+# and repeated symbols per token
+_CHARS_PER_WORD_TOKEN = 7
+_CHARS_PER_RUN_TOKEN = 8
+
+_stats_lock = threading.Lock()
+_stats = Counter()
+_prompt_tokens = deque(maxlen=PROMPT_STATS_SAMPLES)
+
+
+def _piece_tokens(piece: str) -> int:
+    if piece.isalpha() and piece.isascii():
+        return -(-len(piece) // _CHARS_PER_WORD_TOKEN)
+    if len(piece) > 1:
+        return -(-len(piece) // _CHARS_PER_RUN_TOKEN)
+    return 1
+
+
+def count_tokens(text: str) -> int:
+    """Approximate number of model tokens in `text`."""
+    return sum(_piece_tokens(piece) for piece in (m.group() for m in _TOKEN_PATTERN.finditer(text or "")))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """`text` cut after roughly `max_tokens` tokens ("…" marks a cut)."""
+    used = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens:
+            return text[:match.start()].rstrip() + "…"
+    return text
+
+
+def _format_product(product: dict, benefits: int) -> str:
+    digest = product_digest(product)
+    price = product_price(product)
+    lines = [
+        f"Product ID: {product.get('product_id')}",
+        f"Name: {product.get('title', 'Unknown')}",
+        f"Type: {product.get('product_type') or 'single'}",
+        f"Price: {f'₹{price:g}' if price is not None else 'N/A'}",
+    ]
+    if digest["weight_g"]:
+        lines.append(f"Weight: {digest['weight_g']:g} g")
+    if benefits and digest["benefits"]:
+        lines.append(f"Key Benefits: {'; '.join(digest['benefits'][:benefits])}")
+    lines.append("-" * 20)
+    return "\n".join(lines)
+
+
+def _format_message(msg: dict) -> str:
+    content = truncate_to_tokens(msg.get("content") or "", HISTORY_MESSAGE_MAX_TOKENS)
+    return f"- {msg.get('role', 'unknown').upper()}: {content}"
+
+
+def build_recommendation_prompt(
+    system_prompt: str,
+    template: str,
+    products: list[dict],
+    history: list | None = None,
+    budget: int = PROMPT_TOKEN_BUDGET,
+) -> dict:
+    """
+    Chat messages for the recommendation call within `budget` tokens.
+    `template` is the user prompt with {history} and {products} placeholders.
+    Returns {"messages", "prompt_tokens", "products", "history", "trimmed"}
+    (products and history count what made it into the prompt).
+    """
+    fixed = (
+        count_tokens(system_prompt)
+        + count_tokens(template.replace("{history}", "").replace("{products}", ""))
+        + 2 * MESSAGE_OVERHEAD_TOKENS
+    )
+    available = budget - fixed
+
+    # Products: richest detail level that fits, then fewer products
+    for benefits in DETAIL_LEVELS:
+        blocks = [_format_product(p, benefits) for p in products]
+        product_tokens = sum(count_tokens(b) for b in blocks)
+        if product_tokens <= available:
+            break
+    while len(blocks) > 1 and product_tokens > available:
+        product_tokens -= count_tokens(blocks.pop())
+    trimmed = benefits != DETAIL_LEVELS[0] or len(blocks) < len(products)
+
+    # History: newest messages that fit in what the products left
+    recent = (history or [])[-PROMPT_HISTORY_MESSAGES:]
+    history_lines, history_tokens = [], 0
+    for msg in reversed(recent):
+        line = _format_message(msg)
+        tokens = count_tokens(line)
+        if history_tokens + tokens > available - product_tokens:
+            trimmed = True
+            break
+        history_lines.insert(0, line)
+        history_tokens += tokens
+
+    history_block = ""
+    if history_lines:
+        history_block = "Conversation History (for context):\n" + "\n".join(history_lines) + "\n"
+
+    user_prompt = template.replace("{history}", history_block).replace("{products}", "\n".join(blocks))
+    prompt_tokens = count_tokens(system_prompt) + count_tokens(user_prompt) + 2 * MESSAGE_OVERHEAD_TOKENS
+    _record(prompt_tokens, trimmed)
+
+    return {
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "prompt_tokens": prompt_tokens,
+        "products": len(blocks),
+        "history": len(history_lines),
+        "trimmed": trimmed,
+    }
+
+
+def _record(prompt_tokens: int, trimmed: bool):
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["trimmed"] += int(trimmed)
+        _stats["prompt_tokens"] += prompt_tokens
+        _prompt_tokens.append(prompt_tokens)
+
+
+def get_prompt_stats() -> dict:
+    with _stats_lock:
+        calls = _stats["calls"]
+        ordered = sorted(_prompt_tokens)
+        return {
+            "budget": PROMPT_TOKEN_BUDGET,
+            "calls": calls,
+            "trimmed": _stats["trimmed"],
+            "prompt_tokens_total": _stats["prompt_tokens"],
+            "prompt_tokens_p50": ordered[len(ordered) // 2] if ordered else None,
+            "prompt_tokens_p95": ordered[int(0.95 * (len(ordered) - 1))] if ordered else None,
+            "prompt_tokens_max": ordered[-1] if ordered else None,
+        }
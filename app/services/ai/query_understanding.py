@@ -1,20 +1,35 @@
 import json
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+from app.services.ai import intent_classifier
+from app.services.ai.llm_client import complete
 
-load_dotenv()
+MODEL = "gpt-4o-mini"
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-MODEL = "gpt-4o-mini"
+def local_query_intent(user_message: str, history: list = None) -> dict | None:
+    """
+    Local classifier tier: the parsed intent when it is confident, else None
+    (the LLM must decide). Counts every call for the skip-rate metric.
+    """
+    if not intent_classifier.LOCAL_INTENT_ENABLED:
+        return None
+    local = intent_classifier.classify(user_message, history)
+    intent_classifier.record(local is not None)
+    if local is not None:
+        print(f"DEBUG: Local intent '{local['intent']}' (confidence {local['confidence']}), skipped LLM", flush=True)
+    return local
 
 
-def extract_query_intent(user_message: str, history: list = None) -> dict:
+async def extract_query_intent(user_message: str, history: list = None, local_first: bool = True) -> dict:
     """
     Uses LLM to classify user intent and (if applicable)
     rewrite shopping queries + extract constraints.
+    Messages the local classifier is confident about skip the LLM call
+    (pass local_first=False when local_query_intent already ran).
     """
+    if local_first:
+        local = local_query_intent(user_message, history)
+        if local is not None:
+            return local
     
     # Format History
     history_context = ""
@@ -69,7 +84,7 @@ Return JSON with:
 - explicit_category (one of: special-offer, health-mix, ready-to-cook, combos, infant-food, or null)
 """
 
-    response = client.chat.completions.create(
+    content = await complete(
         model=MODEL,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -78,8 +93,6 @@ Return JSON with:
         temperature=0
     )
 
-    content = response.choices[0].message.content.strip()
-
     try:
         return json.loads(content)
     except json.JSONDecodeError:
@@ -1,47 +1,85 @@
-import os
+import asyncio
+import json
 import re
-from openai import OpenAI
-from dotenv import load_dotenv
-
-load_dotenv()
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from pathlib import Path
+from app.core.concurrency import run_blocking
+from app.services.ai.llm_client import complete, complete_blocking
+from app.services.ai.prompt_builder import build_recommendation_prompt
+from app.services.recommender_system.catalog_digest import (
+    build_catalog_digest,
+    digest_text,
+    load_catalog_digest,
+    save_catalog_digest,
+)
 
 MODEL = "gpt-4o-mini"
 
+SELECTED_IDS_MARKER = "[SELECTED_IDS:"
 
-def _extract_weight_in_grams(title: str) -> float | None:
-    """Extract weight from title and convert to grams."""
-    match = re.search(r'(\d+(?:\.\d+)?)\s*(g|kg|gm|gram|grams)', title.lower())
-    if match:
-        value = float(match.group(1))
-        unit = match.group(2)
-        if unit in ['kg', 'kgs']:
-            return value * 1000
-        return value
-    return None
 
+class SelectedIdsFilter:
+    """
+    Removes the [SELECTED_IDS: ...] tag from a token stream. Text that could
+    be the start of the tag is held back until the next token decides it.
+    """
 
-def generate_recommendation(
+    def __init__(self):
+        self._pending = ""
+        self._in_tag = False
+
+    def feed(self, text: str) -> str:
+        buffer = self._pending + text
+        self._pending = ""
+        visible = []
+
+        while buffer:
+            if self._in_tag:
+                end = buffer.find("]")
+                if end < 0:
+                    return "".join(visible)  # rest of the tag is still to come
+                buffer = buffer[end + 1:]
+                self._in_tag = False
+                continue
+
+            start = buffer.find(SELECTED_IDS_MARKER)
+            if start >= 0:
+                visible.append(buffer[:start])
+                buffer = buffer[start + len(SELECTED_IDS_MARKER):]
+                self._in_tag = True
+                continue
+
+            # Hold back a trailing "[SELEC..." that may complete in the next token
+            hold = buffer.rfind("[")
+            if hold >= 0 and SELECTED_IDS_MARKER.startswith(buffer[hold:]):
+                visible.append(buffer[:hold])
+                self._pending = buffer[hold:]
+            else:
+                visible.append(buffer)
+            break
+
+        return "".join(visible)
+
+    def flush(self) -> str:
+        """Held-back text once the stream has ended (an unfinished tag is dropped)."""
+        text = "" if self._in_tag else self._pending
+        self._pending = ""
+        return text
+
+
+async def generate_recommendation(
     user_message: str,
     intent_data: dict,
     products: list[dict],
-    history: list = None
-) -> str:
+    history: list = None,
+    on_token=None
+) -> tuple[str, list]:
     """
     Uses LLM to reason over retrieved products and generate a structured response.
+    Products are described by their prompt digests, and the prompt is kept
+    within PROMPT_TOKEN_BUDGET. With `on_token`, the reply is streamed to it
+    as generated, minus the [SELECTED_IDS: ...] tag.
     """
 
-    # Format History
-    history_context = ""
-    if history:
-        history_context = "Conversation History (for context):\n"
-        for msg in history[-5:]:
-            role = msg.get("role", "unknown")
-            content = msg.get("content", "")
-            history_context += f"- {role.upper()}: {content}\n"
-        history_context += "\n"
-
     if not products:
         # Check if it's a general question not needing products
         if intent_data.get('intent') in ['info', 'small_talk'] and history:
@@ -51,38 +89,7 @@ def generate_recommendation(
             return (
                 "I couldn't find any products that match your requirement. "
                 "Would you like to adjust your preferences?"
-            )
-
-    # Build Product Context (Flat List)
-    product_context = []
-    
-    for i, p in enumerate(products, start=1):
-        # 1. Price
-        price_info = "N/A"
-        price = 0
-        if p.get('pricing', {}).get('price'):
-            price = float(p['pricing']['price'])
-            price_info = f"₹{price}"
-        elif p.get('variants'):
-            # Get lowest variant price
-            prices = [float(v.get('price', 0) or 0) for v in p['variants'] if v.get('price')]
-            if prices:
-                price = min(prices)
-                price_info = f"₹{price}"
-        
-        # 2. Description Truncation (for context only, output controls display)
-        description = p.get('description', '').strip()
-        
-        # 3. Format for LLM
-        product_info = f"Product ID: {p.get('product_id')}\n"
-        product_info += f"Name: {p.get('title', 'Unknown')}\n"
-        product_info += f"Price: {price_info}\n"
-        product_info += f"Full Description: {description}\n"
-        product_info += "-" * 20
-        
-        product_context.append(product_info)
-
-    product_block = "\n".join(product_context)
+            ), []
 
     system_prompt = (
         "You are an expert e-commerce advisor for Millex (Millet-based products).\n"
@@ -92,7 +99,7 @@ def generate_recommendation(
         "1. **RELEVANCE FILTER (MOST IMPORTANT)**: ONLY show products that are DIRECTLY relevant to what the user asked for. "
         "If the user asks for 'Idli', ONLY show Idli-related products. Do NOT pad the response with unrelated products like 'Health Mix' or 'Dosa Mix'. "
         "If only 1 product matches the user's request, show ONLY that 1 product. There is NO compulsion to show multiple products.\n"
-        "2. **Analyze Descriptions**: Read the 'Full Description' of each product you decide to show. Based on the description, YOU decide the best Category/Group name. Do NOT use hardcoded categories.\n"
+        "2. **Analyze Descriptions**: Read the 'Key Benefits' of each product you decide to show. Based on them, YOU decide the best Category/Group name. Do NOT use hardcoded categories.\n"
         "3. **Response Format**: For each product, use EXACTLY this format:\n"
         "   [Product Name] - [Price]\n"
         "   [Short Description: Max 1-2 lines. Focus on key benefits relative to the user's request.]\n\n"
@@ -107,27 +114,42 @@ def generate_recommendation(
         "- **Visual Selection**: At the very end, output `[SELECTED_IDS: id1, id2, ...]` containing ONLY the IDs of products you actually showed.\n"
     )
 
-    user_prompt = f"""
-{history_context}
+    # {history} and {products} are filled in by the prompt builder within the token budget
+    template = f"""
+{{history}}
 User Question: "{user_message}"
 
 Product Data:
-{product_block}
+{{products}}
 
 Task:
 Categorize and recommend the products using the requested format.
 """
+    prompt = build_recommendation_prompt(system_prompt, template, products, history)
+    print(
+        f"DEBUG: Recommendation prompt ~{prompt['prompt_tokens']} tokens "
+        f"({prompt['products']}/{len(products)} products, {prompt['history']} history messages"
+        f"{', trimmed' if prompt['trimmed'] else ''})",
+        flush=True
+    )
+
+    tag_filter = SelectedIdsFilter()
 
-    response = client.chat.completions.create(
+    async def visible_tokens(text: str):
+        text = tag_filter.feed(text)
+        if text:
+            await on_token(text)
+
+    content = await complete(
         model=MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.3
+        messages=prompt["messages"],
+        temperature=0.3,
+        on_token=visible_tokens if on_token else None
     )
-
-    content = response.choices[0].message.content.strip()
+    if on_token:
+        tail = tag_filter.flush()
+        if tail:
+            await on_token(tail)
     
     # Parse Selected IDs
     selected_ids = []
@@ -142,48 +164,19 @@ Categorize and recommend the products using the requested format.
         content = content.replace(match.group(0), "").strip()
         
     if not match and products:
-        selected_ids = [p.get('product_id') for p in products]
+        selected_ids = [p.get('product_id') for p in products[:prompt['products']]]
 
     return content, selected_ids
 
 
-def generate_catalog_summary(user_message: str) -> str:
-    """
-    Loads ALL products from vector store metadata and generates
-    a formatted summary of the entire Millex catalog.
-    """
-    from pathlib import Path
-    import json
-
-    META_PATH = Path(__file__).resolve().parent.parent / "recommender_system" / "vector_store" / "products_meta.json"
-
-    if not META_PATH.exists():
-        return "I'm sorry, I couldn't load the product catalog right now. Please try again later."
-
-    with open(META_PATH, "r", encoding="utf-8") as f:
-        all_products = json.load(f)
-
-    if not all_products:
-        return "The product catalog is currently empty."
-
-    # Build compact product list for LLM
-    product_lines = []
-    for p in all_products:
-        title = p.get("title", "Unknown")
-        product_type = p.get("product_type", "single")
-        price = p.get("pricing", {}).get("price")
-        price_str = f"₹{price}" if price else "Price on request"
-        categories = p.get("category", [])
-        cat_str = ", ".join(categories) if categories else "General"
-        in_stock = "In Stock" if p.get("availability", {}).get("in_stock") else "Out of Stock"
-
-        product_lines.append(f"- {title} | {product_type} | {price_str} | {cat_str} | {in_stock}")
+_digest_cache: tuple[tuple, dict] | None = None
+_summary_lock = asyncio.Lock()
 
-    catalog_block = "\n".join(product_lines)
 
+def _catalog_summary_messages(digest: dict) -> list[dict]:
     system_prompt = (
         "You are Millex's friendly AI assistant. The user is asking about the website/brand.\n"
-        "You have access to the FULL product catalog below.\n\n"
+        "You have a digest of the FULL product catalog below.\n\n"
         "Generate a well-formatted, engaging summary of the Millex store that includes:\n"
         "1. A brief intro about Millex (millet-based health products)\n"
         "2. Product categories available (group them logically)\n"
@@ -194,21 +187,83 @@ def generate_catalog_summary(user_message: str) -> str:
     )
 
     user_prompt = f"""
-User Question: "{user_message}"
-
-Full Product Catalog ({len(all_products)} products):
-{catalog_block}
+Catalog Digest ({digest['product_count']} products):
+{digest_text(digest)}
 
 Generate a formatted overview of the Millex store based on this data.
 """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
 
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.5
-    )
 
-    return response.choices[0].message.content.strip()
+def precompute_catalog_summary(path: Path) -> str | None:
+    """
+    Generate the overview for the digest at `path` unless it already has one,
+    and store it in the same file. Called at index rebuild (blocking).
+    """
+    record = load_catalog_digest(path)
+    if record is None:
+        return None
+    if not record.get("summary"):
+        record["summary"] = complete_blocking(MODEL, _catalog_summary_messages(record["digest"]), temperature=0.5)
+        save_catalog_digest(path, record["digest"], record["summary"])
+    return record["summary"]
+
+
+def _current_digest_record() -> dict | None:
+    """
+    Digest record of the served vector store, cached until the file changes.
+    Read-only: the digest file is written by the index build. Stores built
+    before digests existed get one built in memory from products_meta.json.
+    """
+    global _digest_cache
+    from app.services.recommender_system import search_service
+
+    path = search_service.DIGEST_PATH
+    source = path if path.exists() else search_service.META_PATH
+    if not source.exists():
+        return None
+
+    key = (source, source.stat().st_mtime_ns)
+    if _digest_cache is None or _digest_cache[0] != key:
+        if source == path:
+            record = load_catalog_digest(path)
+        else:
+            with open(source, "r", encoding="utf-8") as f:
+                digest = build_catalog_digest(json.load(f))
+            record = {"catalog_version": digest["catalog_version"], "digest": digest, "summary": None}
+        _digest_cache = (key, record)
+    return _digest_cache[1]
+
+
+async def generate_catalog_summary(on_token=None) -> str:
+    """
+    Fixed overview of the entire Millex catalog, the same for every
+    website_info question. Served from the catalog digest, where it is stored
+    when the vector store is rebuilt; if the rebuild could not reach the LLM,
+    it is generated here once per catalog version and kept in memory.
+    """
+    record = await run_blocking(_current_digest_record)
+    if record is None:
+        return "I'm sorry, I couldn't load the product catalog right now. Please try again later."
+
+    if not record["digest"]["product_count"]:
+        return "The product catalog is currently empty."
+
+    if record.get("summary"):
+        return record["summary"]
+
+    async with _summary_lock:
+        record = await run_blocking(_current_digest_record)
+        if record.get("summary"):
+            return record["summary"]
+
+        record["summary"] = await complete(
+            model=MODEL,
+            messages=_catalog_summary_messages(record["digest"]),
+            temperature=0.5,
+            on_token=on_token
+        )
+        return record["summary"]
@@ -1,46 +1,301 @@
-from pathlib import Path
-import json
+"""
+Two-tier chat response cache, consulted before intent extraction.
+
+- memory: bounded LRU with TTL (RESPONSE_CACHE_MEMORY_SIZE entries)
+- disk: one SQLite file (response_cache/responses.db) shared by workers and
+  restarts. A background sweeper deletes expired rows, trims the table to
+  RESPONSE_CACHE_DISK_MAX_ENTRIES and VACUUMs the file once enough of it is
+  free pages. Per-entry <hash>.json files left by the old file cache are
+  deleted on the first sweep.
+- semantic (optional, RESPONSE_CACHE_SEMANTIC): near-duplicate questions
+  ("what do you sell?" / "what all do u sell") matched by query embedding
+  cosine similarity
+
+Replies to session-independent intents (SHARED_INTENTS) are stored under a
+shared key and are the only ones the semantic tier holds; everything else is
+per session. An entry keeps the reply, product cards, intent and rewritten
+query so a hit can skip the whole pipeline. Messages that only make sense
+next to the previous turn ("ok" after a combo offer, "show me more") are
+never stored or served, in any scope.
+"""
+
 import hashlib
+import json
+import os
+import sqlite3
+import threading
 import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from app.core.cache import TTLCache
+from app.core.concurrency import PeriodicTask
+from app.services.ai.intent_classifier import depends_on_context
+from app.services.recommender_system.query_embedding_cache import embed_query, normalize_query
 
 BASE_DIR = Path(__file__).resolve().parent
 CACHE_DIR = BASE_DIR / "response_cache"
 CACHE_DIR.mkdir(exist_ok=True)
+DB_PATH = CACHE_DIR / "responses.db"
+
+CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL", str(30 * 60)))  # same as session timeout
+RESPONSE_CACHE_MEMORY_SIZE = int(os.getenv("RESPONSE_CACHE_MEMORY_SIZE", "1024"))
+RESPONSE_CACHE_DISK_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_DISK_MAX_ENTRIES", "50000"))
+RESPONSE_CACHE_SWEEP_INTERVAL = int(os.getenv("RESPONSE_CACHE_SWEEP_INTERVAL", "300"))
+# VACUUM the file once this share of its pages is free
+RESPONSE_CACHE_COMPACT_FREE_FRACTION = 0.25
 
-CACHE_TTL_SECONDS = 30 * 60  # same as session timeout
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true"
+RESPONSE_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+RESPONSE_CACHE_SEMANTIC_SIZE = int(os.getenv("RESPONSE_CACHE_SEMANTIC_SIZE", "512"))
+
+# Intents whose reply doesn't depend on the conversation
+SHARED_INTENTS = {"small_talk", "website_info"}
+SHARED_SCOPE = "*"
+
+_memory = TTLCache(RESPONSE_CACHE_MEMORY_SIZE, CACHE_TTL_SECONDS)
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = Counter()
 
 
 def _hash_query(session_id: str, query: str) -> str:
-    key = f"{session_id}:{query.strip().lower()}"
+    key = f"{session_id}:{normalize_query(query)}"
     return hashlib.sha256(key.encode()).hexdigest()
 
 
-def get_cached_response(session_id: str, query: str):
-    key = _hash_query(session_id, query)
-    path = CACHE_DIR / f"{key}.json"
+def _count(name: str, n: int = 1):
+    with _stats_lock:
+        _stats[name] += n
+
 
-    if not path.exists():
+# ---------------------------------------------------------------- disk tier
+
+def _db() -> sqlite3.Connection:
+    """This thread's connection to DB_PATH (reopened if the path changed)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        conn = sqlite3.connect(DB_PATH, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, body TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_stored_at ON responses (stored_at)")
+        conn.commit()
+        _local.conn, _local.path = conn, DB_PATH
+    return conn
+
+
+def _disk_get(key: str) -> dict | None:
+    row = _db().execute("SELECT stored_at, body FROM responses WHERE key = ?", (key,)).fetchone()
+    if row is None or time.time() - row[0] > CACHE_TTL_SECONDS:
         return None
+    return json.loads(row[1])
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    if time.time() - data["timestamp"] > CACHE_TTL_SECONDS:
-        path.unlink(missing_ok=True)
+def _disk_put(key: str, entry: dict):
+    conn = _db()
+    conn.execute(
+        "INSERT OR REPLACE INTO responses (key, stored_at, body) VALUES (?, ?, ?)",
+        (key, entry["timestamp"], json.dumps(entry, ensure_ascii=False)),
+    )
+    conn.commit()
+
+
+# ------------------------------------------------------------ semantic tier
+
+class SemanticTier:
+    """
+    Ring buffer of (unit query vector, entry). A lookup is one matrix-vector
+    product; the best match counts if its cosine similarity reaches the
+    threshold and the entry hasn't expired.
+    """
+
+    def __init__(self, max_entries: int, threshold: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._vectors: np.ndarray | None = None
+        self._entries: list[dict | None] = [None] * max_entries
+        self._next = 0
+
+    @staticmethod
+    def _embed(query: str) -> np.ndarray:
+        vector = embed_query(normalize_query(query))[0]
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def add(self, query: str, entry: dict):
+        vector = self._embed(query)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._entries = [None] * self.max_entries
+            slot = self._next % self.max_entries
+            self._vectors[slot] = vector
+            self._entries[slot] = entry
+            self._next += 1
+
+    def find(self, query: str) -> dict | None:
+        if self._vectors is None:
+            return None
+        vector = self._embed(query)
+        with self._lock:
+            if self._vectors.shape[1] != len(vector):
+                return None
+            filled = min(self._next, self.max_entries)
+            scores = self._vectors[:filled] @ vector
+            best = int(np.argmax(scores)) if filled else -1
+            if best < 0 or scores[best] < self.threshold:
+                return None
+            entry = self._entries[best]
+        if time.time() - entry["timestamp"] > CACHE_TTL_SECONDS:
+            return None
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            self._entries = [None] * self.max_entries
+            self._next = 0
+
+
+_semantic = SemanticTier(RESPONSE_CACHE_SEMANTIC_SIZE, RESPONSE_CACHE_SEMANTIC_THRESHOLD)
+
+
+# --------------------------------------------------------------- public API
+
+def get_cached_response(session_id: str, query: str) -> dict | None:
+    """
+    Cached entry {response, products, intent, rewritten_query, timestamp} for
+    this session's message or a shared reply to the same message, else None.
+    """
+    if depends_on_context(query):
+        _count("context_skips")
         return None
 
-    return data["response"]
+    for scope in (session_id, SHARED_SCOPE):
+        key = _hash_query(scope, query)
+        entry = _memory.get(key)
+        if entry is None:
+            entry = _disk_get(key)
+            if entry is None:
+                continue
+            _memory.set(key, entry, stored_at=entry["timestamp"])
+            _count("disk_hits")
+        return entry
 
+    if RESPONSE_CACHE_SEMANTIC:
+        try:
+            entry = _semantic.find(query)
+        except Exception as e:
+            print(f"⚠️ Semantic response cache lookup failed: {e}", flush=True)
+            return None
+        if entry is not None:
+            _count("semantic_hits")
+            return entry
 
-def save_cached_response(session_id: str, query: str, response: str):
-    key = _hash_query(session_id, query)
-    path = CACHE_DIR / f"{key}.json"
+    _count("misses")
+    return None
 
-    payload = {
+
+def save_cached_response(
+    session_id: str,
+    query: str,
+    response: str,
+    products: list | None = None,
+    intent: str | None = None,
+    rewritten_query: str | None = None,
+):
+    if depends_on_context(query):
+        return
+
+    shared = intent in SHARED_INTENTS
+    key = _hash_query(SHARED_SCOPE if shared else session_id, query)
+    entry = {
         "query": query,
         "response": response,
-        "timestamp": time.time()
+        "products": products or [],
+        "intent": intent,
+        "rewritten_query": rewritten_query,
+        "timestamp": time.time(),
     }
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
+    _memory.set(key, entry, stored_at=entry["timestamp"])
+    _disk_put(key, entry)
+
+    if shared and RESPONSE_CACHE_SEMANTIC:
+        try:
+            _semantic.add(query, entry)
+        except Exception as e:
+            print(f"⚠️ Semantic response cache insert failed: {e}", flush=True)
+
+
+def _remove_legacy_files() -> int:
+    """Delete the per-entry JSON files of the old file cache (nothing reads them)."""
+    removed = 0
+    for path in CACHE_DIR.glob("*.json"):
+        path.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+
+def sweep() -> dict:
+    """Drop expired entries from both tiers, trim the disk tier to its cap and compact the file."""
+    legacy = _remove_legacy_files()
+    _memory.sweep()
+    conn = _db()
+    expired = conn.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - CACHE_TTL_SECONDS,)).rowcount
+
+    trimmed = 0
+    excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - RESPONSE_CACHE_DISK_MAX_ENTRIES
+    if excess > 0:
+        trimmed = conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY stored_at LIMIT ?)", (excess,)
+        ).rowcount
+    conn.commit()
+
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    compacted = bool(pages) and free / pages >= RESPONSE_CACHE_COMPACT_FREE_FRACTION
+    if compacted:
+        conn.execute("VACUUM")
+        _count("compactions")
+
+    _count("sweeps")
+    return {"expired": expired, "trimmed": trimmed, "compacted": compacted, "legacy_files_removed": legacy}
+
+
+_sweeper = PeriodicTask("response-cache-sweeper", RESPONSE_CACHE_SWEEP_INTERVAL, sweep)
+
+
+def start_sweeper():
+    _sweeper.start()
+
+
+def stop_sweeper():
+    _sweeper.stop()
+
+
+def clear_cache():
+    _memory.clear()
+    _semantic.clear()
+    conn = _db()
+    conn.execute("DELETE FROM responses")
+    conn.commit()
+
+
+def get_cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        "memory": _memory.stats(),
+        "disk_hits": stats.get("disk_hits", 0),
+        "semantic_enabled": RESPONSE_CACHE_SEMANTIC,
+        "semantic_hits": stats.get("semantic_hits", 0),
+        "misses": stats.get("misses", 0),
+        "context_skips": stats.get("context_skips", 0),
+        "sweeps": stats.get("sweeps", 0),
+        "compactions": stats.get("compactions", 0),
+    }
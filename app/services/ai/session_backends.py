@@ -0,0 +1,237 @@
+"""
+Persistence backends for conversation sessions (selected by SESSION_BACKEND).
+
+The session store keeps live sessions in memory and hands batches of dirty
+ones to a backend as JSON text, so every backend has the same small surface:
+load one session, save many in one round trip, delete one, and delete those
+last written before a cutoff (the expiry sweep).
+
+- file: one JSON file per session in conversation_memory/ (the original layout)
+- sqlite: one row per session in a WAL-mode database
+- redis: one key per session over the Redis protocol (RESP), with a TTL;
+  spoken directly over a socket, so no client library is needed
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+
+class FileSessionBackend:
+    name = "file"
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def _path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.json"
+
+    def load(self, session_id: str) -> dict | None:
+        path = self._path(session_id)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_many(self, items: list[tuple[str, str]]):
+        """Write each (session_id, JSON body) atomically."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for session_id, body in items:
+            path = self._path(session_id)
+            tmp_path = path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+    def delete(self, session_id: str):
+        self._path(session_id).unlink(missing_ok=True)
+
+    def delete_expired(self, cutoff: float, keep: set[str]) -> int:
+        """Delete session files last written before `cutoff`, except `keep`."""
+        if not self.directory.exists():
+            return 0
+        deleted = 0
+        for path in self.directory.glob("*.json"):
+            try:
+                if path.stem not in keep and path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    deleted += 1
+            except FileNotFoundError:
+                continue
+        return deleted
+
+
+class SQLiteSessionBackend:
+    name = "sqlite"
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        """This thread's connection to the database."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, body TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str) -> dict | None:
+        row = self._db().execute("SELECT body FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_many(self, items: list[tuple[str, str]]):
+        """Upsert the batch in one transaction."""
+        now = time.time()
+        conn = self._db()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sessions (session_id, updated_at, body) VALUES (?, ?, ?)",
+                [(session_id, now, body) for session_id, body in items],
+            )
+
+    def delete(self, session_id: str):
+        conn = self._db()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def delete_expired(self, cutoff: float, keep: set[str]) -> int:
+        """Delete rows last written before `cutoff`, except `keep`."""
+        conn = self._db()
+        rows = conn.execute("SELECT session_id FROM sessions WHERE updated_at < ?", (cutoff,)).fetchall()
+        expired = [(session_id,) for (session_id,) in rows if session_id not in keep]
+        with conn:
+            conn.executemany("DELETE FROM sessions WHERE session_id = ?", expired)
+        return len(expired)
+
+
+class RedisError(RuntimeError):
+    """Error reply from the Redis server."""
+
+
+class RespConnection:
+    """
+    Minimal RESP2 client: commands go out as arrays of bulk strings, replies
+    are parsed into str / int / bytes / None / list. One socket, serialised by
+    a lock and reopened after a network error.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", str(self.db)))
+        if setup:
+            self._round_trip(setup)
+
+    def close(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+        self._sock = self._reader = None
+
+    @staticmethod
+    def _encode(command: tuple) -> bytes:
+        parts = [f"*{len(command)}\r\n".encode()]
+        for arg in command:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, data = line[:1], line[1:-2]
+        if kind == b"+":
+            return data.decode()
+        if kind == b"-":
+            raise RedisError(data.decode())
+        if kind == b":":
+            return int(data)
+        if kind == b"$":
+            length = int(data)
+            return None if length < 0 else self._reader.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(data)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"Unexpected Redis reply: {line[:20]!r}")
+
+    def _round_trip(self, commands: list[tuple]) -> list:
+        self._sock.sendall(b"".join(self._encode(c) for c in commands))
+        replies, error = [], None
+        for _ in commands:
+            try:
+                replies.append(self._read_reply())
+            except RedisError as e:
+                error = error or e  # keep reading so the connection stays in step
+        if error:
+            raise error
+        return replies
+
+    def pipeline(self, commands: list[tuple]) -> list:
+        """Send all commands in one write and return their replies in order."""
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._round_trip(commands)
+                except OSError:
+                    self.close()
+                    if attempt == 2:
+                        raise
+
+    def execute(self, *command):
+        return self.pipeline([command])[0]
+
+
+class RedisSessionBackend:
+    name = "redis"
+
+    def __init__(self, url: str, ttl_seconds: int, prefix: str = "millex:session:"):
+        self.connection = RespConnection(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def load(self, session_id: str) -> dict | None:
+        body = self.connection.execute("GET", self.prefix + session_id)
+        return json.loads(body) if body is not None else None
+
+    def save_many(self, items: list[tuple[str, str]]):
+        """SET every session (with its TTL) in one pipelined round trip."""
+        self.connection.pipeline(
+            [("SET", self.prefix + session_id, body, "EX", self.ttl_seconds) for session_id, body in items]
+        )
+
+    def delete(self, session_id: str):
+        self.connection.execute("DEL", self.prefix + session_id)
+
+    def delete_expired(self, cutoff: float, keep: set[str]) -> int:
+        """Nothing to do: keys expire by their TTL."""
+        return 0
@@ -1,23 +1,20 @@
-from openai import OpenAI
-import os
+from app.services.ai.llm_client import complete
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 MODEL = "gpt-4o-mini"
 
-def generate_small_talk_response(user_message: str) -> str:
+async def generate_small_talk_response(user_message: str, on_token=None) -> str:
     system_prompt = (
         "You are a friendly AI assistant for Millex. "
         "Respond naturally and briefly. "
         "Do not mention products unless the user asks."
     )
 
-    response = client.chat.completions.create(
+    return await complete(
         model=MODEL,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_message}
         ],
-        temperature=0.7
+        temperature=0.7,
+        on_token=on_token
     )
-
-    return response.choices[0].message.content.strip()
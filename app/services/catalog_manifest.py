@@ -0,0 +1,316 @@
+"""
+Current-catalog manifest for processed product data.
+
+Keeps one authoritative record per product in data/catalog_manifest.json so
+loaders can read the whole catalog in one shot instead of re-opening every
+historical collection snapshot in data/processed/.
+
+Ingest appends to data/catalog_manifest.log (one JSON product per line) and
+the log is folded into the manifest once it grows past MANIFEST_JOURNAL_MAX
+entries, so a single-product write doesn't rewrite the whole manifest.
+"""
+
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+MANIFEST_PATH = BASE_DIR / "data" / "catalog_manifest.json"
+JOURNAL_PATH = BASE_DIR / "data" / "catalog_manifest.log"
+
+MANIFEST_VERSION = 1
+
+# Retention policy for *_processed_<timestamp>.json collection snapshots
+SNAPSHOT_KEEP_LATEST = int(os.getenv("SNAPSHOT_KEEP_LATEST", "3"))
+SNAPSHOT_MAX_AGE_DAYS = int(os.getenv("SNAPSHOT_MAX_AGE_DAYS", "30"))
+
+# Upserts appended to the journal before it is folded into the manifest
+MANIFEST_JOURNAL_MAX = int(os.getenv("MANIFEST_JOURNAL_MAX", "500"))
+
+SNAPSHOT_PATTERN = re.compile(r"^(?P<name>.+)_processed_(?P<ts>\d{8}_\d{6})\.json$")
+
+_lock = threading.Lock()
+
+
+@contextmanager
+def _manifest_lock():
+    """
+    Serialize manifest and journal writers across threads and worker
+    processes, so a fold can't drop lines another worker appends meanwhile.
+    """
+    with _lock:
+        lock_path = MANIFEST_PATH.with_suffix(".lock")
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+
+def product_key(product: dict) -> Optional[str]:
+    """
+    Deduplication key for a processed product.
+    Same priority as the legacy loader: product_id > source_url > url > title.
+    """
+    return product.get("product_id") or product.get("source_url") or product.get("url") or product.get("title")
+
+
+def _products_from_file(file_path: Path) -> List[Dict]:
+    """Read a processed JSON file (single product or collection wrapper)."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    if isinstance(data, list):
+        products_list = data
+    elif isinstance(data, dict) and "products" in data:
+        products_list = data["products"]
+    elif isinstance(data, dict):
+        products_list = [data]
+    else:
+        products_list = []
+
+    return [p for p in products_list if isinstance(p, dict)]
+
+
+def _read_manifest() -> Optional[dict]:
+    if not MANIFEST_PATH.exists():
+        return None
+
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Catalog manifest unreadable, will rebuild: {e}")
+        return None
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def _read_journal() -> List[Dict]:
+    """Products appended since the last fold, oldest first."""
+    if not JOURNAL_PATH.exists():
+        return []
+
+    products = []
+    with open(JOURNAL_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                product = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line from an interrupted append
+                continue
+            if isinstance(product, dict):
+                products.append(product)
+    return products
+
+
+def _apply(current: Dict[str, dict], products: List[dict]) -> Dict[str, dict]:
+    for p in products:
+        key = product_key(p)
+        if key:
+            current[key] = p
+    return current
+
+
+def _write_manifest(products: Dict[str, dict]):
+    """
+    Atomically replace the manifest file. Call under _manifest_lock().
+    `products` must already include the journal, which is dropped afterwards.
+    """
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "updated_at": datetime.now().isoformat(),
+        "product_count": len(products),
+        "products": products,
+    }
+
+    tmp_path = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, MANIFEST_PATH)
+    JOURNAL_PATH.unlink(missing_ok=True)
+
+
+def _scan_processed_dir() -> Dict[str, dict]:
+    """
+    Fold every processed file into one record per product.
+    Files are applied oldest first so the newest scrape wins.
+    """
+    products: Dict[str, dict] = {}
+
+    if not PROCESSED_DIR.exists():
+        return products
+
+    json_files = sorted(PROCESSED_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+
+    for file_path in json_files:
+        try:
+            for p in _products_from_file(file_path):
+                key = product_key(p)
+                if key:
+                    products[key] = p
+        except Exception as e:
+            print(f"Error loading {file_path}: {e}")
+
+    return products
+
+
+def _current_products() -> Optional[Dict[str, dict]]:
+    """Manifest records with the journal applied, or None without a manifest."""
+    # Journal first: a fold landing in between then only duplicates entries
+    journal = _read_journal()
+    manifest = _read_manifest()
+    if manifest is None:
+        return None
+    return _apply(manifest["products"], journal)
+
+
+def rebuild_manifest() -> int:
+    """
+    Re-scan data/processed/ and merge it into the existing manifest.
+    Files on disk win, but products whose snapshots were compacted away
+    are kept from the manifest.
+    """
+    with _manifest_lock():
+        products = _current_products() or {}
+        products.update(_scan_processed_dir())
+        _write_manifest(products)
+    print(f"✅ Rebuilt catalog manifest with {len(products)} products.")
+    return len(products)
+
+
+def update_manifest(update: Callable[[dict], bool]) -> int:
+    """
+    Apply `update(product) -> changed` to every manifest record in place.
+    Migrations use this so products that only survive in the manifest
+    are migrated along with the processed files.
+    """
+    with _manifest_lock():
+        products = _current_products()
+        if products is None:
+            products = _scan_processed_dir()
+        changed = sum(1 for p in products.values() if update(p))
+        _write_manifest(products)
+    print(f"✅ Updated {changed} catalog manifest records.")
+    return changed
+
+
+def upsert_products(products: List[dict]):
+    """
+    Incrementally merge freshly processed products into the manifest.
+    Appends to the journal; the manifest itself is only rewritten when the
+    journal is folded.
+    """
+    with _manifest_lock():
+        if _read_manifest() is None:
+            _write_manifest(_apply(_scan_processed_dir(), products))
+            return
+
+        JOURNAL_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(JOURNAL_PATH, "a", encoding="utf-8") as f:
+            for p in products:
+                f.write(json.dumps(p, ensure_ascii=False) + "\n")
+
+        with open(JOURNAL_PATH, "rb") as f:
+            pending = f.read().count(b"\n")
+        if pending >= MANIFEST_JOURNAL_MAX:
+            _write_manifest(_current_products())
+
+
+def load_catalog() -> List[Dict]:
+    """
+    Return the current catalog (one record per product).
+    Builds the manifest on first use if it doesn't exist yet.
+    """
+    products = _current_products()
+    if products is None:
+        if not PROCESSED_DIR.exists():
+            return []
+        rebuild_manifest()
+        products = _current_products()
+        if products is None:
+            return []
+
+    return list(products.values())
+
+
+def _snapshot_timestamp(match: re.Match) -> Optional[datetime]:
+    try:
+        return datetime.strptime(match.group("ts"), "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+def compact_snapshots(
+    keep_latest: int = SNAPSHOT_KEEP_LATEST,
+    max_age_days: int = SNAPSHOT_MAX_AGE_DAYS,
+    dry_run: bool = False,
+) -> List[str]:
+    """
+    Apply the retention policy to historical collection snapshots.
+
+    The manifest is rebuilt first so no product is lost, then for each
+    collection name the newest `keep_latest` snapshots are kept and older
+    ones are deleted once they are past `max_age_days`.
+    Single-product files (<product_id>.json) are never touched.
+
+    Returns the list of deleted (or, with dry_run, deletable) file names.
+    """
+    if not PROCESSED_DIR.exists():
+        return []
+
+    if not dry_run:
+        rebuild_manifest()
+
+    snapshots: Dict[str, list] = {}
+    for file_path in PROCESSED_DIR.glob("*_processed_*.json"):
+        match = SNAPSHOT_PATTERN.match(file_path.name)
+        if not match:
+            continue
+        ts = _snapshot_timestamp(match)
+        if ts is None:
+            continue
+        snapshots.setdefault(match.group("name"), []).append((ts, file_path))
+
+    cutoff = datetime.now() - timedelta(days=max_age_days)
+    removed = []
+
+    for name, files in snapshots.items():
+        files.sort(key=lambda item: item[0], reverse=True)
+        for ts, file_path in files[keep_latest:]:
+            if ts >= cutoff:
+                continue
+            if not dry_run:
+                file_path.unlink(missing_ok=True)
+            removed.append(file_path.name)
+
+    action = "Would remove" if dry_run else "Removed"
+    print(f"🧹 {action} {len(removed)} old snapshots (keep_latest={keep_latest}, max_age_days={max_age_days}).")
+    return removed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compact processed snapshots into the catalog manifest.")
+    parser.add_argument("--keep-latest", type=int, default=SNAPSHOT_KEEP_LATEST)
+    parser.add_argument("--max-age-days", type=int, default=SNAPSHOT_MAX_AGE_DAYS)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    compact_snapshots(args.keep_latest, args.max_age_days, args.dry_run)
@@ -36,6 +36,23 @@ def detect_product_type(title: str) -> str:
     return "single"
 
 
+def update_product_type(product: dict) -> bool:
+    """
+    Set product_type (and metadata.product_type) from the title.
+    Returns True if the product changed.
+    """
+    new_type = detect_product_type(product.get('title', ''))
+    if product.get('product_type', 'single') == new_type:
+        return False
+
+    product['product_type'] = new_type
+
+    # Also update in metadata if it exists
+    if 'metadata' in product and 'product_type' in product['metadata']:
+        product['metadata']['product_type'] = new_type
+    return True
+
+
 def migrate_product_type(data_dir: Path):
     """
     Update product_type field in all JSON files in the data directory.
@@ -59,20 +76,12 @@ def migrate_product_type(data_dir: Path):
             with open(json_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             
-            modified = False
-            
             title = data.get('title', '')
             old_type = data.get('product_type', 'single')
-            new_type = detect_product_type(title)
+            modified = update_product_type(data)
             
-            if old_type != new_type:
-                data['product_type'] = new_type
-                
-                # Also update in metadata if it exists
-                if 'metadata' in data and 'product_type' in data['metadata']:
-                    data['metadata']['product_type'] = new_type
-                
-                modified = True
+            if modified:
+                new_type = data['product_type']
                 updated_products += 1
                 print(f"  ✅ {json_file.name}: {old_type} → {new_type}")
                 print(f"     Title: {title[:80]}...")
@@ -103,6 +112,10 @@ if __name__ == "__main__":
     
     migrate_product_type(DATA_DIR)
     
+    # Migrate the manifest too: it also holds products whose snapshots were compacted
+    from app.services.catalog_manifest import update_manifest
+    update_manifest(update_product_type)
+    
     print("\n✅ Migration complete!")
     print("⚠️ Remember to rebuild the vector index by running:")
     print("   python -m app.services.recommender_system.embed_products")
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 from bs4 import BeautifulSoup
 from app.core.exceptions import APIException
+from app.services.recommender_system.product_digest import build_product_digest
 import re
 
 
@@ -14,6 +15,7 @@ def process_millex_product(raw_data: dict) -> dict:
     - Standardize variant format
     - Extract metadata
     - Add ingestion timestamp
+    - Attach the compact prompt digest used by the recommendation prompt
     
     Args:
         raw_data: Raw product data from Millex scraper
@@ -60,7 +62,7 @@ def process_millex_product(raw_data: dict) -> dict:
             # Extract last segment
             product_id = url_clean.rstrip('/').split('/')[-1]
 
-        return {
+        product = {
             "schema_version": "1.0",
             "source": "millex",
             "product_id": product_id,  # Added product_id
@@ -92,6 +94,8 @@ def process_millex_product(raw_data: dict) -> dict:
                 "product_type": raw_data.get("product_type", "single")
             }
         }
+        product["prompt_digest"] = build_product_digest(product)
+        return product
         
     except Exception as exc:
         raise APIException("PROCESSING_ERROR") from exc
@@ -0,0 +1,283 @@
+"""
+Columnar product attribute table for search-time filtering.
+
+Built once per index load from the vector-store metadata. Row i describes the
+product at FAISS id i, so filters, budget penalties and keyword boosts can be
+evaluated as NumPy operations over an array of candidate ids.
+"""
+
+import numpy as np
+
+from app.services.recommender_system.category_config import NAV_CATEGORIES
+
+DEFAULT_PRODUCT_TYPE = "single"
+
+# Budget rules (see search_service): hard cap at budget + 10%, soft penalty above budget
+BUDGET_HARD_LIMIT = 1.10
+BUDGET_PENALTY = 0.1
+
+# Price facet bucket edges (last bucket is open-ended)
+PRICE_FACET_EDGES = (0, 100, 200, 400, 700, 1000)
+
+
+def _parse_price(raw_price) -> float:
+    if raw_price is None:
+        return np.nan
+    try:
+        return float(raw_price)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+class AttributeTable:
+    """
+    NumPy arrays parallel to the FAISS index:
+    - type_codes:   int16 code per product (see type_vocab)
+    - category_bits: uint64 bitmask words, shape (n, n_words) (see category_vocab)
+    - category_kind: 0 = no/empty category, 1 = single string, 2 = list
+    - prices:       float64, NaN when missing or unparseable
+    - in_stock:     bool
+    - match_text:   pre-lowercased "title category" strings for keyword boosts
+    """
+
+    def __init__(self, products: list[dict]):
+        n = len(products)
+        self.size = n
+        self.all_ids = np.arange(n, dtype=np.int64)
+
+        # Product type codes
+        self.type_vocab: dict[str, int] = {DEFAULT_PRODUCT_TYPE: 0}
+        self.type_codes = np.zeros(n, dtype=np.int16)
+
+        # Category vocabulary (nav categories first so their bits are stable)
+        self.category_vocab: dict[str, int] = {c: i for i, c in enumerate(NAV_CATEGORIES)}
+        for p in products:
+            cats = p.get("category")
+            if isinstance(cats, str):
+                cats = [cats]
+            if isinstance(cats, list):
+                for c in cats:
+                    if isinstance(c, str) and c not in self.category_vocab:
+                        self.category_vocab[c] = len(self.category_vocab)
+
+        n_words = max(1, (len(self.category_vocab) + 63) // 64)
+        self.category_bits = np.zeros((n, n_words), dtype=np.uint64)
+        self.category_kind = np.zeros(n, dtype=np.int8)
+
+        self.prices = np.full(n, np.nan, dtype=np.float64)
+        self.in_stock = np.zeros(n, dtype=bool)
+        match_text = []
+
+        for i, p in enumerate(products):
+            p_type = p.get("product_type", DEFAULT_PRODUCT_TYPE)
+            if p_type not in self.type_vocab:
+                self.type_vocab[p_type] = len(self.type_vocab)
+            self.type_codes[i] = self.type_vocab[p_type]
+
+            cats = p.get("category")
+            if isinstance(cats, str):
+                self.category_kind[i] = 1
+                self._set_bit(i, cats)
+            elif isinstance(cats, list) and cats:
+                self.category_kind[i] = 2
+                for c in cats:
+                    if isinstance(c, str):
+                        self._set_bit(i, c)
+
+            self.prices[i] = _parse_price((p.get("pricing") or {}).get("price"))
+            self.in_stock[i] = bool((p.get("availability") or {}).get("in_stock"))
+
+            # Same text the keyword boost has always matched against
+            match_text.append(f"{p.get('title','')} {p.get('category','')}".lower())
+
+        self.match_text = np.array(match_text, dtype=object)
+
+    def _set_bit(self, row: int, category: str):
+        bit = self.category_vocab[category]
+        self.category_bits[row, bit // 64] |= np.uint64(1 << (bit % 64))
+
+    def has_category(self, ids: np.ndarray, category: str) -> np.ndarray:
+        """Bitmask test: does each product in `ids` carry `category`?"""
+        bit = self.category_vocab.get(category)
+        if bit is None:
+            return np.zeros(len(ids), dtype=bool)
+        word = self.category_bits[ids, bit // 64]
+        return (word & np.uint64(1 << (bit % 64))) != 0
+
+    def filter_mask(
+        self,
+        ids: np.ndarray,
+        product_type: str = "any",
+        category: str | None = None,
+        budget: float | None = None,
+    ) -> np.ndarray:
+        """
+        Boolean mask over `ids` for the hard filters:
+        - product_type ("any" disables it)
+        - category: string categories must match exactly, non-empty lists must
+          contain it, products with no categories pass through
+        - budget: products without a price or above budget + 10% are dropped
+        """
+        mask = np.ones(len(ids), dtype=bool)
+
+        if product_type != "any":
+            code = self.type_vocab.get(product_type)
+            if code is None:
+                return np.zeros(len(ids), dtype=bool)
+            mask &= self.type_codes[ids] == code
+
+        if category:
+            kind = self.category_kind[ids]
+            mask &= (kind == 0) | self.has_category(ids, category)
+
+        if budget:
+            prices = self.prices[ids]
+            with np.errstate(invalid="ignore"):
+                mask &= ~np.isnan(prices) & (prices <= budget * BUDGET_HARD_LIMIT)
+
+        return mask
+
+    def matching_ids(
+        self,
+        product_type: str = "any",
+        category: str | None = None,
+        budget: float | None = None,
+    ) -> np.ndarray | None:
+        """
+        Ids of every product passing the hard filters, or None when no filter
+        is active (the whole catalog is allowed).
+        """
+        if product_type == "any" and not category and not budget:
+            return None
+        mask = self.filter_mask(self.all_ids, product_type, category, budget)
+        return self.all_ids[mask]
+
+    def price_penalty(self, ids: np.ndarray, budget: float | None) -> np.ndarray:
+        """Soft penalty for products priced between budget and budget + 10%."""
+        if not budget:
+            return np.zeros(len(ids), dtype=np.float32)
+        with np.errstate(invalid="ignore"):
+            over = self.prices[ids] > budget
+        return np.where(over, BUDGET_PENALTY, 0.0).astype(np.float32)
+
+    def keyword_scores(self, ids: np.ndarray, keywords: list[str]) -> np.ndarray:
+        """Fraction of `keywords` found (substring match) in each product's title/category."""
+        if not keywords or len(ids) == 0:
+            return np.zeros(len(ids), dtype=np.float32)
+
+        texts = self.match_text[ids]
+        matches = np.zeros(len(ids), dtype=np.float32)
+        for kw in keywords:
+            matches += np.fromiter((kw in t for t in texts), dtype=bool, count=len(texts))
+        return matches / len(keywords)
+
+    def facet_masks(
+        self,
+        ids: np.ndarray,
+        product_type: str | None = None,
+        categories: list[str] | None = None,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        in_stock: bool | None = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        One boolean mask over `ids` per active facet filter. Unlike the chat
+        hard filters these are strict: an explicit category or price range
+        excludes products without categories or prices.
+        - categories: any of the listed categories
+        """
+        masks = {}
+
+        if product_type and product_type != "any":
+            code = self.type_vocab.get(product_type)
+            masks["product_type"] = (
+                self.type_codes[ids] == code if code is not None else np.zeros(len(ids), dtype=bool)
+            )
+
+        if categories:
+            mask = np.zeros(len(ids), dtype=bool)
+            for category in categories:
+                mask |= self.has_category(ids, category)
+            masks["category"] = mask
+
+        if min_price is not None or max_price is not None:
+            prices = self.prices[ids]
+            with np.errstate(invalid="ignore"):
+                mask = ~np.isnan(prices)
+                if min_price is not None:
+                    mask &= prices >= min_price
+                if max_price is not None:
+                    mask &= prices <= max_price
+            masks["price"] = mask
+
+        if in_stock is not None:
+            masks["in_stock"] = self.in_stock[ids] == in_stock
+
+        return masks
+
+    def facet_ids(
+        self,
+        product_type: str | None = None,
+        categories: list[str] | None = None,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        in_stock: bool | None = None,
+        category: str | None = None,
+    ) -> np.ndarray | None:
+        """
+        Ids of every product passing the facet filters, plus an optional
+        `category` applied leniently as in filter_mask (a category detected
+        from the query). None when no filter is active.
+        """
+        masks = list(self.facet_masks(self.all_ids, product_type, categories, min_price, max_price, in_stock).values())
+        if category:
+            masks.append(self.filter_mask(self.all_ids, category=category))
+        if not masks:
+            return None
+        return self.all_ids[np.logical_and.reduce(masks)]
+
+    def facet_counts(self, ids: np.ndarray, masks: dict[str, np.ndarray]) -> dict:
+        """
+        Facet counts over `ids`. Each facet is counted with every *other*
+        active filter applied, so selecting one value still shows the
+        alternatives for that facet.
+        """
+        def rows(facet: str) -> np.ndarray:
+            keep = np.ones(len(ids), dtype=bool)
+            for name, mask in masks.items():
+                if name != facet:
+                    keep &= mask
+            return ids[keep]
+
+        type_names = {code: name for name, code in self.type_vocab.items()}
+        type_counts = np.bincount(self.type_codes[rows("product_type")], minlength=len(type_names))
+
+        category_rows = self.category_bits[rows("category")]
+        bits = np.unpackbits(category_rows.view(np.uint8), axis=1, bitorder="little")
+        category_counts = bits.sum(axis=0)
+
+        prices = self.prices[rows("price")]
+        buckets = np.searchsorted(PRICE_FACET_EDGES, prices[~np.isnan(prices)], side="right") - 1
+        price_counts = np.bincount(buckets[buckets >= 0], minlength=len(PRICE_FACET_EDGES))
+
+        stock = self.in_stock[rows("in_stock")]
+
+        return {
+            "product_type": {
+                type_names[code]: int(count) for code, count in enumerate(type_counts) if count
+            },
+            "category": {
+                name: int(category_counts[bit])
+                for name, bit in self.category_vocab.items()
+                if bit < len(category_counts) and category_counts[bit]
+            },
+            "price": [
+                {
+                    "min": low,
+                    "max": PRICE_FACET_EDGES[i + 1] if i + 1 < len(PRICE_FACET_EDGES) else None,
+                    "count": int(price_counts[i]),
+                }
+                for i, low in enumerate(PRICE_FACET_EDGES)
+            ],
+            "in_stock": {"true": int(stock.sum()), "false": int(len(stock) - stock.sum())},
+        }
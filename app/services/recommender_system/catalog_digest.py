@@ -0,0 +1,157 @@
+"""
+Catalog digest: a compact description of the whole catalog (counts, stock,
+price ranges, category groups) built with the vector store and saved next to
+it (vector_store/catalog_digest.json).
+
+"What do you sell?" answers are generated from the digest rather than from a
+line per product, and the generated overview is stored in the same file under
+the catalog_version it describes, so it is produced once per catalog change.
+"""
+
+import hashlib
+import json
+import os
+import statistics
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.services.recommender_system.attribute_table import PRICE_FACET_EDGES
+
+# Titles listed per category group in the digest
+DIGEST_EXAMPLES_PER_GROUP = 5
+UNCATEGORIZED = "uncategorized"
+
+
+def product_price(product: dict) -> float | None:
+    """Listed price, or the cheapest variant's."""
+    price = (product.get("pricing") or {}).get("price")
+    if price:
+        try:
+            return float(price)
+        except (ValueError, TypeError):
+            pass
+    prices = []
+    for variant in product.get("variants") or []:
+        try:
+            prices.append(float(variant.get("price")))
+        except (ValueError, TypeError):
+            continue
+    return min(prices) if prices else None
+
+
+def _in_stock(product: dict) -> bool:
+    return bool((product.get("availability") or {}).get("in_stock"))
+
+
+def _categories(product: dict) -> list[str]:
+    category = product.get("category")
+    if isinstance(category, str):
+        category = [category]
+    return [c for c in (category or []) if c] or [UNCATEGORIZED]
+
+
+def catalog_version(products: list[dict]) -> str:
+    """Content hash of everything the digest is built from."""
+    fingerprint = [
+        (p.get("product_id"), p.get("title"), p.get("product_type"), _categories(p), product_price(p), _in_stock(p))
+        for p in products
+    ]
+    return hashlib.sha256(json.dumps(fingerprint, ensure_ascii=False).encode()).hexdigest()[:16]
+
+
+def _price_range(prices: list[float]) -> dict | None:
+    if not prices:
+        return None
+    return {"min": min(prices), "median": statistics.median(prices), "max": max(prices)}
+
+
+def build_catalog_digest(products: list[dict]) -> dict:
+    groups: dict[str, list[dict]] = {}
+    for p in products:
+        for category in _categories(p):
+            groups.setdefault(category, []).append(p)
+
+    edges = list(PRICE_FACET_EDGES) + [float("inf")]
+    prices = [price for price in map(product_price, products) if price is not None]
+
+    type_counts: dict[str, int] = {}
+    for p in products:
+        product_type = p.get("product_type") or "single"
+        type_counts[product_type] = type_counts.get(product_type, 0) + 1
+
+    return {
+        "catalog_version": catalog_version(products),
+        "product_count": len(products),
+        "in_stock": sum(_in_stock(p) for p in products),
+        "product_types": type_counts,
+        "price": _price_range(prices),
+        "price_bands": [
+            {"min": low, "max": None if high == float("inf") else high,
+             "count": sum(low <= price < high for price in prices)}
+            for low, high in zip(edges, edges[1:])
+        ],
+        "categories": [
+            {
+                "category": category,
+                "count": len(members),
+                "in_stock": sum(_in_stock(p) for p in members),
+                "price": _price_range([x for x in map(product_price, members) if x is not None]),
+                "examples": [p.get("title") for p in members[:DIGEST_EXAMPLES_PER_GROUP] if p.get("title")],
+            }
+            for category, members in sorted(groups.items(), key=lambda item: -len(item[1]))
+        ],
+    }
+
+
+def _rupees(value: float) -> str:
+    return f"₹{value:g}"
+
+
+def digest_text(digest: dict) -> str:
+    """The digest as a short plain-text block for an LLM prompt."""
+    types = ", ".join(f"{count} {name}" for name, count in digest["product_types"].items())
+    lines = [f"Products: {digest['product_count']} ({types}); {digest['in_stock']} in stock"]
+
+    if digest["price"]:
+        price = digest["price"]
+        lines.append(
+            f"Prices: {_rupees(price['min'])} to {_rupees(price['max'])}, median {_rupees(price['median'])}"
+        )
+        bands = [
+            f"{_rupees(b['min'])}+" if b["max"] is None else f"{_rupees(b['min'])}-{_rupees(b['max'])}"
+            for b in digest["price_bands"] if b["count"]
+        ]
+        counts = [b["count"] for b in digest["price_bands"] if b["count"]]
+        lines.append("Price bands: " + ", ".join(f"{band}: {n}" for band, n in zip(bands, counts)))
+
+    lines.append("Categories:")
+    for group in digest["categories"]:
+        price = group["price"]
+        price_str = f", {_rupees(price['min'])}-{_rupees(price['max'])}" if price else ""
+        lines.append(
+            f"- {group['category']}: {group['count']} products ({group['in_stock']} in stock{price_str}); "
+            f"e.g. {'; '.join(group['examples'])}"
+        )
+    return "\n".join(lines)
+
+
+def save_catalog_digest(path: Path, digest: dict, summary: str | None = None):
+    """Write the digest and its generated overview (if any) atomically."""
+    record = {
+        "catalog_version": digest["catalog_version"],
+        "digest": digest,
+        "summary": summary,
+        "summary_generated_at": datetime.now(timezone.utc).isoformat() if summary else None,
+    }
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_catalog_digest(path: Path) -> dict | None:
+    """{catalog_version, digest, summary, summary_generated_at}, or None when missing."""
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,102 @@
+"""
+Slim search records and lazily fetched full product documents.
+
+The search process keeps only a compact record per product in memory
+(id, title, price, type, categories, stock, thumbnail). Full documents
+(description, description_html, variants, images, ...) live in a SQLite file
+next to the FAISS index and are fetched by FAISS id only for returned hits.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# Fields kept in memory for filtering, ranking and result cards
+SLIM_FIELDS = ("product_id", "title", "product_type", "category", "source_url")
+
+
+def slim_record(product: dict) -> dict:
+    """Compact in-memory record. Keeps the original key layout so filters work unchanged."""
+    pricing = product.get("pricing") or {}
+    availability = product.get("availability") or {}
+    images = product.get("images") or []
+
+    thumbnail = None
+    if images:
+        first = images[0]
+        thumbnail = first.get("url") if isinstance(first, dict) else first
+
+    record = {field: product.get(field) for field in SLIM_FIELDS}
+    record["pricing"] = {"price": pricing.get("price"), "currency": pricing.get("currency")}
+    record["availability"] = {"in_stock": availability.get("in_stock")}
+    record["thumbnail"] = thumbnail
+    return record
+
+
+def build_document_store(path: Path, products: list[dict]):
+    """Write full documents keyed by FAISS id (list position). Replaces the file atomically."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE documents (doc_id INTEGER PRIMARY KEY, product_id TEXT, body TEXT NOT NULL)")
+        conn.executemany(
+            "INSERT INTO documents (doc_id, product_id, body) VALUES (?, ?, ?)",
+            (
+                (i, p.get("product_id"), json.dumps(p, ensure_ascii=False))
+                for i, p in enumerate(products)
+            ),
+        )
+        conn.execute("CREATE INDEX idx_documents_product_id ON documents (product_id)")
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, path)
+
+
+class DocumentStore:
+    """Read-only access to the SQLite document file (one connection per thread)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, doc_ids: list[int]) -> list[dict | None]:
+        """Full documents for `doc_ids`, in the same order (None if missing)."""
+        if not doc_ids:
+            return []
+        ids = [int(i) for i in doc_ids]
+        placeholders = ",".join("?" * len(ids))
+        rows = self._conn().execute(
+            f"SELECT doc_id, body FROM documents WHERE doc_id IN ({placeholders})", ids
+        ).fetchall()
+        by_id = {doc_id: json.loads(body) for doc_id, body in rows}
+        return [by_id.get(i) for i in ids]
+
+
+class MemoryDocumentStore:
+    """Fallback for vector stores built before the SQLite document file existed."""
+
+    def __init__(self, products: list[dict]):
+        self.products = products
+
+    def get_many(self, doc_ids: list[int]) -> list[dict | None]:
+        return [self.products[int(i)] if 0 <= int(i) < len(self.products) else None for i in doc_ids]
+
+
+def project(record: dict, fields: list[str] | None) -> dict:
+    """Keep only the requested top-level fields (all when fields is None)."""
+    if fields is None:
+        return dict(record)
+    return {f: record[f] for f in fields if f in record}
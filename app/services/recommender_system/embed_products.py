@@ -1,20 +1,49 @@
 import json
+import os
 import faiss
+from datetime import datetime, timezone
 from pathlib import Path
-from app.services.recommender_system.embedding_utils import embed_texts
+from app.services.recommender_system.embedding_utils import embed_texts, get_provider
 from app.services.recommender_system.json_to_text import get_product_texts
+from app.services.recommender_system.index_factory import build_index, describe_index
+from app.services.recommender_system.lexical_index import LexicalIndex
+from app.services.recommender_system.document_store import build_document_store, slim_record
+from app.services.recommender_system.similar_graph import build_similar_graph, save_similar_graph
+from app.services.recommender_system.catalog_digest import build_catalog_digest, load_catalog_digest, save_catalog_digest
+from app.services.recommender_system.product_digest import product_digest
 
 
 # Paths
 BASE_DIR = Path(__file__).resolve().parent
 VECTOR_STORE = BASE_DIR / "vector_store"
+STORE_INFO_PATH = VECTOR_STORE / "store_info.json"
+LEXICAL_PATH = VECTOR_STORE / "lexical_index.json"
+SLIM_META_PATH = VECTOR_STORE / "products_slim.json"
+DOCUMENTS_PATH = VECTOR_STORE / "products.db"
+SIMILAR_PATH = VECTOR_STORE / "similar.npz"
+DIGEST_PATH = VECTOR_STORE / "catalog_digest.json"
+
+# Generate the website_info overview during the rebuild (else on first request)
+PRECOMPUTE_CATALOG_SUMMARY = os.getenv("PRECOMPUTE_CATALOG_SUMMARY", "true").lower() == "true"
+
+
+def _write_json(path: Path, data, **dump_args):
+    """Write JSON atomically, so a reader never sees a half-written file."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **dump_args)
+    os.replace(tmp_path, path)
 
 
 def generate_product_embeddings() -> int:
     """
     Regenerate embeddings for ALL processed products.
-    Uses OpenAI embeddings + FAISS (cosine similarity).
-    Saves index and metadata.
+    Uses the configured embedding provider + FAISS (cosine similarity).
+    Saves index, metadata and store info (provider + dimension).
+
+    Every file is replaced atomically and store_info.json is written last:
+    it is the version marker search_service reloads on, so a running server
+    never switches to a half-written store.
     """
 
     VECTOR_STORE.mkdir(exist_ok=True)
@@ -30,25 +59,75 @@ def generate_product_embeddings() -> int:
         print("No products found to embed.")
         return 0
 
-    # 2. Generate embeddings (OpenAI)
-    print(f"Generating embeddings for {len(products)} products...")
+    # 2. Generate embeddings (configured provider)
+    provider = get_provider()
+    print(f"Generating embeddings for {len(products)} products with {provider.provider_id}...")
     embeddings = embed_texts(product_texts)
 
     # 3. Normalize embeddings for cosine similarity
     faiss.normalize_L2(embeddings)
 
-    # 4. Create FAISS index (cosine similarity via Inner Product)
+    # 4. Create FAISS index (cosine similarity via Inner Product; type from INDEX_TYPE)
     dimension = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dimension)
-    index.add(embeddings)
-
-    # 5. Save index and metadata
-    faiss.write_index(index, str(INDEX_PATH))
+    index, index_type = build_index(embeddings)
+    layout = describe_index(index)
+    print(f"Built '{index_type}' index over {index.ntotal} vectors ({layout['encoding']}, pca_dim={layout['pca_dim']}).")
+
+    # 5. Save index and metadata (prompt digests filled in for products processed before they existed).
+    # Replaced, not overwritten: running workers may have the old index memory-mapped
+    tmp_index = INDEX_PATH.with_suffix(".index.tmp")
+    faiss.write_index(index, str(tmp_index))
+    os.replace(tmp_index, INDEX_PATH)
+
+    for p in products:
+        p["prompt_digest"] = product_digest(p)
+
+    _write_json(META_PATH, products, indent=2)
+
+    # 6. BM25 inverted index over the same products (ids match the FAISS index)
+    tmp_lexical = LEXICAL_PATH.with_suffix(".json.tmp")
+    LexicalIndex.build(products).save(tmp_lexical)
+    os.replace(tmp_lexical, LEXICAL_PATH)
+
+    # 7. Slim records for the search process + full documents for lazy lookup by id
+    _write_json(SLIM_META_PATH, [slim_record(p) for p in products])
+    build_document_store(DOCUMENTS_PATH, products)
+
+    # 8. "Similar products" graph: one batch self-search over the new index
+    similar_ids, similar_scores = build_similar_graph(index, embeddings)
+    save_similar_graph(SIMILAR_PATH, similar_ids, similar_scores)
+
+    # 9. Catalog digest for website_info answers; its LLM overview is kept while the catalog is unchanged
+    digest = build_catalog_digest(products)
+    previous = load_catalog_digest(DIGEST_PATH)
+    summary = None
+    if previous and previous.get("catalog_version") == digest["catalog_version"]:
+        summary = previous.get("summary")
+    save_catalog_digest(DIGEST_PATH, digest, summary)
+
+    # 10. Store info last: records which provider built this store (so it is never
+    # queried with other vectors) and marks the new store complete
+    store_info = {
+        "provider": provider.provider_id,
+        "dimension": int(dimension),
+        "index_type": index_type,
+        **layout,
+        "similar_graph_size": int(similar_ids.shape[1]),
+        "product_count": len(products),
+        "catalog_version": digest["catalog_version"],
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    }
+    _write_json(STORE_INFO_PATH, store_info, indent=2)
+    print(f"✅ Indexed {len(products)} products.")
 
-    with open(META_PATH, "w", encoding="utf-8") as f:
-        json.dump(products, f, indent=2, ensure_ascii=False)
+    # 11. The website_info overview (an LLM call); the store is already live without it
+    if summary is None and PRECOMPUTE_CATALOG_SUMMARY:
+        try:
+            from app.services.ai.reasoning_engine import precompute_catalog_summary
+            precompute_catalog_summary(DIGEST_PATH)
+        except Exception as e:
+            print(f"⚠️ Catalog summary not generated ({e}); it will be generated on first request.")
 
-    print(f"✅ Indexed {len(products)} products.")
     return len(products)
 
 
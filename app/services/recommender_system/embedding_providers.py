@@ -0,0 +1,203 @@
+"""
+Embedding provider backends.
+
+Every provider turns a list of texts into a float32 matrix and reports a
+stable `provider_id` and `dimension`, which are recorded with each vector
+store so an index is never queried with vectors from a different model.
+
+- OpenAIEmbeddingProvider: OpenAI embeddings API (network)
+- SentenceTransformerProvider: local in-process model, batched CPU inference,
+  optionally via ONNX Runtime or int8 dynamic quantization
+- HashingEmbeddingProvider: deterministic feature hashing, for offline tests
+"""
+
+import hashlib
+import re
+
+import numpy as np
+
+
+class EmbeddingProvider:
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def provider_id(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    @property
+    def dimension(self) -> int:
+        raise NotImplementedError
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Return np.ndarray of shape (len(texts), dimension), dtype float32."""
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    name = "openai"
+
+    KNOWN_DIMENSIONS = {
+        "text-embedding-3-small": 1536,
+        "text-embedding-3-large": 3072,
+        "text-embedding-ada-002": 1536,
+    }
+
+    # The embeddings API accepts at most 2048 inputs per request
+    MAX_BATCH = 1000
+
+    # Models that can return shortened vectors via the `dimensions` parameter
+    SHORTENABLE_MODELS = ("text-embedding-3-small", "text-embedding-3-large")
+
+    def __init__(self, model: str, api_key: str | None, dimensions: int | None = None):
+        super().__init__(model)
+        if dimensions and model not in self.SHORTENABLE_MODELS:
+            raise ValueError(f"Model '{model}' does not support reduced dimensions")
+        self.api_key = api_key
+        self.dimensions = dimensions or None
+        self._client = None
+        self._dimension = self.dimensions or self.KNOWN_DIMENSIONS.get(model)
+
+    @property
+    def provider_id(self) -> str:
+        # Shortened vectors are a different embedding space from the full ones
+        if self.dimensions:
+            return f"{self.name}:{self.model}:{self.dimensions}d"
+        return super().provider_id
+
+    @property
+    def client(self):
+        if self._client is None:
+            if not self.api_key:
+                raise RuntimeError("OPENAI_API_KEY not found in environment variables")
+            from openai import OpenAI
+            from app.services.ai.llm_client import OPENAI_MAX_RETRIES, OPENAI_TIMEOUT
+            self._client = OpenAI(api_key=self.api_key, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+        return self._client
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = self.embed(["dimension probe"]).shape[1]
+        return self._dimension
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.MAX_BATCH):
+            options = {"dimensions": self.dimensions} if self.dimensions else {}
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=texts[start:start + self.MAX_BATCH],
+                **options,
+            )
+            vectors.extend(item.embedding for item in response.data)
+
+        embeddings = np.array(vectors, dtype=np.float32)
+        self._dimension = embeddings.shape[1]
+        return embeddings
+
+
+class SentenceTransformerProvider(EmbeddingProvider):
+    name = "local"
+
+    def __init__(
+        self,
+        model: str,
+        batch_size: int = 64,
+        backend: str = "torch",
+        quantize: bool = False,
+        onnx_file: str | None = None,
+    ):
+        super().__init__(model)
+        self.batch_size = batch_size
+        self.backend = backend
+        self.quantize = quantize
+        self.onnx_file = onnx_file
+        self._model = None
+
+    @property
+    def provider_id(self) -> str:
+        # Quantized / ONNX variants produce slightly different vectors
+        variant = self.backend
+        if self.quantize:
+            variant += "-int8"
+        return f"{self.name}:{self.model}:{variant}"
+
+    def _load(self):
+        if self._model is not None:
+            return self._model
+
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_PROVIDER=local requires sentence-transformers (pip install -r requirement.txt)"
+            ) from e
+
+        kwargs = {"device": "cpu"}
+        if self.backend != "torch":
+            kwargs["backend"] = self.backend
+            if self.onnx_file:
+                kwargs["model_kwargs"] = {"file_name": self.onnx_file}
+
+        model = SentenceTransformer(self.model, **kwargs)
+
+        if self.quantize and self.backend == "torch":
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        self._model = model
+        return model
+
+    @property
+    def dimension(self) -> int:
+        return self._load().get_sentence_embedding_dimension()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        embeddings = self._load().encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Bag of word tokens and character trigrams hashed into signed buckets.
+    Deterministic across processes and machines; no model download, no network.
+    """
+    name = "hashing"
+
+    def __init__(self, model: str = "hashing-v1", dimension: int = 256):
+        super().__init__(model)
+        self._dimension = dimension
+
+    @property
+    def provider_id(self) -> str:
+        return f"{self.name}:{self.model}:{self._dimension}"
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _features(self, text: str) -> list[str]:
+        tokens = re.findall(r"\w+", text.lower())
+        features = list(tokens)
+        for token in tokens:
+            padded = f"#{token}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self._dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                h = int.from_bytes(digest, "little")
+                sign = 1.0 if (h >> 63) & 1 else -1.0
+                out[row, h % self._dimension] += sign
+        return out
@@ -1,19 +1,75 @@
 import os
 import numpy as np
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from app.services.recommender_system.embedding_providers import (
+    EmbeddingProvider,
+    OpenAIEmbeddingProvider,
+    SentenceTransformerProvider,
+    HashingEmbeddingProvider,
+)
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Read from .env (load_dotenv should be called once in main.py)
+# Provider selection: openai (default) | local | hashing
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+
+DEFAULT_MODELS = {
+    "openai": "text-embedding-3-small",
+    "local": "sentence-transformers/all-MiniLM-L6-v2",
+    "hashing": "hashing-v1",
+}
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", DEFAULT_MODELS.get(EMBEDDING_PROVIDER, ""))
+# Shortened OpenAI vectors (text-embedding-3-*), e.g. 512 instead of 1536; 0 = native size
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0"))
+
+# Local (sentence-transformers) options
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+LOCAL_EMBEDDING_BACKEND = os.getenv("LOCAL_EMBEDDING_BACKEND", "torch")  # torch | onnx
+LOCAL_EMBEDDING_QUANTIZE = os.getenv("LOCAL_EMBEDDING_QUANTIZE", "false").lower() == "true"
+LOCAL_EMBEDDING_ONNX_FILE = os.getenv("LOCAL_EMBEDDING_ONNX_FILE") or None
+
+# Hashing embedder options
+HASHING_EMBEDDING_DIM = int(os.getenv("HASHING_EMBEDDING_DIM", "256"))
+
+_provider: EmbeddingProvider | None = None
+
+
+def create_provider(name: str = EMBEDDING_PROVIDER, model: str = EMBEDDING_MODEL) -> EmbeddingProvider:
+    """
+    Build an embedding provider from configuration.
+    """
+    if name == "openai":
+        return OpenAIEmbeddingProvider(model, api_key=OPENAI_API_KEY, dimensions=EMBEDDING_DIMENSIONS)
+    if name == "local":
+        return SentenceTransformerProvider(
+            model,
+            batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+            backend=LOCAL_EMBEDDING_BACKEND,
+            quantize=LOCAL_EMBEDDING_QUANTIZE,
+            onnx_file=LOCAL_EMBEDDING_ONNX_FILE,
+        )
+    if name == "hashing":
+        return HashingEmbeddingProvider(model, dimension=HASHING_EMBEDDING_DIM)
+
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER '{name}' (expected openai, local or hashing)")
+
 
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY not found in environment variables")
+def get_provider() -> EmbeddingProvider:
+    """The configured embedding provider (created once per process)."""
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+    return _provider
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+
+def set_provider(provider: EmbeddingProvider | None):
+    """Swap the active provider (tests, offline tooling). None resets to configuration."""
+    global _provider
+    _provider = provider
 
 
 def embed_texts(texts: list[str]) -> np.ndarray:
@@ -29,14 +85,4 @@ def embed_texts(texts: list[str]) -> np.ndarray:
     if not texts:
         raise ValueError("embed_texts received empty input")
 
-    response = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=texts
-    )
-
-    embeddings = [item.embedding for item in response.data]
-
-    # Convert to numpy float32 for FAISS
-    embeddings_np = np.array(embeddings, dtype=np.float32)
-
-    return embeddings_np
+    return get_provider().embed(texts)
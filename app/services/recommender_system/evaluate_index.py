@@ -0,0 +1,153 @@
+"""
+Recall / latency / memory evaluation for the FAISS index types.
+
+Builds every configured index type × vector encoding × PCA dimension over
+the same vectors and reports, per configuration: recall@k against exact
+float32 search, p50/p99 single-query latency, bytes per vector, serialized
+index size (the file size; roughly what a fully loaded index holds, of which
+only the vector codes are shared when memory-mapped) and build time.
+
+Usage:
+    python -m app.services.recommender_system.evaluate_index            # current vector store
+    python -m app.services.recommender_system.evaluate_index --synthetic 200000 --dim 384
+    python -m app.services.recommender_system.evaluate_index --synthetic 50000 --dim 1536 \
+        --types flat,hnsw --encodings float32,fp16,int8 --pca-dims 0,512,256
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from app.services.recommender_system import index_factory
+
+DEFAULT_QUERIES = 200
+
+
+def load_store_vectors() -> np.ndarray:
+    """
+    Vectors of the current vector store. For a compressed store these are the
+    decoded (approximate) vectors, so build it as float32 to get a fair baseline.
+    """
+    from app.services.recommender_system.search_service import INDEX_PATH
+
+    index = index_factory.read_index(INDEX_PATH, mmap=False)
+    index_factory.configure_search(index)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Clustered random vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, n // 500)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, n_clusters, n)
+    vectors = centers[assignment] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_queries(vectors: np.ndarray, n_queries: int, seed: int = 1) -> np.ndarray:
+    """Perturbed copies of stored vectors (queries land near, not on, products)."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(vectors), n_queries)
+    queries = vectors[picks] + 0.1 * rng.standard_normal((n_queries, vectors.shape[1])).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def evaluate(
+    vectors: np.ndarray,
+    index_types: list[str],
+    k: int = 10,
+    n_queries: int = DEFAULT_QUERIES,
+    encodings: list[str] = ("float32",),
+    pca_dims: list[int] = (0,),
+) -> list[dict]:
+    queries = make_queries(vectors, n_queries)
+
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    configurations = [
+        (index_type, encoding, pca_dim)
+        for index_type in index_types
+        for encoding in encodings
+        for pca_dim in pca_dims
+    ]
+
+    report = []
+    for index_type, encoding, pca_dim in configurations:
+        start = time.perf_counter()
+        index, resolved = index_factory.build_index(vectors, index_type, encoding=encoding, pca_dim=pca_dim)
+        build_seconds = time.perf_counter() - start
+        layout = index_factory.describe_index(index)
+
+        latencies = []
+        found = np.empty((n_queries, k), dtype=np.int64)
+        for i in range(n_queries):
+            t0 = time.perf_counter()
+            _, ids = index.search(queries[i:i + 1], k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found[i] = ids[0]
+
+        report.append({
+            "index_type": resolved if index_type != "auto" else f"auto→{resolved}",
+            "encoding": layout["encoding"],
+            "dim": layout["pca_dim"] or vectors.shape[1],
+            f"recall@{k}": round(recall_at_k(found, truth), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "bytes_per_vector": layout["bytes_per_vector"],
+            "index_mb": round(len(faiss.serialize_index(index)) / 1e6, 2),
+            "build_s": round(build_seconds, 2),
+        })
+
+    return report
+
+
+def print_report(report: list[dict], n_vectors: int, dim: int):
+    print(f"\n📊 {n_vectors} vectors × {dim} dims, single-query latency")
+    if not report:
+        return
+    headers = list(report[0].keys())
+    widths = [max(len(h), *(len(str(r[h])) for r in report)) for h in headers]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for row in report:
+        print("  ".join(str(row[h]).ljust(w) for h, w in zip(headers, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate FAISS index types and encodings: recall@k, latency, index size.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead of the vector store")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--types", default=",".join(index_factory.INDEX_TYPES))
+    parser.add_argument("--encodings", default=index_factory.VECTOR_ENCODING, help="e.g. float32,fp16,int8")
+    parser.add_argument("--pca-dims", default=str(index_factory.VECTOR_PCA_DIM), help="e.g. 0,512,256 (0 = no PCA)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--nprobe", type=int, default=index_factory.IVF_NPROBE)
+    parser.add_argument("--ef-search", type=int, default=index_factory.HNSW_EF_SEARCH)
+    args = parser.parse_args()
+
+    index_factory.IVF_NPROBE = args.nprobe
+    index_factory.HNSW_EF_SEARCH = args.ef_search
+
+    vectors = synthetic_vectors(args.synthetic, args.dim) if args.synthetic else load_store_vectors()
+    report = evaluate(
+        vectors,
+        args.types.split(","),
+        k=args.k,
+        n_queries=args.queries,
+        encodings=args.encodings.split(","),
+        pca_dims=[int(d) for d in args.pca_dims.split(",")],
+    )
+    print_report(report, *vectors.shape)
@@ -0,0 +1,244 @@
+"""
+FAISS index construction for the product vector store.
+
+Index types (all inner product over L2-normalised vectors, i.e. cosine):
+- flat:    exact brute force (IndexFlatIP)
+- hnsw:    graph-based ANN (IndexHNSWFlat)
+- ivf_flat: inverted lists with full vectors (IndexIVFFlat)
+- ivf_pq:  inverted lists with product-quantised codes (IndexIVFPQ)
+- auto:    picked from catalog size, see select_index_type()
+
+Compact storage (applies to flat, hnsw and ivf_flat; ivf_pq is already compressed):
+- VECTOR_ENCODING: float32 (default), fp16 (half the memory) or int8 (a quarter),
+  via FAISS scalar quantizers
+- VECTOR_PCA_DIM: project vectors to fewer dimensions at build time (PCA,
+  trained on the catalog); queries go through the same transform
+- VECTOR_MMAP: open the index memory-mapped so worker processes share the
+  vector codes through the page cache instead of each holding a private copy.
+  Uses IO_FLAG_MMAP_IFC, which maps flat codes (IndexFlat, scalar quantizer,
+  HNSW storage) as well as IVF inverted lists; plain IO_FLAG_MMAP only maps
+  IVF lists and still copies flat and HNSW vectors. HNSW graph links and IVF
+  centroids are always read into private memory.
+"""
+
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPE = os.getenv("INDEX_TYPE", "auto").lower()
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+# Build parameters
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 = 4 * sqrt(n)
+PQ_M = int(os.getenv("PQ_M", "0"))            # 0 = largest divisor of dim <= min(64, dim / 4)
+PQ_NBITS = int(os.getenv("PQ_NBITS", "8"))
+TRAIN_SAMPLE = int(os.getenv("INDEX_TRAIN_SAMPLE", "100000"))  # max vectors used to train IVF/PQ
+
+# Compact storage
+VECTOR_ENCODING = os.getenv("VECTOR_ENCODING", "float32").lower()
+VECTOR_ENCODINGS = ("float32", "fp16", "int8")
+VECTOR_PCA_DIM = int(os.getenv("VECTOR_PCA_DIM", "0"))  # 0 = keep the embedding dimension
+VECTOR_MMAP = os.getenv("VECTOR_MMAP", "true").lower() == "true"
+
+_SQ_TYPES = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+# Search parameters
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+
+# Auto-selection thresholds (number of vectors)
+AUTO_FLAT_MAX = int(os.getenv("AUTO_FLAT_MAX", "50000"))
+AUTO_HNSW_MAX = int(os.getenv("AUTO_HNSW_MAX", "1000000"))
+
+
+def select_index_type(n_vectors: int) -> str:
+    """
+    Exact search up to tens of thousands of vectors, HNSW up to ~10^6,
+    IVF-PQ beyond that where full-precision vectors stop fitting in memory.
+    """
+    if n_vectors <= AUTO_FLAT_MAX:
+        return "flat"
+    if n_vectors <= AUTO_HNSW_MAX:
+        return "hnsw"
+    return "ivf_pq"
+
+
+def _nlist(n_vectors: int) -> int:
+    nlist = IVF_NLIST or int(4 * math.sqrt(n_vectors))
+    # FAISS wants roughly >= 39 training points per centroid
+    return max(1, min(nlist, n_vectors // 39 or 1))
+
+
+def _pq_m(dimension: int) -> int:
+    if PQ_M:
+        return PQ_M
+    for m in range(max(1, min(64, dimension // 4)), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def build_index(
+    embeddings: np.ndarray,
+    index_type: str = INDEX_TYPE,
+    encoding: str = VECTOR_ENCODING,
+    pca_dim: int = VECTOR_PCA_DIM,
+) -> tuple[faiss.Index, str]:
+    """
+    Build and populate an index over normalised embeddings.
+    IVF variants, scalar quantizers and PCA are trained on the embeddings
+    inside the build. Returns (index, resolved index type).
+    """
+    n_vectors, dimension = embeddings.shape
+
+    if index_type == "auto":
+        index_type = select_index_type(n_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown INDEX_TYPE '{index_type}' (expected auto, {', '.join(INDEX_TYPES)})")
+    if encoding not in VECTOR_ENCODINGS:
+        raise ValueError(f"Unknown VECTOR_ENCODING '{encoding}' (expected {', '.join(VECTOR_ENCODINGS)})")
+
+    # PCA needs at least as many training vectors as output dimensions
+    reduced = min(pca_dim, dimension, n_vectors) if pca_dim else dimension
+    sq_type = _SQ_TYPES.get(encoding)
+
+    if index_type == "flat":
+        if sq_type is None:
+            index = faiss.IndexFlatIP(reduced)
+        else:
+            index = faiss.IndexScalarQuantizer(reduced, sq_type, faiss.METRIC_INNER_PRODUCT)
+
+    elif index_type == "hnsw":
+        if sq_type is None:
+            index = faiss.IndexHNSWFlat(reduced, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexHNSWSQ(reduced, sq_type, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+
+    elif index_type == "ivf_flat":
+        quantizer = faiss.IndexFlatIP(reduced)
+        if sq_type is None:
+            index = faiss.IndexIVFFlat(quantizer, reduced, _nlist(n_vectors), faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(
+                quantizer, reduced, _nlist(n_vectors), sq_type, faiss.METRIC_INNER_PRODUCT
+            )
+
+    else:  # ivf_pq
+        quantizer = faiss.IndexFlatIP(reduced)
+        nbits = PQ_NBITS if n_vectors >= 2 ** PQ_NBITS * 39 else max(1, int(math.log2(max(n_vectors // 39, 2))))
+        index = faiss.IndexIVFPQ(
+            quantizer, reduced, _nlist(n_vectors), _pq_m(reduced), nbits, faiss.METRIC_INNER_PRODUCT
+        )
+
+    if reduced != dimension:
+        # PCA, then re-normalise so inner product stays cosine in the reduced space
+        base = index
+        index = faiss.IndexPreTransform(base)
+        index.prepend_transform(faiss.NormalizationTransform(reduced, 2.0))
+        index.prepend_transform(faiss.PCAMatrix(dimension, reduced))
+
+    if not index.is_trained:
+        train = embeddings
+        if n_vectors > TRAIN_SAMPLE:
+            rng = np.random.default_rng(0)
+            train = embeddings[rng.choice(n_vectors, TRAIN_SAMPLE, replace=False)]
+        index.train(train)
+    index.add(embeddings)
+
+    configure_search(index)
+    return index, index_type
+
+
+def _base_index(index: faiss.Index) -> faiss.Index:
+    """The searchable index underneath an optional PCA wrapper."""
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexPreTransform):
+        base = faiss.downcast_index(base.index)
+    return base
+
+
+def describe_index(index: faiss.Index) -> dict:
+    """Storage layout of an index, recorded in store_info and reported by the evaluator."""
+    base = _base_index(index)
+    storage = base.storage if isinstance(base, faiss.IndexHNSW) else base
+    storage = faiss.downcast_index(storage)
+
+    encoding = "float32"
+    if isinstance(storage, faiss.IndexIVFPQ):
+        encoding = "pq"
+    elif isinstance(storage, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        encoding = "fp16" if storage.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+
+    return {
+        "encoding": encoding,
+        "pca_dim": int(base.d) if base.d != index.d else None,
+        "bytes_per_vector": int(getattr(storage, "code_size", 0) or 4 * base.d),
+    }
+
+
+def read_index(path, mmap: bool = VECTOR_MMAP) -> faiss.Index:
+    """
+    Open a saved index. With mmap the vector codes stay in the page cache,
+    shared by every worker process that opens the same file.
+    """
+    if mmap:
+        # Older FAISS builds lack the in-place flag: there only IVF lists are mapped
+        flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        try:
+            return faiss.read_index(str(path), flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            print(f"⚠️ Memory-mapped load failed ({e}), reading index into memory.")
+    return faiss.read_index(str(path))
+
+
+def transform_queries(index: faiss.Index, queries: np.ndarray) -> np.ndarray:
+    """Apply the index's PCA chain to query vectors (identity for plain indexes)."""
+    wrapper = faiss.downcast_index(index)
+    if not isinstance(wrapper, faiss.IndexPreTransform):
+        return queries
+    for i in range(wrapper.chain.size()):
+        queries = faiss.downcast_VectorTransform(wrapper.chain.at(i)).apply(queries)
+    return queries
+
+
+def reconstruct_subset(index: faiss.Index, ids: np.ndarray) -> np.ndarray | None:
+    """
+    Stored vectors for `ids` only, in the index's (possibly reduced) space,
+    decoded from fp16/int8 codes. None if the index can't reconstruct.
+    """
+    try:
+        return _base_index(index).reconstruct_batch(np.ascontiguousarray(ids, dtype=np.int64))
+    except RuntimeError:
+        return None
+
+
+def configure_search(index: faiss.Index):
+    """Apply search-time parameters (efSearch / nprobe). Call after loading an index."""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = HNSW_EF_SEARCH
+    elif isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(IVF_NPROBE, base.nlist)
+        base.make_direct_map()
+
+
+def search_parameters(index: faiss.Index, selector=None):
+    """
+    SearchParameters carrying an IDSelector that keep the index's own
+    search knobs (a bare SearchParameters would reset nprobe / efSearch).
+    A PCA wrapper passes them through to the index underneath.
+    """
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    if isinstance(base, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    return faiss.SearchParameters(sel=selector)
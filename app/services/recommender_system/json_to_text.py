@@ -1,61 +1,19 @@
-import json
-from pathlib import Path
 from typing import List, Dict
-
-# Get the absolute path to the data directory
-BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent
-PROCESSED_DIR = BASE_DIR / "data/processed"
+from app.services.catalog_manifest import load_catalog
 
 def load_all_processed_products() -> List[Dict]:
     """
-    Load ALL processed product JSON files from data/processed directory.
-    Deduplicate based on product URL/ID if necessary.
+    Load the current catalog (one record per product) from the catalog manifest.
+    The manifest is built from data/processed on first use and kept up to date
+    by storage on every ingest, so historical snapshots are not re-read here.
     Returns a list of product dictionaries.
     """
-    if not PROCESSED_DIR.exists():
-        return []
-
-    json_files = list(PROCESSED_DIR.glob("*.json"))
-    
-    if not json_files:
-        print(f"Warning: No JSON files found in {PROCESSED_DIR}")
-        return []
-
-    print(f"Found {len(json_files)} JSON files to process.")
-    for f in json_files:
-        print(f" - {f.name}")
-
-    all_products = {}
+    products = load_catalog()
 
-    for file_path in json_files:
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                
-                # Handle different formats (list vs dict wrapper)
-                products_list = []
-                if isinstance(data, list):
-                    products_list = data
-                elif isinstance(data, dict):
-                    if "products" in data:
-                        products_list = data["products"]
-                    else:
-                        # Assume the file itself is a single product object
-                        products_list = [data]
-                
-                for p in products_list:
-                    if not isinstance(p, dict):
-                        continue
-                    # Use source_url or a unique ID as key for deduplication
-                    unique_key = p.get("product_id") or p.get("source_url") or p.get("url") or p.get("title")
-                    
-                    if unique_key:
-                        all_products[unique_key] = p
-                        
-        except Exception as e:
-            print(f"Error loading {file_path}: {e}")
+    if not products:
+        print("Warning: No processed products found in catalog manifest")
 
-    return list(all_products.values())
+    return products
 
 def product_to_text(product: dict) -> str:
     """
@@ -0,0 +1,150 @@
+"""
+BM25 inverted index over product title, category and description.
+
+Built alongside the FAISS index (vector_store/lexical_index.json) and used by
+search_service for hybrid retrieval: lexical and vector candidate lists are
+merged with reciprocal-rank fusion, and a confident exact-name match lets the
+search skip the query embedding entirely.
+"""
+
+import json
+import math
+import re
+from pathlib import Path
+
+import numpy as np
+
+from app.services.recommender_system.keyword_filter import STOP_WORDS
+
+# Field weights (BM25F-style term frequency)
+FIELD_WEIGHTS = {"title": 3.0, "category": 2.0, "description": 1.0}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOP_WORDS and len(t) > 1]
+
+
+def _category_text(category) -> str:
+    if isinstance(category, list):
+        return " ".join(c for c in category if isinstance(c, str))
+    return category if isinstance(category, str) else ""
+
+
+class LexicalIndex:
+    def __init__(self, postings: dict, doc_len: np.ndarray, titles: list[list[str]]):
+        self.postings = postings          # term -> (doc ids int32, weighted tf float32)
+        self.doc_len = doc_len
+        self.titles = [set(t) for t in titles]
+        self.size = len(doc_len)
+        self.avg_len = float(doc_len.mean()) if self.size else 0.0
+        self.idf = {
+            term: math.log(1 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            for term, (ids, _) in postings.items()
+        }
+
+    @classmethod
+    def build(cls, products: list[dict]) -> "LexicalIndex":
+        term_docs: dict[str, dict[int, float]] = {}
+        doc_len = np.zeros(len(products), dtype=np.float32)
+        titles = []
+
+        for doc_id, p in enumerate(products):
+            fields = {
+                "title": p.get("title") or "",
+                "category": _category_text(p.get("category")),
+                "description": p.get("description") or "",
+            }
+            titles.append(tokenize(fields["title"]))
+
+            for field, text in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for term in tokenize(text):
+                    docs = term_docs.setdefault(term, {})
+                    docs[doc_id] = docs.get(doc_id, 0.0) + weight
+                    doc_len[doc_id] += weight
+
+        postings = {
+            term: (np.fromiter(docs.keys(), dtype=np.int32), np.fromiter(docs.values(), dtype=np.float32))
+            for term, docs in term_docs.items()
+        }
+        return cls(postings, doc_len, titles)
+
+    def save(self, path: Path):
+        data = {
+            "doc_len": self.doc_len.tolist(),
+            "titles": [sorted(t) for t in self.titles],
+            "postings": {term: [ids.tolist(), tfs.tolist()] for term, (ids, tfs) in self.postings.items()},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: Path) -> "LexicalIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        postings = {
+            term: (np.array(ids, dtype=np.int32), np.array(tfs, dtype=np.float32))
+            for term, (ids, tfs) in data["postings"].items()
+        }
+        return cls(postings, np.array(data["doc_len"], dtype=np.float32), data["titles"])
+
+    def search(self, query: str, k: int, allowed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 top-k, optionally restricted to `allowed` ids.
+        Returns (ids, scores) best first; only documents matching a query term.
+        """
+        terms = set(tokenize(query))
+        scores = np.zeros(self.size, dtype=np.float32)
+
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, tfs = posting
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[ids] / max(self.avg_len, 1e-6))
+            scores[ids] += self.idf[term] * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+        if allowed is not None:
+            keep = np.zeros(self.size, dtype=bool)
+            keep[allowed] = True
+            scores[~keep] = 0.0
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return order.astype(np.int64), scores[order]
+
+    def is_confident_match(self, query: str, ids: np.ndarray, scores: np.ndarray, margin: float) -> bool:
+        """
+        True when the best hit's title contains every query term and it beats
+        the runner-up by `margin`x, i.e. the user typed a product name.
+        """
+        terms = set(tokenize(query))
+        if not terms or len(ids) == 0:
+            return False
+        if not terms <= self.titles[ids[0]]:
+            return False
+        return len(scores) == 1 or scores[0] >= margin * scores[1]
+
+
+def reciprocal_rank_fusion(rankings: list[np.ndarray], k: int = 60) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Merge ranked id lists: score(d) = sum 1 / (k + rank). Scores are scaled
+    to [0, 1] by the best achievable score. Returns (ids, scores) best first.
+    """
+    fused: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[int(doc_id)] = fused.get(int(doc_id), 0.0) + 1.0 / (k + rank + 1)
+
+    if not fused:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    ids = np.fromiter(fused.keys(), dtype=np.int64)
+    scores = np.fromiter(fused.values(), dtype=np.float32) * ((k + 1) / max(len(rankings), 1))
+    order = np.argsort(-scores, kind="stable")
+    return ids[order], scores[order]
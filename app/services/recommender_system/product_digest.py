@@ -0,0 +1,89 @@
+"""
+Per-product prompt digests: the facts the recommendation prompt extracts
+from a product's text (weight, key benefits) instead of the full description.
+
+Computed once when a product is processed at ingest and stored with it under
+"prompt_digest"; the index rebuild fills in records processed before digests
+existed (or under an older PRODUCT_DIGEST_VERSION). Only facts derived from
+the title and description are stored: fields that migrations edit in place
+(product type, price) are read from the product itself when the prompt is built.
+"""
+
+import re
+
+# Bump when the digest layout or benefit extraction changes
+PRODUCT_DIGEST_VERSION = 2
+# Benefit phrases kept per product, and their maximum length
+DIGEST_MAX_BENEFITS = 3
+BENEFIT_MAX_CHARS = 120
+
+BENEFIT_WORDS = {
+    "rich", "high", "source", "protein", "fibre", "fiber", "calcium", "iron", "vitamin", "vitamins",
+    "minerals", "nutrition", "nutritious", "nutrient", "nutrients", "healthy", "health", "energy",
+    "digest", "digestion", "digestive", "gluten", "diabetic", "diabetes", "sugar", "glycemic", "weight",
+    "immunity", "natural", "organic", "preservatives", "instant", "ready", "easy", "quick", "minutes",
+    "wholesome", "low", "free", "no", "boost", "strength", "kids", "babies",
+}
+
+_SEGMENT_SPLIT = re.compile(r"(?<=[.!?])\s+|\s*[\n•●▪;|]\s*|\s+[-–]\s+")
+_WORD = re.compile(r"[a-z]+")
+
+
+def _extract_weight_in_grams(title: str) -> float | None:
+    """Extract weight from title and convert to grams."""
+    match = re.search(r'(\d+(?:\.\d+)?)\s*(g|kg|gm|gram|grams)', title.lower())
+    if match:
+        value = float(match.group(1))
+        unit = match.group(2)
+        if unit in ['kg', 'kgs']:
+            return value * 1000
+        return value
+    return None
+
+
+def _clip(text: str, limit: int = BENEFIT_MAX_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip(",;:") + "…"
+
+
+def key_benefits(description: str, limit: int = DIGEST_MAX_BENEFITS) -> list[str]:
+    """
+    Description sentences that state benefits (most benefit words first,
+    returned in their original order). Falls back to the opening sentences.
+    """
+    segments = [s.strip(" .,-") for s in _SEGMENT_SPLIT.split(description or "")]
+    segments = [s for s in segments if len(s) >= 12]
+    if not segments:
+        return []
+
+    scored = []
+    for position, segment in enumerate(segments):
+        hits = len(set(_WORD.findall(segment.lower())) & BENEFIT_WORDS)
+        if hits:
+            scored.append((-hits, position))
+    chosen = sorted(position for _, position in sorted(scored)[:limit]) or range(min(limit, len(segments)))
+
+    benefits = []
+    for position in chosen:
+        clipped = _clip(segments[position])
+        if clipped not in benefits:
+            benefits.append(clipped)
+    return benefits
+
+
+def build_product_digest(product: dict) -> dict:
+    """Compact prompt facts for one processed product."""
+    return {
+        "version": PRODUCT_DIGEST_VERSION,
+        "weight_g": _extract_weight_in_grams(product.get("title") or ""),
+        "benefits": key_benefits(product.get("description") or ""),
+    }
+
+
+def product_digest(product: dict) -> dict:
+    """The stored digest, or a freshly built one if it is missing or outdated."""
+    digest = product.get("prompt_digest")
+    if isinstance(digest, dict) and digest.get("version") == PRODUCT_DIGEST_VERSION:
+        return digest
+    return build_product_digest(product)
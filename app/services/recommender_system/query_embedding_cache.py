@@ -0,0 +1,139 @@
+"""
+Query embedding cache.
+
+Search queries repeat a lot ("idli mix", "health mix for kids") and the
+embedding round trip is the largest part of /api/v1/search latency. Vectors
+are cached in an LRU+TTL cache keyed by (provider, normalised query text), and
+concurrent identical misses share one in-flight embedding request.
+"""
+
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+from app.core.cache import TTLCache, SingleFlight
+from app.services.recommender_system import embedding_utils
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_EMBEDDING_CACHE_TTL = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", str(24 * 60 * 60)))
+# Optional .npz file to persist the cache across restarts (disabled when empty)
+QUERY_EMBEDDING_CACHE_PATH = os.getenv("QUERY_EMBEDDING_CACHE_PATH", "")
+
+_cache = TTLCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL)
+_inflight = SingleFlight()
+_loaded_from_disk = False
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query.strip().lower())
+
+
+def _cache_key(query: str) -> tuple[str, str]:
+    return (embedding_utils.get_provider().provider_id, normalize_query(query))
+
+
+def embed_query(query: str) -> np.ndarray:
+    """
+    Cached replacement for embed_texts([query]).
+    Returns a fresh (1, dim) float32 array the caller may modify in place.
+    """
+    if not _loaded_from_disk:
+        load_cache()
+
+    key = _cache_key(query)
+    vector = _cache.get(key)
+
+    if vector is None:
+        def _embed():
+            v = embedding_utils.embed_texts([query])[0]
+            _cache.set(key, v)
+            return v
+
+        vector = _inflight.do(key, _embed)
+
+    return vector.reshape(1, -1).copy()
+
+
+def embed_queries(queries: list[str]) -> np.ndarray:
+    """
+    Batched variant of embed_query: cached vectors are reused and all misses
+    (deduplicated) are embedded in a single request.
+    Returns a fresh (len(queries), dim) float32 array.
+    """
+    if not _loaded_from_disk:
+        load_cache()
+
+    keys = [_cache_key(q) for q in queries]
+    vectors = {}
+    missing = {}
+    for key, query in zip(keys, queries):
+        if key in vectors or key in missing:
+            continue
+        vector = _cache.get(key)
+        if vector is None:
+            missing[key] = query
+        else:
+            vectors[key] = vector
+
+    if missing:
+        embedded = embedding_utils.embed_texts(list(missing.values()))
+        for key, vector in zip(missing.keys(), embedded):
+            _cache.set(key, vector)
+            vectors[key] = vector
+
+    return np.stack([vectors[key] for key in keys]).astype(np.float32, copy=True)
+
+
+def get_cache_stats() -> dict:
+    stats = _cache.stats()
+    stats["inflight_shared"] = _inflight.shared
+    return stats
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def save_cache(path: str | None = None) -> int:
+    """Persist live entries to an .npz file. Returns the number of entries saved."""
+    path = path or QUERY_EMBEDDING_CACHE_PATH
+    if not path:
+        return 0
+
+    entries = _cache.items()
+    if not entries:
+        return 0
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        path,
+        providers=np.array([k[0] for k, _, _ in entries]),
+        queries=np.array([k[1] for k, _, _ in entries]),
+        stored_at=np.array([ts for _, ts, _ in entries], dtype=np.float64),
+        vectors=np.stack([v for _, _, v in entries]),
+    )
+    return len(entries)
+
+
+def load_cache(path: str | None = None) -> int:
+    """Warm the cache from disk (skipping expired entries). Returns entries loaded."""
+    global _loaded_from_disk
+    _loaded_from_disk = True
+
+    path = path or QUERY_EMBEDDING_CACHE_PATH
+    if not path or not Path(path).exists():
+        return 0
+
+    try:
+        with np.load(path) as data:
+            rows = zip(data["providers"], data["queries"], data["stored_at"], data["vectors"])
+            for provider_id, query, stored_at, vector in rows:
+                _cache.set((str(provider_id), str(query)), vector.astype(np.float32), stored_at=float(stored_at))
+        _cache.sweep()
+    except Exception as e:
+        print(f"⚠️ Failed to load query embedding cache: {e}")
+        return 0
+
+    return len(_cache)
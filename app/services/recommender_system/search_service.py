@@ -1,61 +1,345 @@
 from pathlib import Path
 import json
+import os
+import threading
 import faiss
-from app.services.recommender_system.embedding_utils import embed_texts
+import numpy as np
+from app.core.cache import TTLCache, SingleFlight
+from app.services.recommender_system.query_embedding_cache import embed_query, embed_queries, normalize_query
+from app.services.recommender_system.embedding_utils import get_provider
 from app.services.recommender_system.keyword_filter import (
     extract_keywords,
     detect_category
 )
+from app.services.recommender_system.attribute_table import AttributeTable
+from app.services.recommender_system.index_factory import (
+    configure_search,
+    search_parameters,
+    read_index,
+    reconstruct_subset,
+    transform_queries,
+)
+from app.services.recommender_system.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.services.recommender_system.suggest_index import SuggestIndex
+from app.services.recommender_system.similar_graph import build_similar_graph, load_similar_graph
+from app.services.recommender_system.document_store import (
+    DocumentStore,
+    MemoryDocumentStore,
+    slim_record,
+    project,
+)
 
 # Paths
 BASE_DIR = Path(__file__).resolve().parent
 VECTOR_STORE = BASE_DIR / "vector_store"
 INDEX_PATH = VECTOR_STORE / "products.index"
 META_PATH = VECTOR_STORE / "products_meta.json"
+STORE_INFO_PATH = VECTOR_STORE / "store_info.json"
+DIGEST_PATH = VECTOR_STORE / "catalog_digest.json"
+LEXICAL_PATH = VECTOR_STORE / "lexical_index.json"
+SLIM_META_PATH = VECTOR_STORE / "products_slim.json"
+DOCUMENTS_PATH = VECTOR_STORE / "products.db"
+SIMILAR_PATH = VECTOR_STORE / "similar.npz"
 
-_index = None
-_metadata = None
-_last_loaded_ts = 0
+# Filter-aware retrieval: when the filtered subset is small (by count or share
+# of the catalog), score it exactly instead of asking FAISS to skip the rest.
+EXACT_SCAN_MAX_MATCHES = int(os.getenv("EXACT_SCAN_MAX_MATCHES", "2000"))
+EXACT_SCAN_MAX_SELECTIVITY = float(os.getenv("EXACT_SCAN_MAX_SELECTIVITY", "0.05"))
 
+# Ranking: "hybrid" (BM25 + vector, reciprocal-rank fusion) or "vector" (similarity + keyword boost)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid").lower()
+HYBRID_DEPTH_FACTOR = int(os.getenv("HYBRID_DEPTH_FACTOR", "4"))  # candidates per list = k * factor
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Skip the embedding when the top BM25 hit contains every query term in its
+# title and outscores the runner-up by this factor
+LEXICAL_FASTPATH = os.getenv("LEXICAL_FASTPATH", "true").lower() == "true"
+LEXICAL_FASTPATH_MARGIN = float(os.getenv("LEXICAL_FASTPATH_MARGIN", "1.5"))
+
+# Batch search: shared over-fetch factor before per-row filtering
+BATCH_OVERFETCH = int(os.getenv("BATCH_OVERFETCH", "4"))
+
+# Faceted search: facet counts come from this many top candidates (results are
+# retrieved with the filters applied)
+FACET_POOL_SIZE = int(os.getenv("FACET_POOL_SIZE", "200"))
+
+# Ranked results per (store version, normalised query, filters, k); 0 disables
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "1024"))
+SEARCH_RESULT_CACHE_TTL = int(os.getenv("SEARCH_RESULT_CACHE_TTL", "600"))
+
+
+class LoadedStore:
+    """
+    Everything one load of the vector store serves from. Built completely
+    before it is published and not replaced piecemeal afterwards, so a search
+    takes one reference and never sees parts of two different stores.
+    """
+
+    def __init__(self, index, metadata, documents, attributes, lexical, suggest, similar, store_info, marker, version):
+        self.index = index
+        self.metadata = metadata  # Slim per-product records (see document_store.slim_record)
+        self.documents = documents  # Full documents, fetched lazily by FAISS id
+        self.attributes = attributes
+        self.lexical = lexical
+        self.suggest = suggest
+        self.similar = similar  # (ids, scores) neighbour lists per FAISS id; None: built on first use
+        self.id_lookup = {p.get("product_id"): i for i, p in enumerate(metadata)}  # product_id -> FAISS id
+        self.store_info = store_info
+        self.marker = marker  # _store_marker() it was loaded at
+        self.version = version  # Part of every result cache key
+
+
+_store: LoadedStore | None = None
+_load_lock = threading.Lock()  # One (re)load at a time
+_failed_marker = None  # Store version that failed to load; not retried until it changes
+_store_version = 0  # Bumped on every (re)load
+
+# Ranked (ids, scores) only: hits are hydrated per call, so callers get fresh dicts
+_result_cache = TTLCache(SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL)
+_result_inflight = SingleFlight()
+_result_invalidations = 0
+
+
+def _read_store_info() -> dict | None:
+    if not STORE_INFO_PATH.exists():
+        return None
+    with open(STORE_INFO_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _check_store_compatibility(store_info: dict | None, dimension: int | None = None):
+    """
+    Refuse to serve a vector store built by a different embedding provider,
+    otherwise query and product vectors would silently be mixed.
+    Stores without store_info predate pluggable providers and were built by
+    OpenAI; only their dimension can be checked against the configured model.
+    """
+    provider = get_provider()
+
+    if store_info is None:
+        if provider.name != "openai":
+            raise ValueError(
+                f"Vector store has no provider info (legacy OpenAI store) but EMBEDDING_PROVIDER is "
+                f"'{provider.provider_id}'. Rebuild it with embed_products.py."
+            )
+        if dimension is not None and provider.dimension != dimension:
+            raise ValueError(
+                f"Legacy vector store has dimension {dimension} but '{provider.provider_id}' embeds to "
+                f"{provider.dimension}. Rebuild it with embed_products.py."
+            )
+        return
+
+    if store_info.get("provider") != provider.provider_id:
+        raise ValueError(
+            f"Vector store was built with '{store_info.get('provider')}' but the configured provider is "
+            f"'{provider.provider_id}'. Rebuild it with embed_products.py."
+        )
+
+    if dimension is not None and store_info.get("dimension") != dimension:
+        raise ValueError(
+            f"Vector store dimension {dimension} does not match recorded dimension {store_info.get('dimension')}."
+        )
+
+
+def _load_lexical_index(metadata: list[dict]) -> LexicalIndex:
+    """BM25 index saved with the store, or built from metadata for older stores."""
+    if LEXICAL_PATH.exists():
+        lexical = LexicalIndex.load(LEXICAL_PATH)
+        if lexical.size == len(metadata):
+            return lexical
+    return LexicalIndex.build(metadata)
+
+
+def _load_records():
+    """
+    Slim in-memory records and the full-document store.
+    Stores built before products_slim.json / products.db existed fall back to
+    slimming products_meta.json and serving full documents from memory.
+    Returns (records, documents, full products or None).
+    """
+    if SLIM_META_PATH.exists() and DOCUMENTS_PATH.exists():
+        with open(SLIM_META_PATH, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        return records, DocumentStore(DOCUMENTS_PATH), None
+
+    with open(META_PATH, "r", encoding="utf-8") as f:
+        products = json.load(f)
+    return [slim_record(p) for p in products], MemoryDocumentStore(products), products
+
+
+def _store_marker() -> int | None:
+    """
+    Version of the store on disk. embed_products writes store_info.json last
+    (atomically), so its mtime only changes once every other file is in
+    place. Legacy stores without it fall back to the index / metadata mtimes.
+    """
+    try:
+        if STORE_INFO_PATH.exists():
+            return STORE_INFO_PATH.stat().st_mtime_ns
+        return max(INDEX_PATH.stat().st_mtime_ns, META_PATH.stat().st_mtime_ns)
+    except OSError:
+        return None
+
+
+def _check_store_consistency(index, records: list[dict], store_info: dict | None):
+    """Refuse a store whose files come from different builds."""
+    if index.ntotal != len(records):
+        raise ValueError(f"Index holds {index.ntotal} vectors but the store has {len(records)} product records.")
+    if store_info and store_info.get("product_count") not in (None, len(records)):
+        raise ValueError(
+            f"store_info records {store_info['product_count']} products but the store has {len(records)}."
+        )
 
-def load_resources(force: bool = False) -> bool:
-    global _index, _metadata, _last_loaded_ts
 
+def _load_store(marker: int, version: int) -> LoadedStore:
+    store_info = _read_store_info()
+    _check_store_compatibility(store_info)
+    index = read_index(INDEX_PATH)  # memory-mapped unless VECTOR_MMAP=false
+    _check_store_compatibility(store_info, index.d)
+    configure_search(index)
+    metadata, documents, full_products = _load_records()
+    _check_store_consistency(index, metadata, store_info)
+    return LoadedStore(
+        index=index,
+        metadata=metadata,
+        documents=documents,
+        attributes=AttributeTable(metadata),
+        lexical=_load_lexical_index(full_products or metadata),
+        suggest=SuggestIndex.build(metadata),
+        similar=load_similar_graph(SIMILAR_PATH, len(metadata)),
+        store_info=store_info,
+        marker=marker,
+        version=version,
+    )
+
+
+def current_store(force: bool = False) -> LoadedStore | None:
+    """
+    The loaded store, (re)loading it first if forced, not loaded yet, or a
+    newer build has completed. A reload runs under a lock and is published by
+    swapping one reference; if it fails, the previous store keeps serving
+    (None is returned only for a failed forced reload or when nothing loads).
+    """
+    global _store, _failed_marker, _store_version
+
+    store = _store
     if not INDEX_PATH.exists() or not META_PATH.exists():
-        if _last_loaded_ts > 0:
+        if store is not None:
             print("⚠️ Vector store files missing.")
         else:
             print("⚠️ Vector store not found. Run embed_products.py first.")
-        return False
+        return None
 
-    # Check modification times
-    try:
-        index_mtime = INDEX_PATH.stat().st_mtime
-        meta_mtime = META_PATH.stat().st_mtime
-        current_ts = max(index_mtime, meta_mtime)
-    except OSError:
-        return False
+    marker = _store_marker()
+    if marker is None:
+        return None
+    if not force and store is not None and store.marker == marker:
+        return store
 
-    # Reload if forced, not loaded, or stale
-    if force or _index is None or _metadata is None or current_ts > _last_loaded_ts:
-        try:
-            print(f"🔄 Loading vector store (TS: {current_ts})...")
-            _index = faiss.read_index(str(INDEX_PATH))
-            with open(META_PATH, "r", encoding="utf-8") as f:
-                _metadata = json.load(f)
-            
-            _last_loaded_ts = current_ts
-            print(f"✅ Loaded {_index.ntotal} vectors and {len(_metadata)} products.")
-            return True
+    with _load_lock:
+        store = _store
+        if not force and store is not None and store.marker == marker:
+            return store  # reloaded by another thread meanwhile
+        if not force and marker == _failed_marker:
+            return store
 
+        try:
+            print(f"🔄 Loading vector store (version {marker})...")
+            loaded = _load_store(marker, _store_version + 1)
         except Exception as e:
             print(f"❌ Failed to load vector store: {e}")
-            _index = None
-            _metadata = None
-            _last_loaded_ts = 0
-            return False
-            
-    return True
+            _failed_marker = marker
+            return None if force else store
+
+        _store_version = loaded.version
+        _store = loaded
+        _failed_marker = None
+        _invalidate_result_cache()
+        print(f"✅ Loaded {loaded.index.ntotal} vectors and {len(loaded.metadata)} products.")
+        return loaded
+
+
+def load_resources(force: bool = False) -> bool:
+    """Load the vector store if needed; False when no store can be served."""
+    return current_store(force) is not None
+
+
+def _invalidate_result_cache():
+    """Drop cached results; called whenever a new index is swapped in."""
+    global _result_invalidations
+    if len(_result_cache):
+        _result_invalidations += 1
+    _result_cache.clear()
+
+
+def _result_key(store: LoadedStore, query: str, k: int, filters: dict) -> tuple:
+    return (store.version, SEARCH_MODE, query, k, tuple(sorted(filters.items())))
+
+
+def get_result_cache_stats() -> dict:
+    stats = _result_cache.stats()
+    stats["inflight_shared"] = _result_inflight.shared
+    stats["invalidations"] = _result_invalidations
+    stats["store_version"] = _store_version
+    return stats
+
+
+def clear_result_cache():
+    _result_cache.clear()
+
+
+def _empty_hits() -> tuple[np.ndarray, np.ndarray]:
+    return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+
+def _exact_scan(store: LoadedStore, query_embedding: np.ndarray, k: int, allowed: np.ndarray):
+    """
+    Brute-force inner product over just the allowed subset. Only the subset
+    is decoded from the index, so no private copy of the store is kept.
+    Returns None if the index can't reconstruct vectors.
+    """
+    vectors = reconstruct_subset(store.index, allowed)
+    if vectors is None:
+        return None
+    sims = vectors @ transform_queries(store.index, query_embedding)[0]
+    if len(sims) > k:
+        top = np.argpartition(-sims, k - 1)[:k]
+    else:
+        top = np.arange(len(sims))
+    top = top[np.argsort(-sims[top], kind="stable")]
+    return sims[top].astype(np.float32), allowed[top]
+
+
+def _retrieve(store: LoadedStore, query_embedding: np.ndarray, k: int, allowed: np.ndarray | None):
+    """
+    Top-k retrieval restricted to `allowed` ids (None = whole catalog).
+    - No filter: plain FAISS search
+    - Selective filter: exact scan over the matching subset
+    - Broad filter: FAISS search with an IDSelector so filtered ids are skipped
+    Returns (scores, ids) in similarity order; exactly k hits whenever at
+    least k products match.
+    """
+    index = store.index
+    if allowed is None:
+        scores, indices = index.search(query_embedding, k)
+    else:
+        if len(allowed) == 0:
+            return _empty_hits()
+
+        selective = (
+            len(allowed) <= EXACT_SCAN_MAX_MATCHES
+            or len(allowed) / max(index.ntotal, 1) <= EXACT_SCAN_MAX_SELECTIVITY
+        )
+        hits = _exact_scan(store, query_embedding, k, allowed) if selective else None
+        if hits is not None:
+            return hits
+
+        selector = faiss.IDSelectorBatch(allowed)
+        params = search_parameters(index, selector)
+        scores, indices = index.search(query_embedding, min(k, len(allowed)), params=params)
+
+    ids = indices[0]
+    valid = (ids >= 0) & (ids < len(store.metadata))
+    return scores[0][valid], ids[valid]
 
 
 def resolve_category(query: str, memory: dict | None) -> str | None:
@@ -70,105 +354,357 @@ def resolve_category(query: str, memory: dict | None) -> str | None:
     return detect_category(query)
 
 
-def search_products(query: str, k: int = 5, memory: dict | None = None, product_type: str = "single"):
+def _resolve_filters(query: str, memory: dict | None, product_type: str) -> dict:
+    """Effective hard filters for a search (explicit arguments, then session memory)."""
+    # The direct product_type argument wins unless it is "any", then fall back to memory
+    effective_product_type_filter = product_type
+    if effective_product_type_filter == "any" and memory:
+        effective_product_type_filter = memory.get("product_type") or "any"
+
+    return {
+        "product_type": effective_product_type_filter,
+        "category": resolve_category(query, memory),
+        "budget": memory.get("budget") if memory else None,
+    }
+
+
+def _depth(k: int) -> int:
+    """Candidates retrieved per list: k for vector ranking, deeper for fusion."""
+    return k if SEARCH_MODE == "vector" else max(k * HYBRID_DEPTH_FACTOR, k)
+
+
+def _lexical_stage(store: LoadedStore, query: str, k: int, allowed: np.ndarray | None) -> tuple[np.ndarray, bool]:
+    """
+    BM25 candidates for hybrid ranking, and whether vector retrieval is still needed.
+    A confident lexical match (exact product name) skips the embedding call,
+    provided the lexical candidates alone can fill the k results.
+    """
+    if SEARCH_MODE == "vector":
+        return np.empty(0, dtype=np.int64), True
+
+    lex_ids, lex_scores = store.lexical.search(query, _depth(k), allowed)
+    wanted = min(k, store.attributes.size if allowed is None else len(allowed))
+    if (
+        LEXICAL_FASTPATH
+        and len(lex_ids) >= wanted
+        and store.lexical.is_confident_match(query, lex_ids, lex_scores, LEXICAL_FASTPATH_MARGIN)
+    ):
+        print(f"DEBUG: Lexical fast path for '{query}' (skipped embedding)", flush=True)
+        return lex_ids, False
+    return lex_ids, True
+
+
+SLIM_KEYS = frozenset(slim_record({}).keys())
+
+
+def _hydrate(store: LoadedStore, ids: np.ndarray, scores: np.ndarray, fields: list[str] | None) -> list[dict]:
+    """
+    Result dicts for the hits only. Full documents are read from the document
+    store unless every requested field is available in the slim records.
+    """
+    if fields is not None and set(fields) <= SLIM_KEYS:
+        records = [store.metadata[i] for i in ids]
+    else:
+        records = store.documents.get_many(ids.tolist())
+
+    return [
+        {**project(record, fields), "similarity_score": float(score)}
+        for record, score in zip(records, scores)
+        if record is not None
+    ]
+
+
+def _rank(
+    store: LoadedStore, query: str, k: int, budget: float | None, lex_ids: np.ndarray, vector_hits
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Final ranking of retrieved candidates, returned as (ids, scores) best first.
+    - vector mode: 0.8 * similarity + 0.2 * keyword substring boost - price penalty
+    - hybrid mode: reciprocal-rank fusion of vector and BM25 lists - price penalty
+    """
+    if SEARCH_MODE == "vector":
+        sims, ids = vector_hits
+        sims, ids = sims[:k], ids[:k]
+        keyword_score = store.attributes.keyword_scores(ids, extract_keywords(query))
+        final_scores = (0.8 * sims) + (0.2 * keyword_score) - store.attributes.price_penalty(ids, budget)
+    else:
+        rankings = [lex_ids] if vector_hits is None else [vector_hits[1], lex_ids]
+        ids, fused = reciprocal_rank_fusion(rankings, RRF_K)
+        final_scores = fused - store.attributes.price_penalty(ids, budget)
+
+    order = np.argsort(-final_scores, kind="stable")[:k]
+    return ids[order], final_scores[order]
+
+
+def _embed_normalized(query: str) -> np.ndarray:
+    query_embedding = embed_query(query)  # cached
+    faiss.normalize_L2(query_embedding)
+    return query_embedding
+
+
+def search_products(
+    query: str,
+    k: int = 5,
+    memory: dict | None = None,
+    product_type: str = "single",
+    fields: list[str] | None = None,
+):
     print(f"DEBUG: Entering search_products with query='{query}', type='{product_type}'", flush=True)
     if not query.strip():
         return []
 
-    if not load_resources():
+    store = current_store()
+    if store is None:
         return []
 
-    keywords = extract_keywords(query)
-    resolved_category = resolve_category(query, memory)
+    # Case / whitespace variants share filters, embedding and cache entry
+    query = normalize_query(query)
+    filters = _resolve_filters(query, memory, product_type)
 
-    # Embed + normalize query
-    query_embedding = embed_texts([query])
-    faiss.normalize_L2(query_embedding)
+    # Full documents (title, images, pricing, variants, etc.) unless fields are projected
+    return _hydrate(store, *_ranked(store, query, k, filters), fields)
 
-    # Retrieve more candidates than needed (Fetch deep to handle filtering)
-    fetch_k = k * 20  # Fetch 20x to ensure we find enough matches after filtering
-    scores, indices = _index.search(query_embedding, fetch_k)
 
-    results = []
+def _allowed_ids(store: LoadedStore, filters: dict) -> np.ndarray | None:
+    """
+    Ids passing `filters`: the chat hard filters (product_type, category,
+    budget), or /search facet filters given as {"facets": ((name, value), ...)}.
+    """
+    if "facets" in filters:
+        return store.attributes.facet_ids(**dict(filters["facets"]))
+    return store.attributes.matching_ids(**filters)
 
-    for score, idx in zip(scores[0], indices[0]):
-        if idx == -1 or idx >= len(_metadata):
-            continue
-            
-        if len(results) >= k:
-            break
-
-        product = _metadata[idx]
-
-        # 🔹 PRODUCT TYPE FILTER
-        preferred_type = memory.get("product_type") if memory else None
-        # The original code had a preferred_type from memory.
-        # Now we also have a direct product_type argument.
-        # We'll prioritize the direct argument if it's not "any", otherwise use memory.
-        effective_product_type_filter = product_type
-        if effective_product_type_filter == "any" and memory:
-            effective_product_type_filter = memory.get("product_type", "any")
-
-        if effective_product_type_filter != "any":
-            # FILTER: Product Type
-            p_type = product.get('product_type', 'single') # Default to single if missing
-            print(f"DEBUG: Found Product: {product.get('title', 'Unknown')} | Type: {p_type} | Filter: {effective_product_type_filter}")
-            
-            if p_type != effective_product_type_filter:
-                continue
-
-        # 🔹 HARD CATEGORY FILTER
-        if resolved_category:
-            product_categories = product.get("category")
-
-            if isinstance(product_categories, str):
-                # Product has a single category string
-                if product_categories != resolved_category:
-                    continue
-            elif isinstance(product_categories, list):
-                # Product has a list of categories
-                if len(product_categories) > 0:
-                    # If product has categories, check if resolved_category is in them
-                    if resolved_category not in product_categories:
-                        continue
-                # else: Product has empty category list [] - allow it through
-            # else: Product has no category field or None - allow it through
-        
-        # 🔹 PRICE FILTERING (New)
-        raw_price = product.get("pricing", {}).get("price")
-        budget = memory.get("budget") if memory else None
-        
-        price_penalty = 0.0
-
-        if budget:
-            # If product has no price, exclude it to be safe
-            if raw_price is None:
-                continue
-                
-            try:
-                price = float(raw_price)
-                if price > (budget * 1.10):  # Hard limit: Budget + 10%
+
+def _ranked(store: LoadedStore, query: str, k: int, filters: dict) -> tuple[np.ndarray, np.ndarray]:
+    """Ranked (ids, scores) for a normalised query, from the result cache when possible."""
+    key = _result_key(store, query, k, filters)
+
+    ranked = _result_cache.get(key)
+    if ranked is None:
+        def _search():
+            # 🔹 HARD FILTERS (product type, category, budget or facets) pushed into retrieval
+            allowed = _allowed_ids(store, filters)
+
+            lex_ids, needs_vector = _lexical_stage(store, query, k, allowed)
+            vector_hits = _retrieve(store, _embed_normalized(query), _depth(k), allowed) if needs_vector else None
+
+            result = _rank(store, query, k, filters.get("budget"), lex_ids, vector_hits)
+            _result_cache.set(key, result)
+            return result
+
+        # Concurrent identical misses share one retrieval
+        ranked = _result_inflight.do(key, _search)
+
+    return ranked
+
+
+def search_products_faceted(
+    query: str,
+    product_type: str | None = None,
+    categories: list[str] | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    in_stock: bool | None = None,
+    page: int = 0,
+    page_size: int = 10,
+    fields: list[str] | None = None,
+) -> dict:
+    """
+    Search with explicit facet filters, paging and facet counts.
+
+    Filters are pushed into retrieval (as in search_products), so every page
+    is full while enough products match; without explicit `categories`, a
+    category detected in the query is applied as in chat search. `total`
+    counts every product passing the filters (retrieval ranks them all).
+    Facet counts come from a separate, unfiltered pool: the top
+    FACET_POOL_SIZE products for the query (the whole catalog for an empty
+    query), so each facet still shows its alternatives.
+    Returns {"results", "total", "page", "page_size", "facets"}.
+    """
+    empty = {"results": [], "total": 0, "page": page, "page_size": page_size, "facets": {}}
+    store = current_store()
+    if store is None:
+        return empty
+
+    query = normalize_query(query)
+    detected = detect_category(query) if query and not categories else None
+    facets = {
+        "product_type": product_type,
+        "categories": tuple(categories) if categories else None,
+        "min_price": min_price,
+        "max_price": max_price,
+        "in_stock": in_stock,
+        "category": detected,
+    }
+    allowed = store.attributes.facet_ids(**facets)
+    total = store.attributes.size if allowed is None else len(allowed)
+
+    start = page * page_size
+    if start >= total:
+        scores, ids = _empty_hits()
+    elif query:
+        ids, scores = _ranked(store, query, min(start + page_size, total), {"facets": tuple(facets.items())})
+    else:
+        ids = store.attributes.all_ids if allowed is None else allowed
+        scores = np.zeros(len(ids), dtype=np.float32)
+    page_slice = slice(start, start + page_size)
+
+    if query:
+        pool_filters = {"product_type": "any", "category": detected, "budget": None}
+        pool_ids, _ = _ranked(store, query, FACET_POOL_SIZE, pool_filters)
+    else:
+        pool_ids = store.attributes.all_ids
+    masks = store.attributes.facet_masks(
+        pool_ids,
+        product_type=product_type,
+        categories=categories,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+    )
+
+    return {
+        "results": _hydrate(store, ids[page_slice], scores[page_slice], fields),
+        "total": int(total),
+        "page": page,
+        "page_size": page_size,
+        "facets": store.attributes.facet_counts(pool_ids, masks),
+    }
+
+
+def search_products_batch(requests: list[dict]) -> list[list[dict]]:
+    """
+    Run many searches at once. Each request is a dict with `query` and
+    optional `k`, `product_type`, `category`, `budget`, `fields`.
+
+    All queries that need vectors are embedded in one batched call and
+    searched with a single index.search over the query matrix; filters are
+    applied as a vectorised mask per row. Rows whose filters are too
+    selective for the shared over-fetch fall back to filter-aware retrieval.
+    Requests already in the result cache skip retrieval entirely.
+    Returns one result list per request, in order.
+    """
+    if not requests:
+        return []
+
+    store = current_store()
+    if store is None:
+        return [[] for _ in requests]
+    index = store.index
+
+    plans = []
+    for req in requests:
+        query = normalize_query(req.get("query") or "")
+        k = int(req.get("k") or 5)
+        memory = {"category": req.get("category"), "budget": req.get("budget")}
+        filters = _resolve_filters(query, memory, req.get("product_type") or "single")
+        key = _result_key(store, query, k, filters)
+        ranked = _result_cache.get(key) if query else None
+        if query and ranked is None:
+            allowed = store.attributes.matching_ids(**filters)
+            lex_ids, needs_vector = _lexical_stage(store, query, k, allowed)
+        else:
+            allowed, lex_ids, needs_vector = None, None, False
+        plans.append({"query": query, "k": k, "filters": filters, "allowed": allowed, "key": key,
+                      "ranked": ranked, "lex_ids": lex_ids, "needs_vector": needs_vector, "vector_hits": None})
+
+    vector_plans = [plan for plan in plans if plan["needs_vector"]]
+    if vector_plans:
+        # One embedding request for every query that needs a vector
+        query_matrix = embed_queries([plan["query"] for plan in vector_plans])
+        faiss.normalize_L2(query_matrix)
+
+        depth = max(_depth(plan["k"]) for plan in vector_plans)
+        filtered = any(plan["allowed"] is not None for plan in vector_plans)
+        fetch = min(index.ntotal, depth * BATCH_OVERFETCH if filtered else depth)
+        scores, indices = index.search(query_matrix, fetch)
+
+        for row, plan in enumerate(vector_plans):
+            want = _depth(plan["k"])
+            ids = indices[row]
+            valid = (ids >= 0) & (ids < len(store.metadata))
+            ids, sims = ids[valid], scores[row][valid]
+
+            if plan["allowed"] is not None:
+                keep = store.attributes.filter_mask(ids, **plan["filters"])
+                if keep.sum() < min(want, len(plan["allowed"])) and fetch < index.ntotal:
+                    # Selective filter: the shared over-fetch wasn't deep enough
+                    plan["vector_hits"] = _retrieve(store, query_matrix[row:row + 1], want, plan["allowed"])
                     continue
-                elif price > budget:         # Soft limit: Budget < Price <= Budget + 10%
-                    price_penalty = 0.1      # Apply 10% score penalty
-            except (ValueError, TypeError):
-                continue
+                ids, sims = ids[keep], sims[keep]
 
-        # 🔹 KEYWORD SOFT BOOST
-        product_text = (
-            f"{product.get('title','')} "
-            f"{product.get('category','')}"
-        ).lower()
+            plan["vector_hits"] = (sims[:want], ids[:want])
 
-        keyword_matches = sum(1 for kw in keywords if kw in product_text)
-        keyword_score = keyword_matches / max(len(keywords), 1) if keywords else 0.0
+    results = []
+    for plan, req in zip(plans, requests):
+        if not plan["query"]:
+            results.append([])
+            continue
+        if plan["ranked"] is None:
+            plan["ranked"] = _rank(
+                store, plan["query"], plan["k"], plan["filters"]["budget"], plan["lex_ids"], plan["vector_hits"]
+            )
+            _result_cache.set(plan["key"], plan["ranked"])
+        results.append(_hydrate(store, *plan["ranked"], req.get("fields")))
+    return results
+
+
+def suggest(query: str, limit: int = 8) -> list[dict]:
+    """
+    Typeahead suggestions (categories, then product titles) for a partial
+    query. In-memory only: no embedding or other network call.
+    """
+    store = current_store()
+    if store is None:
+        return []
+    return store.suggest.suggest(query, limit)
+
+
+def _get_similar_graph(store: LoadedStore) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    The precomputed neighbour graph. Stores built before similar.npz existed
+    get one built in memory from the stored vectors on first use (the one
+    field set after a store is published; a concurrent duplicate build is harmless).
+    """
+    if store.similar is None:
+        try:
+            vectors = store.index.reconstruct_n(0, store.index.ntotal)
+        except RuntimeError:
+            return None
+        store.similar = build_similar_graph(store.index, vectors)
+    return store.similar
+
+
+def similar_products(
+    product_id: str,
+    k: int = 5,
+    product_type: str = "any",
+    in_stock: bool | None = None,
+    fields: list[str] | None = None,
+) -> list[dict] | None:
+    """
+    "More like this" from the precomputed graph: a row lookup filtered by
+    product type and stock through the attribute arrays. No embedding call.
+    Returns None for an unknown product_id.
+    """
+    store = current_store()
+    if store is None:
+        return []
+
+    doc_id = store.id_lookup.get(product_id)
+    if doc_id is None:
+        return None
+
+    graph = _get_similar_graph(store)
+    if graph is None:
+        return []
 
-        final_score = (0.8 * score) + (0.2 * keyword_score) - price_penalty
+    ids, scores = graph[0][doc_id], graph[1][doc_id]
+    valid = ids >= 0
+    ids, scores = ids[valid].astype(np.int64), scores[valid]
 
-        results.append({
-            **product,  # Include all product fields (title, images, pricing, variants, etc.)
-            "similarity_score": float(final_score)
-        })
+    keep = np.ones(len(ids), dtype=bool)
+    for mask in store.attributes.facet_masks(ids, product_type=product_type, in_stock=in_stock).values():
+        keep &= mask
 
-    results.sort(key=lambda x: x["similarity_score"], reverse=True)
-    return results[:k]
+    return _hydrate(store, ids[keep][:k], scores[keep][:k], fields)
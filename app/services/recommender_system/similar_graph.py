@@ -0,0 +1,61 @@
+"""
+Precomputed "similar products" graph.
+
+At index-build time every product vector is searched against the index in
+one batch, and the top SIMILAR_GRAPH_SIZE neighbours (self excluded) are
+saved next to the index (vector_store/similar.npz). "More like this" is then
+a row lookup plus attribute-array filters: no embedding call, no search.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+# Neighbours kept per product; serving filters (type, stock) choose from these
+SIMILAR_GRAPH_SIZE = int(os.getenv("SIMILAR_GRAPH_SIZE", "50"))
+# Products searched per index.search call while building
+SIMILAR_BUILD_BATCH = 1024
+
+
+def build_similar_graph(index, vectors: np.ndarray, size: int = SIMILAR_GRAPH_SIZE) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Batch self-search of `vectors` (row i = FAISS id i) against `index`.
+    Returns (ids int32, scores float32), both (n, size), best first and
+    padded with -1 / 0 where fewer neighbours exist.
+    """
+    n = len(vectors)
+    size = max(0, min(size, n - 1))
+    ids = np.full((n, size), -1, dtype=np.int32)
+    scores = np.zeros((n, size), dtype=np.float32)
+    if size == 0:
+        return ids, scores
+
+    for start in range(0, n, SIMILAR_BUILD_BATCH):
+        batch = np.ascontiguousarray(vectors[start:start + SIMILAR_BUILD_BATCH], dtype=np.float32)
+        found_scores, found_ids = index.search(batch, size + 1)
+
+        for row in range(len(batch)):
+            keep = (found_ids[row] >= 0) & (found_ids[row] != start + row)
+            neighbours = found_ids[row][keep][:size]
+            ids[start + row, :len(neighbours)] = neighbours
+            scores[start + row, :len(neighbours)] = found_scores[row][keep][:size]
+
+    return ids, scores
+
+
+def save_similar_graph(path: Path, ids: np.ndarray, scores: np.ndarray):
+    tmp_path = path.with_name(path.stem + ".tmp.npz")
+    np.savez(tmp_path, ids=ids, scores=scores)
+    os.replace(tmp_path, path)
+
+
+def load_similar_graph(path: Path, n_products: int) -> tuple[np.ndarray, np.ndarray] | None:
+    """The saved graph, or None when missing or built for a different catalog."""
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        ids, scores = data["ids"], data["scores"]
+    if len(ids) != n_products:
+        return None
+    return ids, scores
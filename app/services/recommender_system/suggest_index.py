@@ -0,0 +1,287 @@
+"""
+In-memory typeahead over product titles and NAV_CATEGORIES terms.
+
+Rebuilt by search_service on every vector store (re)load. Lookups never call
+an embedding or any other network service:
+- every query token but the last must match a vocabulary term exactly or
+  within one edit ("iddli" → idli, "milet" → millet)
+- the last token is a prefix ("mil" → millet), also within one edit
+- products must match every token; categories are suggested alongside
+
+Benchmark (prefix, typo and multi-token queries over a synthetic 100k-product
+catalog built from the current store's title words):
+    python -m app.services.recommender_system.suggest_index --products 100000
+"""
+
+import re
+import time
+
+import numpy as np
+
+from app.services.recommender_system.category_config import NAV_CATEGORIES
+from app.services.recommender_system.keyword_filter import STOP_WORDS
+
+# Shorter tokens only match exactly (one edit away from "mix" is half the vocabulary)
+MIN_FUZZY_LENGTH = 3
+MIN_FUZZY_PREFIX = 4
+# Longest prefix indexed for typo-tolerant completion
+MAX_FUZZY_PREFIX = 12
+
+EXACT_WEIGHT = 1.0
+FUZZY_WEIGHT = 0.6
+
+MAX_CATEGORY_SUGGESTIONS = 3
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _deletes(word: str) -> set[str]:
+    """Every string one deletion away from `word`."""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by at most one insertion, deletion, substitution or adjacent swap."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        # substitution, or transposition of the next two characters
+        return a[i + 1:] == b[i + 1:] or (
+            i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+        )
+    return a[i:] == b[i + 1:]  # one insertion into a
+
+
+class SuggestIndex:
+    """
+    Suggestion targets are product titles (doc ids 0..n_products-1, in
+    catalog order) followed by category phrases. Exact prefixes are looked up
+    in an edge n-gram index; one-edit variants through deletion neighbourhoods
+    of terms and term prefixes. Only targets in a query token's postings are
+    scored, so latency follows the matches, not the catalog size.
+    """
+
+    def __init__(self, docs: list[dict], term_docs: dict[str, list[int]]):
+        self.docs = docs
+        self.size = len(docs)
+        self.n_products = sum(1 for d in docs if d["type"] == "product")
+        self.postings = {term: np.array(ids, dtype=np.int32) for term, ids in term_docs.items()}
+
+        # Edge n-grams: every prefix of every term -> docs containing such a term
+        edges: dict[str, list[int]] = {}
+        for term, ids in term_docs.items():
+            for length in range(1, len(term) + 1):
+                edges.setdefault(term[:length], []).extend(ids)
+        self.edge_postings = {prefix: np.unique(np.array(ids, dtype=np.int32)) for prefix, ids in edges.items()}
+
+        self.term_deletes: dict[str, set[str]] = {}    # term or one-deletion variant -> terms
+        self.prefix_deletes: dict[str, set[str]] = {}  # term prefix or its deletion variant -> terms
+        for term in term_docs:
+            if len(term) >= MIN_FUZZY_LENGTH:
+                for key in _deletes(term) | {term}:
+                    self.term_deletes.setdefault(key, set()).add(term)
+            for length in range(MIN_FUZZY_PREFIX - 1, min(len(term), MAX_FUZZY_PREFIX) + 1):
+                prefix = term[:length]
+                for key in _deletes(prefix) | {prefix}:
+                    self.prefix_deletes.setdefault(key, set()).add(term)
+
+        # Static tie-break among equal match scores: in stock first, then shorter text
+        order = sorted(range(self.size), key=lambda d: (not docs[d].get("in_stock", True), len(docs[d]["text"])))
+        self.tiebreak = np.empty(self.size, dtype=np.float32)
+        self.tiebreak[order] = np.arange(self.size, dtype=np.float32) / max(self.size, 1) * 1e-3
+
+    @classmethod
+    def build(cls, products: list[dict]) -> "SuggestIndex":
+        docs = []
+        term_docs: dict[str, list[int]] = {}
+
+        def add(doc: dict):
+            doc_id = len(docs)
+            docs.append(doc)
+            for term in dict.fromkeys(_tokens(doc["text"])):
+                term_docs.setdefault(term, []).append(doc_id)
+
+        for p in products:
+            title = p.get("title")
+            if not title:
+                continue
+            add({
+                "type": "product",
+                "text": title,
+                "product_id": p.get("product_id"),
+                "in_stock": bool((p.get("availability") or {}).get("in_stock")),
+            })
+
+        for category, keywords in NAV_CATEGORIES.items():
+            phrases = dict.fromkeys([category.replace("-", " "), *keywords])
+            for phrase in phrases:
+                add({"type": "category", "text": phrase, "category": category})
+
+        return cls(docs, term_docs)
+
+    def _fuzzy_terms(self, token: str, is_prefix: bool) -> list[str]:
+        """Terms (or, for a prefix, term starts) exactly one edit away from `token`."""
+        if len(token) < (MIN_FUZZY_PREFIX if is_prefix else MIN_FUZZY_LENGTH):
+            return []
+
+        index = self.prefix_deletes if is_prefix else self.term_deletes
+        candidates = set()
+        for key in _deletes(token) | {token}:
+            candidates |= index.get(key, set())
+
+        terms = []
+        for term in candidates:
+            if is_prefix:
+                if term.startswith(token):
+                    continue  # already an exact prefix match
+                ok = any(within_one_edit(token, term[:n]) for n in (len(token) - 1, len(token), len(token) + 1))
+            else:
+                ok = term != token and within_one_edit(token, term)
+            if ok:
+                terms.append(term)
+        return terms
+
+    def _token_matches(self, token: str, is_prefix: bool) -> tuple[np.ndarray, np.ndarray]:
+        """Sorted ids of the targets matching one query token, and their match weights."""
+        exact = self.edge_postings.get(token) if is_prefix else self.postings.get(token)
+        fuzzy = [self.postings[term] for term in self._fuzzy_terms(token, is_prefix)]
+        if not fuzzy:
+            if exact is None:
+                return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+            return exact, np.full(len(exact), EXACT_WEIGHT, dtype=np.float32)
+
+        ids = np.unique(np.concatenate(fuzzy))
+        weights = np.full(len(ids), FUZZY_WEIGHT, dtype=np.float32)
+        if exact is not None:
+            ids, inverse = np.unique(np.concatenate([ids, exact]), return_inverse=True)
+            weights = np.concatenate([weights, np.full(len(exact), EXACT_WEIGHT, dtype=np.float32)])
+            best = np.zeros(len(ids), dtype=np.float32)
+            np.maximum.at(best, inverse, weights)
+            weights = best
+        return ids, weights
+
+    def suggest(self, query: str, limit: int = 8) -> list[dict]:
+        """
+        Categories (at most MAX_CATEGORY_SUGGESTIONS) then products matching
+        every query token, best first. The last token is completed as a
+        prefix unless the query ends with a space.
+        """
+        tokens = _tokens(query)
+        if not tokens:
+            return []
+
+        last_is_prefix = not query[-1].isspace()
+        plan = [(t, False) for t in tokens[:-1] if t not in STOP_WORDS]
+        if last_is_prefix or tokens[-1] not in STOP_WORDS:
+            plan.append((tokens[-1], last_is_prefix))
+        if not plan:
+            return []
+
+        # Intersect the tokens' matches, most selective first
+        matches = sorted((self._token_matches(t, p) for t, p in plan), key=lambda m: len(m[0]))
+        ids, total = matches[0]
+        for other_ids, other_weights in matches[1:]:
+            if not len(ids):
+                break
+            ids, mine, theirs = np.intersect1d(ids, other_ids, assume_unique=True, return_indices=True)
+            total = total[mine] + other_weights[theirs]
+        key = total - self.tiebreak[ids]
+
+        split = np.searchsorted(ids, self.n_products)
+        products, product_key = ids[:split], key[:split]
+        if len(products) > limit:
+            top = np.argpartition(-product_key, limit - 1)[:limit]
+            products, product_key = products[top], product_key[top]
+        products = products[np.argsort(-product_key, kind="stable")]
+
+        category_ids = ids[split:][np.argsort(-key[split:], kind="stable")]
+
+        categories, seen = [], set()
+        for doc_id in category_ids:
+            doc = self.docs[doc_id]
+            if doc["category"] in seen:
+                continue
+            seen.add(doc["category"])
+            categories.append({"type": "category", "text": doc["text"], "category": doc["category"]})
+            if len(categories) >= MAX_CATEGORY_SUGGESTIONS:
+                break
+
+        suggestions = categories + [
+            {"type": "product", "text": self.docs[d]["text"], "product_id": self.docs[d]["product_id"]}
+            for d in products
+        ]
+        return suggestions[:limit]
+
+
+def _typo(word: str, rng: np.random.Generator) -> str:
+    """`word` with one random deletion, duplication or adjacent swap."""
+    i = int(rng.integers(0, len(word) - 1))
+    kind = int(rng.integers(0, 3))
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark typeahead latency.")
+    parser.add_argument("--products", type=int, default=100_000,
+                        help="Synthetic catalog size built from the store's title words (0 = the store as is)")
+    args = parser.parse_args()
+
+    from app.services.recommender_system import search_service
+
+    store = search_service.current_store()
+    if store is None:
+        raise SystemExit(1)
+
+    rng = np.random.default_rng(0)
+    products = store.metadata
+    if args.products:
+        vocab = sorted({t for p in products for t in _tokens(p.get("title") or "") if not t.isdigit()})
+        products = [
+            {"product_id": f"p{i}", "title": " ".join(rng.choice(vocab, int(rng.integers(3, 8)))),
+             "availability": {"in_stock": bool(i % 5)}}
+            for i in range(args.products)
+        ]
+
+    index = SuggestIndex.build(products)
+    titles = [_tokens(doc["text"]) for doc in index.docs if doc["type"] == "product"]
+    words = [t for t in dict.fromkeys(t for title in titles for t in title) if len(t) >= MIN_FUZZY_PREFIX]
+
+    queries = {"prefix": [], "typo": [], "multi-token": []}
+    for _ in range(2000):
+        word = str(rng.choice(words))
+        queries["prefix"].append(word[:int(rng.integers(1, len(word) + 1))])  # "mil"
+        queries["typo"].append(_typo(word, rng))  # "iddli"
+        title = titles[int(rng.integers(0, len(titles)))]
+        if len(title) < 2:
+            title = title * 2
+        first, second = title[0], title[1]
+        if len(first) >= MIN_FUZZY_LENGTH + 1:
+            first = _typo(first, rng)
+        queries["multi-token"].append(f"{first} {second[:max(1, len(second) - 1)]}")  # "milet nood"
+
+    print(f"📊 {len(index.docs)} suggestion targets ({index.n_products} products), {len(index.postings)} terms")
+    for kind, batch in queries.items():
+        latencies = []
+        for q in batch:
+            t0 = time.perf_counter()
+            index.suggest(q)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        print(f"{kind:>12}: p50 {np.percentile(latencies, 50):.3f} ms  p99 {np.percentile(latencies, 99):.3f} ms"
+              f"  ({len(batch)} queries, e.g. {batch[0]!r})")
@@ -2,6 +2,7 @@ import json
 import os
 from typing import List
 from app.core.exceptions import APIException
+from app.services.catalog_manifest import upsert_products
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data", "products")
@@ -176,6 +177,9 @@ def store_processed_product(product_data: dict, product_id: str = None) -> str:
         with open(file_path, "w", encoding="utf-8") as f:
             json.dump(product_data, f, ensure_ascii=False, indent=2)
         
+        # Keep the current-catalog manifest in sync
+        upsert_products([product_data])
+        
         return file_path
         
     except Exception as e:
@@ -224,6 +228,9 @@ def store_processed_collection(collection_url: str, products: List[dict]) -> str
         with open(file_path, "w", encoding="utf-8") as f:
             json.dump(collection_data, f, ensure_ascii=False, indent=2)
         
+        # Keep the current-catalog manifest in sync
+        upsert_products(products)
+        
         return file_path
         
     except Exception as e:
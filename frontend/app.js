@@ -1,5 +1,9 @@
 const API_BASE = "http://localhost:8000/api/v1";
 
+// --- CHAT SESSION ---
+// Minted by the server on the first message, then sent with every message
+let chatSessionId = localStorage.getItem('chatSessionId');
+
 // --- CART LOGIC ---
 let cart = JSON.parse(localStorage.getItem('cart')) || [];
 
@@ -68,12 +72,18 @@ async function sendMessage() {
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 message: text,
+                session_id: chatSessionId,
                 product_type: currentProductType
             })
         });
 
         const data = await res.json();
 
+        if (data.session_id) {
+            chatSessionId = data.session_id;
+            localStorage.setItem('chatSessionId', chatSessionId);
+        }
+
         // Remove typing indicator
         removeTypingIndicator(typingElement);
 
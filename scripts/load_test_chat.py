@@ -0,0 +1,138 @@
+"""
+Concurrent chat load test: throughput and latency of POST /api/v1/chat at
+increasing concurrency. With the endpoints non-blocking, throughput of a
+single uvicorn worker should grow with concurrency while latency stays flat,
+until the OpenAI connection pool or the blocking pool saturates.
+
+Against a running server (real LLM calls, costs tokens):
+    uvicorn app.main:app --workers 1
+    python scripts/load_test_chat.py --url http://localhost:8000
+
+In-process, with each LLM call replaced by a fixed sleep and the response
+cache off, to measure the serving path alone:
+    python scripts/load_test_chat.py --simulate-llm 0.5
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+MESSAGES = [
+    "ragi dosa mix",
+    "millet noodles",
+    "kids health mix under 300",
+    "something healthy for breakfast",
+    "idli mix combo",
+]
+
+
+def _simulate_llm(latency: float):
+    """Replace the LLM calls in the chat pipeline with `latency`-second sleeps."""
+    from app.services.ai import chat_handler
+
+    async def intent(user_message, history=None, local_first=True):
+        await asyncio.sleep(latency)
+        return {"intent": "recommendation", "rewritten_query": user_message,
+                "product_type_filter": "single", "constraints": {}}
+
+    async def recommendation(user_message, intent_data, products, history=None, on_token=None):
+        await asyncio.sleep(latency)
+        if on_token:
+            await on_token("Simulated reply")
+        return "Simulated reply", [p.get("product_id") for p in products]
+
+    async def text(user_message, on_token=None):
+        await asyncio.sleep(latency)
+        if on_token:
+            await on_token("Simulated reply")
+        return "Simulated reply"
+
+    chat_handler.extract_query_intent = intent
+    chat_handler.generate_recommendation = recommendation
+    chat_handler.generate_small_talk_response = text
+    chat_handler.generate_catalog_summary = text
+    chat_handler.get_cached_response = lambda *a: None
+
+
+def _isolate_state(directory: Path):
+    """Keep simulated sessions and cached replies out of the real stores."""
+    from app.services.ai import conversation_store, response_cache
+    from app.services.ai.session_backends import FileSessionBackend
+
+    conversation_store.set_backend(FileSessionBackend(directory))
+    response_cache.DB_PATH = directory / "responses.db"
+
+
+async def _run_level(client: httpx.AsyncClient, concurrency: int, rounds: int) -> dict:
+    latencies = []
+    errors = 0
+
+    async def one_user(user: int):
+        nonlocal errors
+        for i in range(rounds):
+            message = MESSAGES[(user + i) % len(MESSAGES)]
+            start = time.perf_counter()
+            response = await client.post("/api/v1/chat", json={"message": message, "session_id": f"load-{user}"})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one_user(u) for u in range(concurrency)])
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / wall,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+async def main(args):
+    if args.simulate_llm is not None:
+        from app.main import app
+        from app.services.recommender_system.search_service import load_resources
+        from app.services.ai.conversation_store import start_writer
+
+        _simulate_llm(args.simulate_llm)
+        _isolate_state(Path(tempfile.mkdtemp(prefix="chat-loadtest-")))
+        load_resources()
+        start_writer()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=120)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120, limits=httpx.Limits(max_connections=None))
+
+    async with client:
+        results = [await _run_level(client, c, args.rounds) for c in args.concurrency]
+    if args.simulate_llm is not None:
+        from app.services.ai.conversation_store import get_session_stats, stop_writer
+        stop_writer()
+        print(f"Session writes: {get_session_stats()['writes']} in {get_session_stats()['batches']} batches")
+
+    print(f"{'users':>6} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50 s':>7} {'p95 s':>7} {'scale':>6}")
+    base = results[0]["throughput"]
+    for r in results:
+        print(f"{r['concurrency']:>6} {r['requests']:>6} {r['errors']:>6} {r['throughput']:>8.2f} "
+              f"{r['p50']:>7.3f} {r['p95']:>7.3f} {r['throughput'] / base:>5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent chat load test")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 4, 16, 32])
+    parser.add_argument("--rounds", type=int, default=3, help="Messages sent by each simulated user")
+    parser.add_argument("--simulate-llm", type=float, default=None, metavar="SECONDS",
+                        help="Serve in-process with LLM calls replaced by sleeps of this length")
+    asyncio.run(main(parser.parse_args()))
@@ -1,6 +1,7 @@
 import json
 import os
 import re
+import sys
 
 # Determine project root and data paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -17,6 +18,16 @@ def get_product_type(title):
         return "combo"
     return "single"
 
+# Helper to update a single product dict
+def update_product_dict(p):
+    curr = p.get("product_type")
+    title = p.get("title")
+    new_type = get_product_type(title)
+    if curr != new_type:
+        p["product_type"] = new_type
+        return True
+    return False
+
 def update_file(filepath):
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -24,16 +35,6 @@ def update_file(filepath):
         
         updated = False
         
-        # Helper to update a single product dict
-        def update_product_dict(p):
-            curr = p.get("product_type")
-            title = p.get("title")
-            new_type = get_product_type(title)
-            if curr != new_type:
-                p["product_type"] = new_type
-                return True
-            return False
-
         # Case 1: Collection / Aggregated file
         if "products" in data and isinstance(data["products"], list):
             print(f"Processing collection file: {os.path.basename(filepath)}")
@@ -76,5 +77,10 @@ def main():
                 
     print(f"Scanned {count} files.")
 
+    # Migrate the manifest too: it also holds products whose snapshots were compacted
+    sys.path.append(BASE_DIR)
+    from app.services.catalog_manifest import update_manifest
+    update_manifest(update_product_dict)
+
 if __name__ == "__main__":
     main()
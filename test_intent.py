@@ -1,10 +1,11 @@
 from app.services.ai.query_understanding import extract_query_intent
+import asyncio
 import json
 
-def test_intent():
+async def check_intents():
     # Test 1: Single
     msg1 = "I want idli mix"
-    res1 = extract_query_intent(msg1, history=[])
+    res1 = await extract_query_intent(msg1, history=[])
     print(f"\nQuery: '{msg1}'")
     print(f"Filter: {res1.get('product_type_filter')}")
     print(f"Rewritten: {res1.get('rewritten_query')}")
@@ -13,10 +14,13 @@ def test_intent():
     msg2 = "Show me combos"
     # Simulate history where previous was idli
     hist = [{"role": "user", "content": "I want idli mix"}, {"role": "assistant", "content": "Here is idli mix..."}]
-    res2 = extract_query_intent(msg2, history=hist)
+    res2 = await extract_query_intent(msg2, history=hist)
     print(f"\nQuery: '{msg2}'")
     print(f"Filter: {res2.get('product_type_filter')}")
     print(f"Rewritten: {res2.get('rewritten_query')}")
 
+def test_intent():
+    asyncio.run(check_intents())
+
 if __name__ == "__main__":
     test_intent()
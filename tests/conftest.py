@@ -0,0 +1,201 @@
+import asyncio
+import socketserver
+import sys
+import json
+import threading
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+SAMPLE_PRODUCTS = [
+    {"product_id": "millet-rava-idli-mix", "title": "Millet Rava Idli Mix 500g", "product_type": "single",
+     "description": "Instant mix for soft millet idli. Ready in minutes.", "category": ["ready-to-cook"],
+     "pricing": {"currency": "INR", "price": 180}, "availability": {"in_stock": True},
+     "images": [{"url": "https://millex.in/idli.jpg", "alt_text": None}], "variants": []},
+    {"product_id": "idli-combo", "title": "Idli Mix Combo Total 800g - each 400g", "product_type": "combo",
+     "description": "Combo pack of two millet idli mixes.", "category": ["ready-to-cook"],
+     "pricing": {"currency": "INR", "price": 320}, "availability": {"in_stock": True},
+     "images": [{"url": "https://millex.in/idli-combo.jpg", "alt_text": None}], "variants": []},
+    {"product_id": "ragi-dosa-mix", "title": "Ragi Dosa Mix 400g", "product_type": "single",
+     "description": "Instant mix for crispy ragi dosa.", "category": ["ready-to-cook"],
+     "pricing": {"currency": "INR", "price": 150}, "availability": {"in_stock": False},
+     "images": [], "variants": []},
+    {"product_id": "kids-health-mix", "title": "Kids Health Mix 250g", "product_type": "single",
+     "description": "Health drink mix for toddler nutrition from 12 months.", "category": ["health-mix", "infant-food"],
+     "pricing": {"currency": "INR", "price": 199}, "availability": {"in_stock": True},
+     "images": [], "variants": []},
+    {"product_id": "millet-noodles", "title": "Millet Noodles 180g", "product_type": "single",
+     "description": "Quick cook noodles made from foxtail millet.", "category": [],
+     "pricing": {"currency": "INR", "price": 95}, "availability": {"in_stock": True},
+     "images": [], "variants": []},
+    {"product_id": "health-mix-combo", "title": "Health Mix Combo Pack of 2", "product_type": "combo",
+     "description": "Two multi-millet health drink mixes.", "category": ["health-mix"],
+     "pricing": {"currency": "INR", "price": 420}, "availability": {"in_stock": True},
+     "images": [], "variants": []},
+]
+
+
+@pytest.fixture
+def offline_store(monkeypatch, tmp_path):
+    """
+    Build a vector store from SAMPLE_PRODUCTS in tmp_path with the hashing
+    embedder, so search runs without network access or API keys.
+    """
+    from app.services import catalog_manifest
+    from app.services.recommender_system import embed_products, search_service, embedding_utils
+    from app.services.recommender_system import query_embedding_cache
+    from app.services.recommender_system.embedding_providers import HashingEmbeddingProvider
+
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    (processed / "all_processed_20250101_000000.json").write_text(
+        json.dumps({"products": SAMPLE_PRODUCTS}), encoding="utf-8"
+    )
+    monkeypatch.setattr(catalog_manifest, "PROCESSED_DIR", processed)
+    monkeypatch.setattr(catalog_manifest, "MANIFEST_PATH", tmp_path / "catalog_manifest.json")
+    monkeypatch.setattr(catalog_manifest, "JOURNAL_PATH", tmp_path / "catalog_manifest.log")
+
+    store = tmp_path / "vector_store"
+    monkeypatch.setattr(embed_products, "VECTOR_STORE", store)
+    monkeypatch.setattr(embed_products, "STORE_INFO_PATH", store / "store_info.json")
+    monkeypatch.setattr(embed_products, "LEXICAL_PATH", store / "lexical_index.json")
+    monkeypatch.setattr(embed_products, "SLIM_META_PATH", store / "products_slim.json")
+    monkeypatch.setattr(embed_products, "DOCUMENTS_PATH", store / "products.db")
+    monkeypatch.setattr(embed_products, "SIMILAR_PATH", store / "similar.npz")
+    monkeypatch.setattr(embed_products, "DIGEST_PATH", store / "catalog_digest.json")
+    monkeypatch.setattr(embed_products, "PRECOMPUTE_CATALOG_SUMMARY", False)
+    monkeypatch.setattr(search_service, "INDEX_PATH", store / "products.index")
+    monkeypatch.setattr(search_service, "META_PATH", store / "products_meta.json")
+    monkeypatch.setattr(search_service, "STORE_INFO_PATH", store / "store_info.json")
+    monkeypatch.setattr(search_service, "LEXICAL_PATH", store / "lexical_index.json")
+    monkeypatch.setattr(search_service, "SLIM_META_PATH", store / "products_slim.json")
+    monkeypatch.setattr(search_service, "DOCUMENTS_PATH", store / "products.db")
+    monkeypatch.setattr(search_service, "SIMILAR_PATH", store / "similar.npz")
+    monkeypatch.setattr(search_service, "DIGEST_PATH", store / "catalog_digest.json")
+
+    embedding_utils.set_provider(HashingEmbeddingProvider())
+    query_embedding_cache.clear_cache()
+
+    embed_products.generate_product_embeddings()
+    assert search_service.load_resources(force=True)
+
+    yield search_service
+
+    embedding_utils.set_provider(None)
+    query_embedding_cache.clear_cache()
+
+
+@pytest.fixture
+def offline_chat(monkeypatch):
+    """
+    Routes chat_handler around the LLMs, search and session files.
+    Call it with the parsed intent the "LLM" should return; it returns the
+    list of (query, product_type) searches made.
+    """
+    from app.services.ai import chat_handler
+
+    def route(parsed: dict, memory: dict | None = None, llm_latency: float = 0.05) -> list:
+        searches = []
+        memory = {"history": [], **(memory or {})}
+
+        def fake_search(query, k=5, memory=None, product_type="single"):
+            searches.append((query, product_type))
+            return [{"product_id": f"{product_type}-{query}-{i}", "title": query, "category": []} for i in range(2)]
+
+        async def slow_intent(user_message, history=None, local_first=True):
+            await asyncio.sleep(llm_latency)
+            return parsed
+
+        async def slow_recommendation(user_message, intent_data, products, history=None, on_token=None):
+            await asyncio.sleep(llm_latency)
+            if on_token:
+                await on_token("ok")
+            return "ok", [p["product_id"] for p in products]
+
+        monkeypatch.setattr(chat_handler, "SPECULATIVE_RETRIEVAL", True)
+        monkeypatch.setattr(chat_handler, "search_products", fake_search)
+        monkeypatch.setattr(chat_handler, "local_query_intent", lambda *a, **kw: None)
+        monkeypatch.setattr(chat_handler, "extract_query_intent", slow_intent)
+        monkeypatch.setattr(chat_handler, "generate_recommendation", slow_recommendation)
+        monkeypatch.setattr(chat_handler, "load_memory", lambda session_id: dict(memory))
+        monkeypatch.setattr(chat_handler, "update_memory", lambda session_id, updates: None)
+        monkeypatch.setattr(chat_handler, "append_message", lambda *a: None)
+        monkeypatch.setattr(chat_handler, "get_cached_response", lambda *a: None)
+        monkeypatch.setattr(chat_handler, "save_cached_response", lambda *a, **kw: None)
+        return searches
+
+    return route
+
+
+@pytest.fixture
+def session_store(tmp_path):
+    """conversation_store writing to a file backend in tmp_path (restored afterwards)."""
+    from app.services.ai import conversation_store
+    from app.services.ai.session_backends import FileSessionBackend
+
+    original = conversation_store._backend
+    conversation_store.set_backend(FileSessionBackend(tmp_path / "sessions"))
+    yield conversation_store
+    conversation_store.set_backend(original)
+
+
+@pytest.fixture
+def chat_sessions(offline_chat, session_store, monkeypatch):
+    """offline_chat, but keeping sessions in the real (tmp_path) session store."""
+    from app.services.ai import chat_handler
+
+    def route(parsed: dict, llm_latency: float = 0.05) -> list:
+        searches = offline_chat(parsed, llm_latency=llm_latency)
+        for name in ("load_memory", "update_memory", "append_message"):
+            monkeypatch.setattr(chat_handler, name, getattr(session_store, name))
+        return searches
+
+    return route
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Just enough of the Redis protocol for the session backend."""
+
+    def _read_command(self) -> list[bytes] | None:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        data, commands = self.server.data, self.server.commands
+        while (args := self._read_command()) is not None:
+            name = args[0].decode().upper()
+            commands.append([name] + [a.decode() for a in args[1:]])
+            if name in ("PING", "SELECT", "AUTH"):
+                reply = b"+OK\r\n"
+            elif name == "SET":
+                data[args[1]] = args[2]
+                reply = b"+OK\r\n"
+            elif name == "GET":
+                value = data.get(args[1])
+                reply = b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+            elif name == "DEL":
+                reply = b":%d\r\n" % sum(data.pop(key, None) is not None for key in args[1:])
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def resp_server():
+    """Local stand-in for a Redis server; yields it (url, data, commands)."""
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.data, server.commands = {}, []
+    server.url = f"redis://127.0.0.1:{server.server_address[1]}/1"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
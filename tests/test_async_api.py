@@ -0,0 +1,35 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from app.main import app
+
+LLM_LATENCY = 0.2
+CONCURRENT_CHATS = 8
+
+
+async def _chat_concurrently(n: int) -> list[httpx.Response]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*[
+            client.post("/api/v1/chat", json={"message": f"millet noodles {i}", "session_id": f"s{i}"})
+            for i in range(n)
+        ])
+
+
+def test_concurrent_chats_overlap_in_one_worker(offline_chat):
+    offline_chat({"intent": "recommendation", "rewritten_query": "millet noodles",
+                  "product_type_filter": "single", "constraints": {}}, llm_latency=LLM_LATENCY)
+
+    start = time.perf_counter()
+    responses = asyncio.run(_chat_concurrently(CONCURRENT_CHATS))
+    elapsed = time.perf_counter() - start
+
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json()["products"] for r in responses)
+    # Each chat waits on two LLM calls; served one at a time this would take 8 × 0.4 s
+    assert elapsed < CONCURRENT_CHATS * 2 * LLM_LATENCY / 3
@@ -0,0 +1,73 @@
+import asyncio
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services import catalog_manifest
+from app.services.ai import reasoning_engine
+from app.services.recommender_system import embed_products
+from app.services.recommender_system.catalog_digest import digest_text, load_catalog_digest
+from conftest import SAMPLE_PRODUCTS
+
+
+def test_digest_is_built_with_the_store(offline_store):
+    record = load_catalog_digest(offline_store.DIGEST_PATH)
+    digest = record["digest"]
+
+    assert digest["product_count"] == 6 and digest["in_stock"] == 5
+    assert digest["product_types"] == {"single": 4, "combo": 2}
+    assert digest["price"] == {"min": 95.0, "median": 189.5, "max": 420.0}
+    groups = {g["category"]: g for g in digest["categories"]}
+    assert groups["ready-to-cook"]["count"] == 3 and groups["ready-to-cook"]["in_stock"] == 2
+    assert groups["uncategorized"]["examples"] == ["Millet Noodles 180g"]
+    assert offline_store._read_store_info()["catalog_version"] == record["catalog_version"]
+    assert "ready-to-cook: 3 products (2 in stock, ₹150-₹320)" in digest_text(digest)
+
+
+def test_summary_is_generated_once_per_catalog_version(offline_store, monkeypatch):
+    calls = []
+
+    def fake_llm(model, messages, temperature):
+        calls.append(messages[1]["content"])
+        return f"Overview #{len(calls)}"
+
+    async def no_llm(*args, **kwargs):
+        raise AssertionError("summary should be served from the digest")
+
+    monkeypatch.setattr(reasoning_engine, "complete_blocking", fake_llm)
+    monkeypatch.setattr(reasoning_engine, "complete", no_llm)
+    monkeypatch.setattr(embed_products, "PRECOMPUTE_CATALOG_SUMMARY", True)
+
+    embed_products.generate_product_embeddings()
+    embed_products.generate_product_embeddings()  # same catalog: overview carried over
+    assert len(calls) == 1 and "Catalog Digest (6 products)" in calls[0]
+    assert asyncio.run(reasoning_engine.generate_catalog_summary()) == "Overview #1"
+
+    cheaper = dict(SAMPLE_PRODUCTS[4], pricing={"currency": "INR", "price": 79})
+    catalog_manifest.upsert_products([cheaper])
+    embed_products.generate_product_embeddings()
+    assert len(calls) == 2
+    assert asyncio.run(reasoning_engine.generate_catalog_summary()) == "Overview #2"
+
+
+def test_summary_missing_at_rebuild_is_generated_on_first_request(offline_store, monkeypatch):
+    calls = []
+
+    async def fake_llm(model, messages, temperature, on_token=None):
+        calls.append(model)
+        return "Overview"
+
+    monkeypatch.setattr(reasoning_engine, "complete", fake_llm)
+
+    assert load_catalog_digest(offline_store.DIGEST_PATH)["summary"] is None
+    for _ in range(2):
+        assert asyncio.run(reasoning_engine.generate_catalog_summary()) == "Overview"
+    assert len(calls) == 1
+    # The request path never writes the digest file; that is the index build's job
+    assert load_catalog_digest(offline_store.DIGEST_PATH)["summary"] is None
+
+    # Stores built before digests existed get one in memory from products_meta.json
+    offline_store.DIGEST_PATH.unlink()
+    assert asyncio.run(reasoning_engine.generate_catalog_summary()) == "Overview"
+    assert len(calls) == 2
+    assert not offline_store.DIGEST_PATH.exists()
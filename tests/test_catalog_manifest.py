@@ -0,0 +1,139 @@
+import sys
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services import catalog_manifest
+
+
+def _use_tmp_dirs(monkeypatch, tmp_path):
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    monkeypatch.setattr(catalog_manifest, "PROCESSED_DIR", processed)
+    monkeypatch.setattr(catalog_manifest, "MANIFEST_PATH", tmp_path / "catalog_manifest.json")
+    monkeypatch.setattr(catalog_manifest, "JOURNAL_PATH", tmp_path / "catalog_manifest.log")
+    return processed
+
+
+def _write(path: Path, data, mtime: float):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def test_manifest_newest_snapshot_wins(monkeypatch, tmp_path):
+    processed = _use_tmp_dirs(monkeypatch, tmp_path)
+
+    _write(processed / "all_processed_20240101_000000.json",
+           {"products": [{"product_id": "idli", "title": "Old Idli"}]}, 1000)
+    _write(processed / "all_processed_20240201_000000.json",
+           {"products": [{"product_id": "idli", "title": "New Idli"}, {"product_id": "dosa", "title": "Dosa"}]}, 2000)
+
+    products = catalog_manifest.load_catalog()
+    titles = sorted(p["title"] for p in products)
+    assert titles == ["Dosa", "New Idli"]
+
+    catalog_manifest.upsert_products([{"product_id": "ragi", "title": "Ragi"}])
+    assert len(catalog_manifest.load_catalog()) == 3
+
+
+def test_compaction_keeps_latest_and_products(monkeypatch, tmp_path):
+    processed = _use_tmp_dirs(monkeypatch, tmp_path)
+
+    for i in range(5):
+        _write(processed / f"all_processed_2020010{i + 1}_000000.json",
+               {"products": [{"product_id": f"p{i}", "title": f"P{i}"}]}, 1000 + i)
+    _write(processed / "idli.json", {"product_id": "idli", "title": "Idli"}, 1000)
+
+    removed = catalog_manifest.compact_snapshots(keep_latest=2, max_age_days=0)
+
+    assert sorted(removed) == [f"all_processed_2020010{i + 1}_000000.json" for i in range(3)]
+    assert (processed / "idli.json").exists()
+    # Products from deleted snapshots survive in the manifest
+    assert len(catalog_manifest.load_catalog()) == 6
+
+
+def test_rebuild_and_migration_keep_compacted_products(monkeypatch, tmp_path):
+    processed = _use_tmp_dirs(monkeypatch, tmp_path)
+
+    _write(processed / "all_processed_20200101_000000.json",
+           {"products": [{"product_id": "old", "title": "Old Pack of 2"}]}, 1000)
+    _write(processed / "all_processed_20200102_000000.json",
+           {"products": [{"product_id": "new", "title": "New"}]}, 2000)
+    catalog_manifest.compact_snapshots(keep_latest=1, max_age_days=0)
+    assert not (processed / "all_processed_20200101_000000.json").exists()
+
+    catalog_manifest.rebuild_manifest()
+    assert sorted(p["product_id"] for p in catalog_manifest.load_catalog()) == ["new", "old"]
+
+    def mark_combo(p):
+        if "pack of" not in p["title"].lower():
+            return False
+        p["product_type"] = "combo"
+        return True
+
+    assert catalog_manifest.update_manifest(mark_combo) == 1
+    types = {p["product_id"]: p.get("product_type") for p in catalog_manifest.load_catalog()}
+    assert types == {"new": None, "old": "combo"}
+
+
+def test_upserts_append_to_journal_until_folded(monkeypatch, tmp_path):
+    _use_tmp_dirs(monkeypatch, tmp_path)
+    monkeypatch.setattr(catalog_manifest, "MANIFEST_JOURNAL_MAX", 3)
+
+    catalog_manifest.upsert_products([{"product_id": "p0", "title": "P0"}])
+    manifest_mtime = catalog_manifest.MANIFEST_PATH.stat().st_mtime_ns
+
+    catalog_manifest.upsert_products([{"product_id": "p1", "title": "P1"}])
+    catalog_manifest.upsert_products([{"product_id": "p0", "title": "P0 v2"}])
+    assert catalog_manifest.MANIFEST_PATH.stat().st_mtime_ns == manifest_mtime
+    assert sorted(p["title"] for p in catalog_manifest.load_catalog()) == ["P0 v2", "P1"]
+
+    catalog_manifest.upsert_products([{"product_id": "p2", "title": "P2"}])
+    assert not catalog_manifest.JOURNAL_PATH.exists()
+    with open(catalog_manifest.MANIFEST_PATH, encoding="utf-8") as f:
+        assert json.load(f)["product_count"] == 3
+
+
+
+def test_append_from_another_worker_during_fold_is_kept(monkeypatch, tmp_path):
+    _use_tmp_dirs(monkeypatch, tmp_path)
+    monkeypatch.setattr(catalog_manifest, "MANIFEST_JOURNAL_MAX", 2)
+    catalog_manifest.upsert_products([{"product_id": "p0", "title": "P0"}])
+    catalog_manifest.upsert_products([{"product_id": "p1", "title": "P1"}])
+
+    # Another worker process ingests while this one is folding the journal
+    worker_code = (
+        "import sys; from pathlib import Path; sys.path.insert(0, sys.argv[1]);"
+        "from app.services import catalog_manifest as m;"
+        "m.PROCESSED_DIR, m.MANIFEST_PATH, m.JOURNAL_PATH = map(Path, sys.argv[2:5]);"
+        "m.upsert_products([{'product_id': 'late', 'title': 'Late'}])"
+    )
+    read_journal = catalog_manifest._read_journal
+    workers = []
+
+    def read_then_race():
+        products = read_journal()
+        if not workers:
+            workers.append(subprocess.Popen([
+                sys.executable, "-c", worker_code, str(Path(__file__).resolve().parent.parent),
+                str(catalog_manifest.PROCESSED_DIR), str(catalog_manifest.MANIFEST_PATH),
+                str(catalog_manifest.JOURNAL_PATH),
+            ]))
+            time.sleep(1.0)
+        return products
+
+    monkeypatch.setattr(catalog_manifest, "_read_journal", read_then_race)
+    catalog_manifest.upsert_products([{"product_id": "p2", "title": "P2"}])
+    workers[0].wait(30)
+    monkeypatch.setattr(catalog_manifest, "_read_journal", read_journal)
+
+    assert workers[0].returncode == 0
+    assert sorted(p["product_id"] for p in catalog_manifest.load_catalog()) == ["late", "p0", "p1", "p2"]
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
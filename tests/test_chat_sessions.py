@@ -0,0 +1,101 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from app.main import app
+from app.services.ai import chat_handler
+
+LLM_LATENCY = 0.1
+SESSIONS = 32
+PARSED = {"intent": "recommendation", "rewritten_query": "millet noodles",
+          "product_type_filter": "single", "constraints": {}}
+
+
+def _echo_recommendations(monkeypatch):
+    async def recommendation(user_message, intent_data, products, history=None, on_token=None):
+        await asyncio.sleep(LLM_LATENCY)
+        return f"answer to {user_message}", []
+
+    monkeypatch.setattr(chat_handler, "generate_recommendation", recommendation)
+
+
+async def _conversations(session_ids: list[str], turns: int) -> list[list[dict]]:
+    """Each session sends `turns` messages in sequence; all sessions at once."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def converse(session_id):
+            replies = []
+            for turn in range(turns):
+                response = await client.post("/api/v1/chat", json={"message": f"{session_id} turn {turn}",
+                                                                     "session_id": session_id})
+                replies.append(response.json())
+            return replies
+
+        return await asyncio.gather(*[converse(s) for s in session_ids])
+
+
+def test_sessions_run_in_parallel_without_cross_talk(chat_sessions, session_store, monkeypatch):
+    chat_sessions(PARSED, llm_latency=LLM_LATENCY)
+    _echo_recommendations(monkeypatch)
+
+    start = time.perf_counter()
+    asyncio.run(_conversations(["solo"], turns=2))
+    one_session = time.perf_counter() - start
+
+    session_ids = [f"user-{i}" for i in range(SESSIONS)]
+    start = time.perf_counter()
+    conversations = asyncio.run(_conversations(session_ids, turns=2))
+    many_sessions = time.perf_counter() - start
+
+    for session_id, replies in zip(session_ids, conversations):
+        assert [r["session_id"] for r in replies] == [session_id, session_id]
+        assert [r["response"] for r in replies] == [f"answer to {session_id} turn {t}" for t in range(2)]
+        history = session_store.load_memory(session_id)["history"]
+        assert [m["content"] for m in history] == [
+            f"{session_id} turn 0", f"answer to {session_id} turn 0",
+            f"{session_id} turn 1", f"answer to {session_id} turn 1",
+        ]
+    # 32 sessions take about as long as one: none waits on another's turn
+    assert many_sessions < 3 * one_session
+
+
+def test_turns_of_one_session_run_in_order(chat_sessions, session_store, monkeypatch):
+    chat_sessions(PARSED, llm_latency=LLM_LATENCY)
+    _echo_recommendations(monkeypatch)
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/api/v1/chat", json={"message": f"message {i}", "session_id": "shared"})
+                for i in range(5)
+            ])
+
+    start = time.perf_counter()
+    responses = asyncio.run(burst())
+    elapsed = time.perf_counter() - start
+
+    assert [r.json()["response"] for r in responses] == [f"answer to message {i}" for i in range(5)]
+    history = session_store.load_memory("shared")["history"]
+    # Each user message is directly followed by its own answer
+    assert all(history[i + 1]["content"] == f"answer to {history[i]['content']}" for i in range(0, 10, 2))
+    assert elapsed >= 5 * 2 * LLM_LATENCY
+
+
+def test_session_id_is_minted_and_validated(chat_sessions):
+    chat_sessions(PARSED, llm_latency=0)
+
+    async def post(body):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/v1/chat", json=body)
+
+    first = asyncio.run(post({"message": "millet noodles"}))
+    second = asyncio.run(post({"message": "millet noodles"}))
+    assert first.status_code == 200 and len(first.json()["session_id"]) == 32
+    assert first.json()["session_id"] != second.json()["session_id"]
+    assert asyncio.run(post({"message": "hi", "session_id": "../../etc/passwd"})).status_code == 422
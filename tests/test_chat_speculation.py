@@ -0,0 +1,56 @@
+import asyncio
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.ai import chat_handler
+
+
+def test_matching_speculation_is_reused(offline_chat):
+    searches = offline_chat({"intent": "recommendation", "rewritten_query": "Millet  Noodles",
+                             "product_type_filter": "single", "constraints": {}})
+    before = chat_handler.get_speculation_stats()
+
+    reply, products = asyncio.run(chat_handler.handle_user_message("s1", "millet noodles"))
+
+    assert [p["product_id"] for p in products] == ["single-millet noodles-0", "single-millet noodles-1"]
+    assert searches == [("millet noodles", "single")]  # the speculative search only
+    stats = chat_handler.get_speculation_stats()
+    assert stats["reused"] == before["reused"] + 1
+
+
+def test_mismatched_speculation_is_discarded(offline_chat):
+    searches = offline_chat({"intent": "recommendation", "rewritten_query": "ragi dosa mix",
+                             "product_type_filter": "single", "constraints": {}})
+    before = chat_handler.get_speculation_stats()
+
+    reply, products = asyncio.run(chat_handler.handle_user_message("s1", "something for breakfast, maybe dosa?"))
+
+    assert [p["product_id"] for p in products] == ["single-ragi dosa mix-0", "single-ragi dosa mix-1"]
+    assert sorted(searches) == [("ragi dosa mix", "single"), ("something for breakfast, maybe dosa?", "single")]
+    stats = chat_handler.get_speculation_stats()
+    assert stats["started"] == before["started"] + 1 and stats["reused"] == before["reused"]
+
+
+def test_combo_offer_speculates_on_last_query(offline_chat):
+    history = [{"role": "assistant", "content": "We also have idli combo packs. Want to see them?"}]
+    searches = offline_chat({"intent": "combo_upsell", "rewritten_query": None, "product_type_filter": "combo"},
+                            memory={"history": history, "last_query": "idli mix"})
+    before = chat_handler.get_speculation_stats()
+
+    reply, products = asyncio.run(chat_handler.handle_user_message("s1", "sure, show those"))
+
+    assert ("idli mix", "combo") in searches and searches.count(("idli mix", "combo")) == 1
+    assert chat_handler.get_speculation_stats()["reused"] == before["reused"] + 1
+
+
+def test_disabled_speculation_searches_only_the_rewrite(offline_chat, monkeypatch):
+    searches = offline_chat({"intent": "recommendation", "rewritten_query": "ragi dosa mix",
+                             "product_type_filter": "single", "constraints": {}})
+    monkeypatch.setattr(chat_handler, "SPECULATIVE_RETRIEVAL", False)
+    before = chat_handler.get_speculation_stats()
+
+    asyncio.run(chat_handler.handle_user_message("s1", "something for breakfast, maybe dosa?"))
+
+    assert searches == [("ragi dosa mix", "single")]
+    assert chat_handler.get_speculation_stats()["started"] == before["started"]
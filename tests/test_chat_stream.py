@@ -0,0 +1,92 @@
+import asyncio
+import gc
+import json
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from app.api.chat import _stream_turn
+from app.main import app
+from app.services.ai import chat_handler, reasoning_engine
+from app.services.ai.reasoning_engine import SelectedIdsFilter
+
+LLM_CHUNKS = [
+    "Millet Noodles - ₹95\n", "Quick cook noodles [made fresh].\n", "[SEL", "ECTED_IDS: single-",
+    "noodles-1]",
+]
+
+
+def test_selected_ids_tag_is_removed_across_chunk_boundaries():
+    tag_filter = SelectedIdsFilter()
+    visible = "".join(tag_filter.feed(chunk) for chunk in LLM_CHUNKS) + tag_filter.flush()
+    assert visible == "Millet Noodles - ₹95\nQuick cook noodles [made fresh].\n"
+
+    tag_filter = SelectedIdsFilter()
+    assert tag_filter.feed("Price [") == "Price "
+    assert tag_filter.flush() == "["
+
+
+async def _stream(message: str) -> list[tuple[str, dict]]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/api/v1/chat/stream", json={"message": message})
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            name, data = block.split("\n")
+            events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+        return events
+
+
+def test_stream_forwards_tokens_then_products(offline_chat, monkeypatch):
+    offline_chat({"intent": "recommendation", "rewritten_query": "noodles",
+                  "product_type_filter": "single", "constraints": {}})
+    monkeypatch.setattr(chat_handler, "generate_recommendation", reasoning_engine.generate_recommendation)
+
+    async def streaming_completion(model, messages, temperature, on_token=None):
+        for chunk in LLM_CHUNKS:
+            await on_token(chunk)
+        return "".join(LLM_CHUNKS)
+
+    monkeypatch.setattr(reasoning_engine, "complete", streaming_completion)
+
+    events = asyncio.run(_stream("millet noodles"))
+    names = [name for name, _ in events]
+    assert names[-2:] == ["products", "done"] and set(names[:-2]) == {"token"}
+
+    text = "".join(data["text"] for name, data in events if name == "token")
+    assert "SELECTED_IDS" not in text and text.startswith("Millet Noodles")
+    assert [p["product_id"] for p in events[-2][1]["products"]] == ["single-noodles-1"]
+    assert 0 <= events[-1][1]["ttft_ms"] <= events[-1][1]["total_ms"]
+
+
+def test_disconnected_client_leaves_the_turn_running_and_its_error_retrieved(offline_chat, monkeypatch, capsys):
+    offline_chat({"intent": "recommendation", "rewritten_query": "noodles",
+                  "product_type_filter": "single", "constraints": {}})
+    finished = []
+
+    async def failing_recommendation(user_message, intent_data, products, history=None, on_token=None):
+        await on_token("Millet")
+        await asyncio.sleep(0.05)
+        finished.append(True)
+        raise RuntimeError("LLM went away")
+
+    monkeypatch.setattr(chat_handler, "generate_recommendation", failing_recommendation)
+
+    async def disconnect_after_first_token():
+        unhandled = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+
+        events = _stream_turn("s1", "millet noodles", None, 0.0)
+        assert (await events.__anext__()).startswith("event: token")
+        await events.aclose()  # the SSE client disconnects
+
+        await asyncio.sleep(0.2)
+        gc.collect()
+        return unhandled
+
+    assert asyncio.run(disconnect_after_first_token()) == []
+    assert finished == [True]  # the turn ran to completion
+    assert "failed after the client disconnected: LLM went away" in capsys.readouterr().out
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.ai import intent_classifier
+
+
+def test_plain_requests_resolve_locally_with_budget_and_type(offline_store):
+    parsed = intent_classifier.classify("I want ragi dosa mix under Rs 200")
+    assert parsed["intent"] == "recommendation"
+    assert parsed["rewritten_query"] == "ragi dosa mix"
+    assert parsed["constraints"]["budget"] == "200"
+    assert parsed["product_type_filter"] == "single"
+
+    assert intent_classifier.classify("idli combo pack")["product_type_filter"] == "combo"
+
+
+def test_small_talk_website_info_and_combo_upsell():
+    assert intent_classifier.classify("Hello!")["intent"] == "small_talk"
+    assert intent_classifier.classify("what do you sell?")["intent"] == "website_info"
+
+    offer = [{"role": "assistant", "content": "Would you like to see combo packs?"}]
+    upsell = intent_classifier.classify("yes please", history=offer)
+    assert upsell["intent"] == "combo_upsell" and upsell["product_type_filter"] == "combo"
+
+
+def test_context_dependent_messages_go_to_the_llm(offline_store):
+    for message in ["show me more", "compare them", "how do I cook idli", "show me combos", "where is my order"]:
+        assert intent_classifier.classify(message) is None, message
@@ -0,0 +1,124 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from app.core.cache import TTLCache
+from app.services.ai import llm_client
+
+MESSAGES = [{"role": "system", "content": "You are a shop assistant."}, {"role": "user", "content": "what do you sell?"}]
+DELTAS = ["We sell ", "millet mixes ", "and combos."]
+
+
+class FakeCompletions:
+    """Stands in for chat.completions: counts requests, answers after `latency`."""
+
+    def __init__(self, latency=0.1, fail=False):
+        self.latency = latency
+        self.fail = fail
+        self.requests = []
+
+    async def create(self, model, messages, temperature, stream=False):
+        self.requests.append({"model": model, "messages": messages, "temperature": temperature, "stream": stream})
+        if not stream:
+            await asyncio.sleep(self.latency)
+            if self.fail:
+                raise RuntimeError("upstream error")
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="".join(DELTAS)))])
+        return self._stream()
+
+    async def _stream(self):
+        for text in DELTAS:
+            await asyncio.sleep(self.latency / len(DELTAS))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    completions = FakeCompletions()
+    monkeypatch.setattr(llm_client, "get_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(llm_client, "LLM_SINGLE_FLIGHT", True)
+    monkeypatch.setattr(llm_client, "LLM_MEMO_TTL", 0)
+    return completions
+
+
+def test_identical_concurrent_calls_share_one_completion(upstream):
+    async def burst():
+        same = [llm_client.complete("gpt-4o-mini", MESSAGES, 0.7) for _ in range(20)]
+        other = llm_client.complete("gpt-4o-mini", MESSAGES, 0.2)
+        return await asyncio.gather(*same, other)
+
+    started = time.perf_counter()
+    replies = asyncio.run(burst())
+
+    assert set(replies) == {"We sell millet mixes and combos."}
+    assert [r["temperature"] for r in upstream.requests] == [0.7, 0.2]  # a different fingerprint is its own call
+    assert time.perf_counter() - started < 3 * upstream.latency
+    assert llm_client._flights == {}
+
+
+def test_streaming_callers_share_the_stream(upstream):
+    async def callers():
+        tokens = {"first": [], "late": []}
+
+        async def collect(name):
+            async def on_token(text):
+                tokens[name].append(text)
+            return on_token
+
+        first = asyncio.create_task(llm_client.complete("gpt-4o-mini", MESSAGES, 0.7, on_token=await collect("first")))
+        await asyncio.sleep(upstream.latency * 0.8)  # join after two deltas
+        late = await llm_client.complete("gpt-4o-mini", MESSAGES, 0.7, on_token=await collect("late"))
+        plain = await asyncio.gather(first)
+        return tokens, late, plain[0]
+
+    tokens, late, first = asyncio.run(callers())
+
+    assert len(upstream.requests) == 1 and upstream.requests[0]["stream"]
+    assert tokens["first"] == DELTAS
+    assert tokens["late"] == ["We sell millet mixes ", "and combos."]  # catch-up, then live
+    assert first == late == "We sell millet mixes and combos."
+
+
+def test_errors_reach_every_caller_and_a_cancelled_caller_leaves_others_running(upstream):
+    upstream.fail = True
+
+    async def failing():
+        return await asyncio.gather(*(llm_client.complete("gpt-4o-mini", MESSAGES, 0) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(failing())
+    assert len(upstream.requests) == 1 and all(isinstance(e, RuntimeError) for e in errors)
+
+    upstream.fail = False
+
+    async def one_cancelled():
+        leaving = asyncio.create_task(llm_client.complete("gpt-4o-mini", MESSAGES, 0))
+        staying = asyncio.create_task(llm_client.complete("gpt-4o-mini", MESSAGES, 0))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        return await staying
+
+    assert asyncio.run(one_cancelled()) == "We sell millet mixes and combos."
+    assert len(upstream.requests) == 2
+
+
+def test_memo_reuses_temperature_zero_results(upstream, monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_MEMO_TTL", 30)
+    monkeypatch.setattr(llm_client, "_memo", TTLCache(max_entries=16, ttl_seconds=30))
+
+    async def sequential():
+        replies = [await llm_client.complete("gpt-4o-mini", MESSAGES, 0) for _ in range(3)]
+        replies.append(await llm_client.complete("gpt-4o-mini", MESSAGES, 0.7))
+        replies.append(await llm_client.complete("gpt-4o-mini", MESSAGES, 0.7))
+        return replies
+
+    before = llm_client.get_llm_stats()["memo_hits"]
+    replies = asyncio.run(sequential())
+
+    assert len(set(replies)) == 1
+    assert [r["temperature"] for r in upstream.requests] == [0, 0.7, 0.7]  # only temperature 0 is memoised
+    assert llm_client.get_llm_stats()["memo_hits"] - before == 2
@@ -0,0 +1,86 @@
+import asyncio
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.processor import process_millex_product
+from app.services.ai import reasoning_engine
+from app.services.ai.prompt_builder import build_recommendation_prompt, count_tokens
+from app.services.recommender_system.product_digest import build_product_digest
+from app.services.recommender_system.search_service import search_products
+from conftest import SAMPLE_PRODUCTS
+
+LONG_DESCRIPTION = (
+    "Our millet upma mix is made in small batches. Rich in fibre and protein for a filling breakfast. "
+    "Ready in 10 minutes with just hot water. " + "The story of millets goes back centuries. " * 40
+)
+
+
+def test_digest_is_attached_at_ingest():
+    product = process_millex_product({
+        "url": "https://millex.in/products/upma-mix?variant=1",
+        "title": "Millet Upma Mix 1kg",
+        "description_html": f"<p>{LONG_DESCRIPTION}</p>",
+        "price": 210,
+        "variants": [],
+        "availability": True,
+    })
+
+    digest = product["prompt_digest"]
+    assert digest["weight_g"] == 1000 and "type" not in digest and "price" not in digest
+    assert digest["benefits"][:2] == ["Rich in fibre and protein for a filling breakfast", "Ready in 10 minutes with just hot water"]
+
+
+def test_searched_products_carry_their_digest(offline_store):
+    results = search_products("idli mix", k=3, product_type="any")
+
+    idli = next(p for p in results if p["product_id"] == "millet-rava-idli-mix")
+    assert idli["prompt_digest"]["weight_g"] == 500
+    assert idli["prompt_digest"]["benefits"] == ["Instant mix for soft millet idli", "Ready in minutes"]
+
+
+def test_prompt_stays_within_budget():
+    products = [dict(p, description=LONG_DESCRIPTION) for p in SAMPLE_PRODUCTS]
+    history = [{"role": "user" if i % 2 else "assistant", "content": f"message {i} " + "words " * 200} for i in range(8)]
+    template = 'User Question: "idli"\n{history}\nProduct Data:\n{products}'
+
+    roomy = build_recommendation_prompt("system", template, products, history, budget=5000)
+    assert roomy["products"] == len(products) and roomy["history"] == 5 and not roomy["trimmed"]
+    assert "Key Benefits" in roomy["messages"][1]["content"] and "centuries" not in roomy["messages"][1]["content"]
+
+    some_history = build_recommendation_prompt("system", template, products, history, budget=600)
+    content = some_history["messages"][1]["content"]
+    assert some_history["prompt_tokens"] <= 600 and some_history["history"] == 2
+    assert "message 7" in content and "message 6" in content and "message 5" not in content
+
+    tight = build_recommendation_prompt("system", template, products, history, budget=150)
+    content = tight["messages"][1]["content"]
+    assert tight["trimmed"] and tight["prompt_tokens"] <= 150
+    assert tight["prompt_tokens"] == count_tokens("system") + count_tokens(content) + 8
+    assert tight["history"] == 0 and "Key Benefits" not in content
+    assert 0 < tight["products"] < len(products) and "millet-rava-idli-mix" in content
+
+
+def test_prompt_reads_type_and_price_from_the_product():
+    product = dict(SAMPLE_PRODUCTS[0], description=LONG_DESCRIPTION)
+    product["prompt_digest"] = build_product_digest(product)
+    product.update(product_type="combo", pricing={"price": 99})  # edited in place by a migration
+
+    content = build_recommendation_prompt("system", "{history}{products}", [product])["messages"][1]["content"]
+    assert "Type: combo" in content and "Price: ₹99" in content
+
+
+def test_recommendation_prompt_uses_digests(monkeypatch):
+    sent = []
+
+    async def fake_llm(model, messages, temperature, on_token=None):
+        sent.append(messages)
+        return "Here you go."  # no SELECTED_IDS tag: falls back to the products shown
+
+    monkeypatch.setattr(reasoning_engine, "complete", fake_llm)
+    products = [dict(p, description=LONG_DESCRIPTION) for p in SAMPLE_PRODUCTS[:3]]
+
+    reply, ids = asyncio.run(reasoning_engine.generate_recommendation("idli", {"intent": "recommendation"}, products))
+
+    assert reply == "Here you go." and ids == [p["product_id"] for p in products]
+    assert "Rich in fibre and protein" in sent[0][1]["content"] and "centuries" not in sent[0][1]["content"]
@@ -0,0 +1,75 @@
+import sys
+import threading
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from app.core.cache import TTLCache, SingleFlight
+from app.services.recommender_system import embedding_utils, query_embedding_cache
+
+
+def test_ttl_cache_lru_and_expiry():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recent
+    cache.set("c", 3)           # evicts "b"
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    cache.set("old", 4, stored_at=time.time() - 120)
+    assert cache.get("old") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    calls = []
+    gate = threading.Event()
+
+    def slow():
+        calls.append(1)
+        gate.wait(1)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert results == [42] * 5
+    assert len(calls) == 1
+
+
+def test_embed_query_is_cached_per_normalised_text(monkeypatch, tmp_path):
+    calls = []
+
+    def fake_embed(texts):
+        calls.append(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    monkeypatch.setattr(embedding_utils, "embed_texts", fake_embed)
+    query_embedding_cache.clear_cache()
+
+    first = query_embedding_cache.embed_query("Idli  Mix")
+    first *= 0  # callers may normalise in place without corrupting the cache
+    second = query_embedding_cache.embed_query(" idli mix ")
+
+    assert len(calls) == 1
+    assert second.shape == (1, 4) and second.sum() == 4
+
+    path = tmp_path / "query_cache.npz"
+    assert query_embedding_cache.save_cache(str(path)) == 1
+    query_embedding_cache.clear_cache()
+    assert query_embedding_cache.load_cache(str(path)) == 1
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
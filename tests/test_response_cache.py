@@ -0,0 +1,110 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from app.services.ai import chat_handler, query_understanding, response_cache
+from app.services.recommender_system import embedding_utils, query_embedding_cache
+from app.services.recommender_system.embedding_providers import HashingEmbeddingProvider
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(response_cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(response_cache, "DB_PATH", tmp_path / "responses.db")
+    response_cache._memory.clear()
+    response_cache._semantic.clear()
+    yield response_cache
+    response_cache._memory.clear()
+    response_cache._semantic.clear()
+
+
+def test_disk_tier_backs_memory_tier_and_shared_intents_cross_sessions(cache):
+    cache.save_cached_response("s1", "Ragi dosa mix", "Try Ragi Dosa Mix",
+                               products=[{"product_id": "ragi-dosa-mix"}], intent="recommendation",
+                               rewritten_query="ragi dosa mix")
+    cache.save_cached_response("s1", "hello", "Hi there!", intent="small_talk")
+
+    cache._memory.clear()  # e.g. another worker or a restart
+    entry = cache.get_cached_response("s1", "ragi  dosa MIX")
+    assert entry["response"] == "Try Ragi Dosa Mix" and entry["products"] == [{"product_id": "ragi-dosa-mix"}]
+    assert cache.get_cached_response("s2", "ragi dosa mix") is None  # recommendations are per session
+    assert cache.get_cached_response("s2", "Hello")["response"] == "Hi there!"
+    assert cache.get_cache_stats()["disk_hits"] >= 2
+
+
+def test_sweep_expires_trims_and_compacts(cache, monkeypatch):
+    monkeypatch.setattr(cache, "RESPONSE_CACHE_DISK_MAX_ENTRIES", 50)
+    for i in range(200):
+        cache.save_cached_response("s1", f"question {i} " + "x" * 500, "answer " * 50, intent="recommendation")
+
+    stale = time.time() - cache.CACHE_TTL_SECONDS - 1
+    cache._db().execute("UPDATE responses SET stored_at = ? WHERE body LIKE '%question 1%'", (stale,))
+    cache._db().commit()
+
+    (cache.CACHE_DIR / ("ab" * 32 + ".json")).write_text('{"response": "old file cache"}')
+
+    result = cache.sweep()
+    assert result["legacy_files_removed"] == 1 and not list(cache.CACHE_DIR.glob("*.json"))
+    assert result["expired"] == 111  # question 1, 10-19, 100-199
+    assert result["trimmed"] == 200 - 111 - 50
+    assert result["compacted"]
+    assert cache._db().execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 50
+    cache._memory.clear()
+    assert cache.get_cached_response("s1", "question 20 " + "x" * 500) is None  # oldest, trimmed
+    assert cache.get_cached_response("s1", "question 60 " + "x" * 500) is not None
+
+
+def test_semantic_tier_matches_near_duplicates_of_shared_replies(cache, monkeypatch):
+    monkeypatch.setattr(cache, "RESPONSE_CACHE_SEMANTIC", True)
+    monkeypatch.setattr(cache._semantic, "threshold", 0.8)
+    embedding_utils.set_provider(HashingEmbeddingProvider())
+    query_embedding_cache.clear_cache()
+    try:
+        cache.save_cached_response("s1", "what products do you sell", "We sell millet foods.", intent="website_info")
+        cache.save_cached_response("s1", "what millet noodles do you sell", "Millet Noodles.", intent="recommendation")
+
+        assert cache.get_cached_response("s2", "what products do you sell?")["response"] == "We sell millet foods."
+        assert cache.get_cached_response("s2", "which biscuits are gluten free") is None
+        assert cache.get_cache_stats()["semantic_hits"] >= 1
+    finally:
+        embedding_utils.set_provider(None)
+        query_embedding_cache.clear_cache()
+
+
+def test_cache_hit_skips_intent_extraction(offline_chat, monkeypatch):
+    offline_chat({"intent": "recommendation"})
+
+    async def no_llm(*args, **kwargs):
+        raise AssertionError("intent LLM called on a cache hit")
+
+    entry = {"response": "Cached reply", "products": [{"product_id": "millet-noodles"}],
+             "intent": "recommendation", "rewritten_query": "millet noodles", "timestamp": time.time()}
+    monkeypatch.setattr(chat_handler, "get_cached_response", lambda *a: entry)
+    monkeypatch.setattr(chat_handler, "local_query_intent", no_llm)
+    monkeypatch.setattr(chat_handler, "extract_query_intent", no_llm)
+
+    reply, products = asyncio.run(chat_handler.handle_user_message("s1", "millet noodles"))
+    assert reply == "Cached reply" and products == [{"product_id": "millet-noodles"}]
+
+
+def test_context_dependent_messages_are_never_shared(cache, offline_chat, monkeypatch):
+    cache.save_cached_response("a", "ok", "Glad to help!", intent="small_talk")
+    cache.save_cached_response("a", "show me more", "Here are more.", products=[{"product_id": "x"}], intent="recommendation")
+    assert cache.get_cached_response("a", "ok") is None and cache.get_cached_response("b", "OK") is None
+    assert cache.get_cached_response("a", "show me more") is None
+
+    # Session B accepts a combo offer with the same "ok"
+    searches = offline_chat({"intent": "small_talk"}, memory={
+        "last_query": "ragi dosa mix",
+        "history": [{"role": "assistant", "content": "Would you like to see combo packs as well?"}],
+    })
+    monkeypatch.setattr(chat_handler, "local_query_intent", query_understanding.local_query_intent)
+    monkeypatch.setattr(chat_handler, "get_cached_response", cache.get_cached_response)
+    monkeypatch.setattr(chat_handler, "save_cached_response", cache.save_cached_response)
+
+    reply, products = asyncio.run(chat_handler.handle_user_message("b", "ok"))
+    assert searches == [("ragi dosa mix", "combo")] and products
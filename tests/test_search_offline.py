@@ -0,0 +1,267 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.recommender_system import embedding_utils
+from app.services.recommender_system.embedding_providers import HashingEmbeddingProvider, OpenAIEmbeddingProvider
+
+
+def test_hashing_embedder_is_deterministic():
+    a = HashingEmbeddingProvider(dimension=64).embed(["Millet Idli Mix"])
+    b = HashingEmbeddingProvider(dimension=64).embed(["Millet Idli Mix"])
+    assert a.shape == (1, 64)
+    assert (a == b).all()
+
+
+def test_search_filters_by_type_and_budget(offline_store):
+    results = offline_store.search_products("idli mix", k=3, product_type="single")
+    assert results
+    assert all(p["product_type"] == "single" for p in results)
+    assert results[0]["product_id"] == "millet-rava-idli-mix"
+
+    combos = offline_store.search_products("idli mix", k=3, product_type="combo", memory={"budget": 350})
+    assert [p["product_id"] for p in combos] == ["idli-combo"]
+
+
+def test_store_built_by_other_provider_is_refused(offline_store):
+    embedding_utils.set_provider(HashingEmbeddingProvider(dimension=128))
+    assert not offline_store.load_resources(force=True)
+
+
+def test_legacy_store_is_checked_against_the_openai_dimension(offline_store):
+    offline_store.STORE_INFO_PATH.unlink()  # store built before store_info existed (index.d == 256)
+
+    embedding_utils.set_provider(OpenAIEmbeddingProvider("text-embedding-3-small", api_key=None, dimensions=128))
+    assert not offline_store.load_resources(force=True)
+
+    embedding_utils.set_provider(OpenAIEmbeddingProvider("text-embedding-3-small", api_key=None, dimensions=256))
+    assert offline_store.load_resources(force=True)
+
+
+def test_reload_waits_for_the_completed_build_and_refuses_mixed_stores(offline_store):
+    import json, os
+
+    version = offline_store.get_result_cache_stats()["store_version"]
+    slim = json.loads(offline_store.SLIM_META_PATH.read_text())
+
+    # A build in progress: records rewritten, store_info (the marker) not yet
+    offline_store.SLIM_META_PATH.write_text(json.dumps(slim[:-1]))
+    os.utime(offline_store.INDEX_PATH)
+    assert offline_store.load_resources()
+    assert offline_store.get_result_cache_stats()["store_version"] == version  # still the loaded store
+
+    # Files from different builds are never served together
+    assert not offline_store.load_resources(force=True)
+
+    offline_store.SLIM_META_PATH.write_text(json.dumps(slim))
+    marker = offline_store.STORE_INFO_PATH.stat()
+    os.utime(offline_store.STORE_INFO_PATH, ns=(marker.st_atime_ns, marker.st_mtime_ns + 10**9))  # the build completes
+    assert offline_store.load_resources()
+    assert offline_store.get_result_cache_stats()["store_version"] > version
+
+
+def test_reload_is_published_once_and_a_failed_reload_keeps_serving(offline_store, monkeypatch):
+    import os, threading, time
+
+    def complete_build():
+        marker = offline_store.STORE_INFO_PATH.stat()
+        os.utime(offline_store.STORE_INFO_PATH, ns=(marker.st_atime_ns, marker.st_mtime_ns + 10**9))
+
+    before = offline_store.current_store()
+    load_store = offline_store._load_store
+
+    def broken(marker, version):
+        raise ValueError("unreadable store")
+
+    monkeypatch.setattr(offline_store, "_load_store", broken)
+    complete_build()
+    assert offline_store.search_products("idli mix", k=1)[0]["product_id"] == "millet-rava-idli-mix"
+    assert offline_store.current_store() is before
+
+    loads = []
+
+    def slow_load(marker, version):
+        loads.append(version)
+        time.sleep(0.05)
+        return load_store(marker, version)
+
+    monkeypatch.setattr(offline_store, "_load_store", slow_load)
+    complete_build()
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(offline_store.current_store())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(loads) == 1 and len({id(store) for store in seen}) == 1
+    assert seen[0] is not before and seen[0].version == before.version + 1
+
+
+def test_exact_product_name_skips_embedding(offline_store, monkeypatch):
+    def no_embedding(query):
+        raise AssertionError("embedding should be skipped for an exact product name")
+
+    monkeypatch.setattr(offline_store, "embed_query", no_embedding)
+    results = offline_store.search_products("ragi dosa mix", k=2, product_type="any")
+    assert results[0]["product_id"] == "ragi-dosa-mix"
+
+
+def test_lexical_index_ranks_title_matches_first():
+    from app.services.recommender_system.lexical_index import LexicalIndex
+    from conftest import SAMPLE_PRODUCTS
+
+    lexical = LexicalIndex.build(SAMPLE_PRODUCTS)
+    ids, scores = lexical.search("millet noodles", k=3)
+    assert SAMPLE_PRODUCTS[ids[0]]["product_id"] == "millet-noodles"
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_batch_search_matches_single_searches(offline_store, monkeypatch):
+    from app.services.recommender_system import embedding_utils, query_embedding_cache
+
+    requests = [
+        {"query": "idli", "k": 2, "product_type": "any"},
+        {"query": "health drink for kids", "k": 2, "product_type": "single", "budget": 250},
+        {"query": "combo", "k": 3, "product_type": "combo"},
+    ]
+    expected = [
+        [p["product_id"] for p in offline_store.search_products(
+            r["query"], k=r["k"], product_type=r["product_type"], memory={"budget": r.get("budget")})]
+        for r in requests
+    ]
+
+    calls = []
+    real_embed = embedding_utils.embed_texts
+    monkeypatch.setattr(embedding_utils, "embed_texts", lambda texts: calls.append(texts) or real_embed(texts))
+    query_embedding_cache.clear_cache()
+
+    batch = offline_store.search_products_batch(requests)
+
+    assert [[p["product_id"] for p in results] for results in batch] == expected
+    assert len(calls) <= 1
+
+
+def test_results_are_hydrated_lazily_and_projected(offline_store, monkeypatch):
+    full = offline_store.search_products("idli mix", k=1, product_type="single")
+    assert "description" in full[0]  # full document fetched for the hit
+
+    assert all("description" not in r for r in offline_store.current_store().metadata)
+
+    def no_documents(ids):
+        raise AssertionError("slim fields must not touch the document store")
+
+    monkeypatch.setattr(offline_store.current_store().documents, "get_many", no_documents)
+    slim = offline_store.search_products("idli mix", k=1, product_type="single", fields=["product_id", "thumbnail"])
+    assert slim == [{"product_id": "millet-rava-idli-mix", "thumbnail": "https://millex.in/idli.jpg",
+                     "similarity_score": slim[0]["similarity_score"]}]
+
+
+def test_compressed_store_is_memory_mapped_and_filtered(offline_store, monkeypatch):
+    import json
+    from functools import partial
+    from app.services.recommender_system import embed_products, index_factory
+
+    monkeypatch.setattr(embed_products, "build_index", partial(index_factory.build_index, encoding="int8", pca_dim=4))
+    embed_products.generate_product_embeddings()
+    assert offline_store.load_resources(force=True)
+
+    store_info = json.loads(offline_store.STORE_INFO_PATH.read_text())
+    assert store_info["encoding"] == "int8" and store_info["pca_dim"] == 4
+    assert store_info["dimension"] == offline_store.current_store().index.d
+
+    # The codes are mapped from the index file, not copied into private memory
+    maps = Path("/proc/self/maps")
+    if maps.exists():
+        assert str(offline_store.INDEX_PATH) in maps.read_text()
+
+    # Filtered searches take the exact subset scan over decoded int8 codes
+    monkeypatch.setattr(offline_store, "SEARCH_MODE", "vector")
+    results = offline_store.search_products("breakfast", k=3, product_type="single")
+    assert len(results) == 3
+    assert all(p["product_type"] == "single" for p in results)
+    assert [p["similarity_score"] for p in results] == sorted((p["similarity_score"] for p in results), reverse=True)
+
+
+def test_repeated_search_is_served_from_result_cache(offline_store, monkeypatch):
+    monkeypatch.setattr(offline_store, "SEARCH_MODE", "vector")
+    first = offline_store.search_products("Health  Mix", k=2, product_type="any")
+    retrieve = offline_store._retrieve
+
+    def no_retrieval(*args, **kwargs):
+        raise AssertionError("cached query should not hit the index")
+
+    monkeypatch.setattr(offline_store, "_retrieve", no_retrieval)
+    second = offline_store.search_products("health mix", k=2, product_type="any")
+    assert second == first
+    assert offline_store.get_result_cache_stats()["hits"] >= 1
+
+    # Swapping the index invalidates every cached result
+    monkeypatch.setattr(offline_store, "_retrieve", retrieve)
+    version = offline_store.get_result_cache_stats()["store_version"]
+    assert offline_store.load_resources(force=True)
+    stats = offline_store.get_result_cache_stats()
+    assert stats["store_version"] == version + 1 and stats["entries"] == 0
+
+
+def test_faceted_search_filters_pages_and_counts(offline_store):
+    page = offline_store.search_products_faceted(
+        "", product_type="single", categories=["ready-to-cook"], in_stock=True, page_size=5,
+    )
+    assert [p["product_id"] for p in page["results"]] == ["millet-rava-idli-mix"]
+    assert page["total"] == 1
+
+    facets = page["facets"]
+    # Each facet is counted with the other filters applied
+    assert facets["product_type"] == {"single": 1, "combo": 1}
+    assert facets["category"]["ready-to-cook"] == 1 and facets["category"]["infant-food"] == 1
+    assert facets["in_stock"] == {"true": 1, "false": 1}
+    assert sum(bucket["count"] for bucket in facets["price"]) == 1
+
+    priced = offline_store.search_products_faceted("mix", product_type="any", min_price=150, max_price=350, page_size=2)
+    assert priced["total"] > 2 and len(priced["results"]) == 2
+    assert all(150 <= p["pricing"]["price"] <= 350 for p in priced["results"])
+    second = offline_store.search_products_faceted("mix", product_type="any", min_price=150, max_price=350, page=1, page_size=2)
+    assert not {p["product_id"] for p in second["results"]} & {p["product_id"] for p in priced["results"]}
+
+
+def test_faceted_filters_are_applied_in_retrieval_not_to_a_pool(offline_store, monkeypatch):
+    monkeypatch.setattr(offline_store, "FACET_POOL_SIZE", 2)
+
+    # Both combos rank below the top-2 pool for "noodles" but are still found
+    combos = offline_store.search_products_faceted("noodles", product_type="combo", page_size=5)
+    assert {p["product_id"] for p in combos["results"]} == {"idli-combo", "health-mix-combo"}
+    assert combos["total"] == 2
+
+    everything = offline_store.search_products_faceted("noodles", product_type="any", page_size=2)
+    assert everything["total"] == 6 > offline_store.FACET_POOL_SIZE
+    assert len(offline_store.search_products_faceted("noodles", product_type="any", page=2, page_size=2)["results"]) == 2
+
+    # A category named in the query filters as in chat search (uncategorised products pass)
+    health = offline_store.search_products_faceted("baby food", product_type="any", page_size=10)
+    assert {p["product_id"] for p in health["results"]} == {"kids-health-mix", "millet-noodles"}
+
+
+def test_suggest_completes_prefixes_and_tolerates_typos(offline_store):
+    assert [s["product_id"] for s in offline_store.suggest("milet nood")] == ["millet-noodles"]
+    assert {s.get("product_id") for s in offline_store.suggest("iddli")} >= {"millet-rava-idli-mix", "idli-combo"}
+
+    suggestions = offline_store.suggest("bab")
+    assert suggestions[0] == {"type": "category", "text": "baby", "category": "infant-food"}
+    assert offline_store.suggest("zzzz") == []
+
+
+def test_similar_products_come_from_the_precomputed_graph(offline_store, monkeypatch):
+    assert offline_store.SIMILAR_PATH.exists()
+
+    def no_embedding(query):
+        raise AssertionError("similar products must not embed anything")
+
+    monkeypatch.setattr(offline_store, "embed_query", no_embedding)
+    results = offline_store.similar_products("millet-rava-idli-mix", k=5)
+    ids = [p["product_id"] for p in results]
+    assert len(ids) == 5 and "millet-rava-idli-mix" not in ids
+
+    in_stock_singles = offline_store.similar_products("millet-rava-idli-mix", product_type="single", in_stock=True)
+    assert {p["product_id"] for p in in_stock_singles} == {"kids-health-mix", "millet-noodles"}
+    assert offline_store.similar_products("no-such-product") is None
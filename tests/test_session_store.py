@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from app.services.ai import chat_handler
+from app.services.ai.session_backends import FileSessionBackend, RedisSessionBackend, SQLiteSessionBackend
+
+
+def test_chat_turn_writes_session_once(chat_sessions, session_store, monkeypatch):
+    chat_sessions({"intent": "recommendation", "rewritten_query": "millet noodles",
+                   "product_type_filter": "single", "constraints": {"budget": "200"}})
+    batches = []
+    backend = session_store.get_backend()
+    save_many = backend.save_many
+    monkeypatch.setattr(backend, "save_many", lambda items: (batches.append(len(items)), save_many(items)))
+
+    asyncio.run(chat_handler.handle_user_message("s1", "millet noodles"))
+    assert batches == []  # five updates and two messages, nothing written yet
+
+    assert session_store.flush() == 1 and batches == [1]
+    stored = backend.load("s1")
+    assert [m["role"] for m in stored["history"]] == ["user", "assistant"]
+    assert stored["last_query"] == "millet noodles" and stored["budget"] == 200
+
+
+def test_writes_wait_for_idle_and_skip_held_sessions(session_store, monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_IDLE_FLUSH", 60)
+    monkeypatch.setattr(session_store, "SESSION_FLUSH_INTERVAL", 120)
+    for i in range(5):
+        session_store.update_memory("a", {"last_query": f"query {i}"})
+    session_store.hold("b")
+    session_store.append_message("b", "user", "hi")
+    assert session_store.flush() == 0
+
+    monkeypatch.setattr(session_store, "SESSION_IDLE_FLUSH", 0)
+    assert session_store.flush() == 1  # "b" is still inside its turn
+    assert session_store.get_backend().load("a")["last_query"] == "query 4"
+
+    session_store.release("b")
+    assert session_store.flush() == 1 and session_store.get_session_stats()["dirty"] == 0
+
+
+def test_shutdown_flushes_and_sessions_reload(session_store, monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_IDLE_FLUSH", 60)
+    session_store.start_writer()
+    session_store.update_memory("s1", {"category": "health-mix", "preferences": ["gluten free"]})
+    session_store.stop_writer()
+
+    session_store._sessions.clear()  # as after a restart
+    memory = session_store.load_memory("s1")
+    assert memory["category"] == "health-mix" and memory["preferences"] == ["gluten free"]
+
+
+@pytest.mark.parametrize("kind", ["file", "sqlite", "redis"])
+def test_backends_round_trip(kind, tmp_path, resp_server):
+    backend = {
+        "file": lambda: FileSessionBackend(tmp_path / "sessions"),
+        "sqlite": lambda: SQLiteSessionBackend(tmp_path / "sessions.db"),
+        "redis": lambda: RedisSessionBackend(resp_server.url, ttl_seconds=3600),
+    }[kind]()
+
+    backend.save_many([("s1", json.dumps({"last_query": "ragi"})), ("s2", json.dumps({"last_query": "idli"}))])
+    backend.save_many([("s1", json.dumps({"last_query": "ragi dosa"}))])
+    assert backend.load("s1") == {"last_query": "ragi dosa"} and backend.load("s2") == {"last_query": "idli"}
+
+    backend.delete("s1")
+    assert backend.load("s1") is None and backend.load("missing") is None
+
+    if kind == "redis":
+        assert resp_server.commands[0] == ["SELECT", "1"]
+        assert resp_server.commands[1][:2] == ["SET", "millex:session:s1"] and resp_server.commands[1][3:] == ["EX", "3600"]
+
+
+def test_cache_keeps_most_recent_sessions_and_reloads_evicted(session_store, monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_CACHE_MAX_ENTRIES", 3)
+    for i in range(5):
+        session_store.update_memory(f"s{i}", {"last_query": f"query {i}"})
+    assert len(session_store._sessions) == 5  # unwritten sessions are never dropped
+
+    session_store.flush(force=True)
+    session_store.load_memory("s0")  # most recently used again
+    session_store.load_memory("s5")
+    assert list(session_store._sessions) == ["s4", "s0", "s5"]
+    assert session_store.load_memory("s1")["last_query"] == "query 1"  # reloaded from the backend
+    assert session_store.get_session_stats()["evicted"] >= 3
+
+
+def test_sweep_removes_expired_sessions_from_memory_and_storage(session_store, tmp_path):
+    for session_id in ("idle", "active", "in-turn"):
+        session_store.append_message(session_id, "user", "hi")
+    session_store.hold("in-turn")
+    session_store.flush(force=True)
+    held_bytes = session_store.get_session_stats()["bytes_held"]
+
+    expired_at = time.time() - session_store.SESSION_TIMEOUT_SECONDS - 60
+    for session_id in ("idle", "in-turn"):
+        session_store._sessions[session_id]["last_updated"] = expired_at
+    sessions_dir = tmp_path / "sessions"
+    (sessions_dir / "old-visitor.json").write_text("{}", encoding="utf-8")
+    os.utime(sessions_dir / "old-visitor.json", (expired_at, expired_at))
+
+    assert session_store.sweep() == {"expired": 1, "deleted": 2}
+    assert sorted(p.stem for p in sessions_dir.glob("*.json")) == ["active", "in-turn"]
+    stats = session_store.get_session_stats()
+    assert stats["sessions"] == 2 and 0 < stats["bytes_held"] < held_bytes
+    session_store.release("in-turn")